@@ -0,0 +1,109 @@
+"""
+Batch Query Scoring
+Purpose: Score thousands of queries per call (nightly evaluations, cache
+pre-warming) with array operations instead of a Python loop per query and page
+
+The BM25F weight of every (term, doc) pair does not depend on the query, so
+an index becomes a sparse doc-term weight matrix once. A batch of queries is
+a sparse query-term matrix; their product is the score of every query against
+every doc, computed here with NumPy (gather the postings columns of the
+batch's terms, then one weighted bincount per chunk of queries). Top-k is an
+argpartition per row, and matched fields are resolved for the winners only.
+"""
+
+import numpy as np
+
+from index_snapshot import StringTable, postings_arrays
+from search_index import FIELD_BOOSTS, FIELDS, tokenize
+
+# Dense score cells per chunk (queries x docs); bounds the bincount buffer to ~32 MB
+CHUNK_CELLS = 1 << 22
+
+class ScoreMatrix:
+    """BM25F doc-term weights of one InvertedIndex (or MappedIndex) in CSC layout
+
+    Column t holds the docs containing term t (rows indptr[t]:indptr[t + 1] of
+    `doc_rows` / `weights`), so scoring a query only gathers its own columns.
+    Scores equal InvertedIndex.search up to float summation order.
+    """
+    def __init__(self, index):
+        docs, terms, lengths, postings, postings_index = postings_arrays(index)
+        self.docs = docs
+        self.terms = terms
+        self.find_term = (terms.find if isinstance(terms, StringTable)
+                          else {term: i for i, term in enumerate(terms)}.get)
+        n_docs = len(docs)
+        entries = np.frombuffer(postings, dtype=np.uint32).reshape(-1, 4)
+        self.indptr = np.frombuffer(postings_index, dtype=np.uint64).astype(np.int64)
+        self.doc_rows = entries[:, 0].astype(np.int64)
+        self.tfs = entries[:, 1:]
+
+        # weighted tf = sum over fields of boost * tf / (1 - b + b * len / avg len)
+        doc_lengths = np.frombuffer(lengths, dtype=np.uint32).reshape(-1, 3).astype(np.float64)
+        avg_lengths = np.maximum(np.asarray(index.total_lengths, dtype=np.float64) / max(n_docs, 1), 1e-9)
+        norms = 1 - index.b + index.b * doc_lengths[self.doc_rows] / avg_lengths
+        boosts = np.array([FIELD_BOOSTS[field] for field in FIELDS])
+        weighted_tf = (boosts * self.tfs / norms).sum(axis=1)
+        df = np.diff(self.indptr)
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5))
+        self.weights = np.repeat(idf, df) * weighted_tf / (index.k1 + weighted_tf)
+        self.n_docs = n_docs
+
+    def term_ids(self, query):
+        """Column ids of the query's distinct indexed terms"""
+        ids = (self.find_term(term) for term in set(tokenize(query)))
+        return sorted(i for i in ids if i is not None and i >= 0)
+
+    def search_many(self, queries, limit=10):
+        """[(url, score, matched terms per field)] per query, plus each query's match count
+
+        Results match InvertedIndex.search(query, limit) except for the order of equal
+        scores, which here is by URL.
+        """
+        columns = [self.term_ids(query) for query in queries]
+        results, match_counts = [], []
+        chunk = max(1, CHUNK_CELLS // max(self.n_docs, 1))
+        for start in range(0, len(queries), chunk):
+            scores = self._score_chunk(columns[start:start + chunk])
+            match_counts.extend(int(n) for n in np.count_nonzero(scores, axis=1))
+            for row, query_columns in zip(scores, columns[start:start + chunk]):
+                results.append(self._top_hits(row, query_columns, limit))
+        return results, match_counts
+
+    def _score_chunk(self, columns):
+        """Dense (queries x docs) score block: the sparse query-term x doc-term product"""
+        n_cells = len(columns) * self.n_docs
+        query_of = np.fromiter((q for q, query_columns in enumerate(columns) for _ in query_columns),
+                               dtype=np.int64)
+        term_of = np.fromiter((t for query_columns in columns for t in query_columns), dtype=np.int64)
+        if not len(term_of) or not self.n_docs:
+            return np.zeros(n_cells).reshape(len(columns), self.n_docs)
+        # Expand every (query, term) pair into the entries of that term's column
+        starts = self.indptr[term_of]
+        counts = self.indptr[term_of + 1] - starts
+        first = np.cumsum(counts) - counts
+        entries = np.repeat(starts - first, counts) + np.arange(counts.sum())
+        cells = np.repeat(query_of * self.n_docs, counts) + self.doc_rows[entries]
+        scores = np.bincount(cells, weights=self.weights[entries], minlength=n_cells)
+        return scores.reshape(len(columns), self.n_docs)
+
+    def _top_hits(self, row, query_columns, limit):
+        hits = np.flatnonzero(row)
+        if limit is not None and len(hits) > limit:
+            hits = hits[np.argpartition(-row[hits], limit - 1)[:limit]]
+        # Descending score, ties by doc id (URL order)
+        hits = hits[np.lexsort((hits, -row[hits]))]
+        return [(self.docs[doc], float(row[doc]), self._matched(doc, query_columns))
+                for doc in hits.tolist()]
+
+    def _matched(self, doc, query_columns):
+        """Matched terms per field (title, headings, content) of one winning doc"""
+        matched = ([], [], [])
+        for column in query_columns:
+            start, end = self.indptr[column], self.indptr[column + 1]
+            at = start + np.searchsorted(self.doc_rows[start:end], doc)
+            if at < end and self.doc_rows[at] == doc:
+                for field, tf in enumerate(self.tfs[at]):
+                    if tf:
+                        matched[field].append(self.terms[column])
+        return matched
@@ -0,0 +1,111 @@
+"""
+HTML Extraction Benchmark
+Purpose: Compare per-page parse time and peak memory of the single-pass extractor against the old code
+
+Usage: python bench_extract.py [page.html ...]
+Without arguments a synthetic Docusaurus-like page is generated.
+"""
+
+import statistics
+import sys
+import time
+import tracemalloc
+
+from bs4 import BeautifulSoup
+
+from html_extract import extract_page, extract_with_soup, etree
+
+def legacy_extract(html):
+    """What the demos did before: three BeautifulSoup parses and a traversal per field"""
+    # simple_scraper.SimpleDocsScraper.scrape_page
+    soup = BeautifulSoup(html, 'html.parser')
+    title_tag = soup.find('title')
+    title = title_tag.text.strip() if title_tag else "No title"
+    headings = [{'level': h.name, 'text': h.get_text().strip()}
+                for h in soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])]
+    main_content = soup.find('main') or soup.find('article')
+    if main_content:
+        for nav in main_content.find_all(['nav', 'aside', 'footer']):
+            nav.decompose()
+        content = main_content.get_text().strip()
+    else:
+        content = "No main content found"
+    metadata = {}
+    for name in ('description', 'keywords'):
+        tag = soup.find('meta', attrs={'name': name})
+        if tag:
+            metadata[name] = tag.get('content', '')
+
+    # scraping_demo2/mini_scraper.scrape_page
+    soup = BeautifulSoup(html, 'html.parser')
+    main = soup.find('main') or soup.find('article')
+    main.get_text().strip() if main else "No content"
+
+    # scraping_demo3/froquetism_finder.scrape_paragraphs
+    soup = BeautifulSoup(html, 'html.parser')
+    paragraphs = [text for text in (p.get_text().strip() for p in soup.find_all('p')) if text]
+
+    return {'title': title, 'headings': headings, 'content': content,
+            'paragraphs': paragraphs, 'metadata': metadata}
+
+def synthetic_page(sections=40):
+    """A Docusaurus-shaped page: navbar, sidebar, article with headings, code and paragraphs"""
+    body = []
+    for i in range(sections):
+        body.append(f'<h2 id="s{i}">Section {i}<a href="#s{i}" class="hash-link">​</a></h2>')
+        body.append(f'<p>Documents are groups of pages connected through a sidebar, '
+                    f'previous/next navigation and versioning. Paragraph {i}.</p>')
+        body.append(f'<pre><code>npm run docusaurus -- section {i}</code></pre>')
+        body.append('<ul>' + ''.join(f'<li><a href="/docs/{i}/{j}">Item {j}</a></li>' for j in range(5)) + '</ul>')
+    sidebar = ''.join(f'<li><a href="/docs/page-{i}">Page {i}</a></li>' for i in range(60))
+    return f"""<!doctype html><html lang="en"><head><meta charset="UTF-8">
+<title>Synthetic Page | My Docs Site</title><meta name="description" content="Synthetic benchmark page">
+<script>window.__docusaurus = {{}};</script><style>.x{{color:red}}</style></head><body>
+<nav class="navbar"><a href="/">My Docs Site</a><a href="/blog">Blog</a></nav>
+<div class="main-wrapper"><main><aside><ul>{sidebar}</ul></aside>
+<article><h1>Synthetic Page</h1>{''.join(body)}
+<nav class="pagination-nav"><a href="/prev">Previous</a><a href="/next">Next</a></nav></article></main></div>
+<footer><p>Copyright © 2025 My Project, Inc.</p></footer></body></html>"""
+
+def measure(func, html, repeat):
+    """Median wall time (ms) and tracemalloc peak (KiB) for one page"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(html)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    func(html)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(timings), peak / 1024
+
+def run_benchmark(pages, repeat=20):
+    candidates = [('legacy bs4 x3 parses', legacy_extract),
+                  ('bs4 fallback (1 parse)', extract_with_soup)]
+    if etree is not None:
+        candidates.append(('lxml single pass', extract_page))
+
+    print(f"📏 {len(pages)} page(s), {sum(len(p) for p in pages) / len(pages) / 1024:.0f} KiB avg, "
+          f"median of {repeat} runs")
+    print(f"{'extractor':<26}{'ms/page':>10}{'peak KiB':>12}")
+    results = {}
+    for name, func in candidates:
+        stats = [measure(func, html, repeat) for html in pages]
+        ms = statistics.mean(s[0] for s in stats)
+        kib = max(s[1] for s in stats)
+        results[name] = {'ms_per_page': ms, 'peak_kib': kib}
+        print(f"{name:<26}{ms:>10.2f}{kib:>12.0f}")
+    print("ℹ️  tracemalloc sees Python allocations only; lxml's target parser builds no tree")
+    return results
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        pages = []
+        for path in sys.argv[1:]:
+            with open(path, 'r', encoding='utf-8') as f:
+                pages.append(f.read())
+    else:
+        pages = [synthetic_page()]
+    run_benchmark(pages)
@@ -0,0 +1,95 @@
+"""
+Content Database Memory Benchmark
+Purpose: Compare the memory held by the plain dict-of-dicts content_db against compact page records
+
+Usage: python bench_memory.py [n_pages] [scraped_content.json]
+Without a JSON file, Docusaurus-shaped pages are generated.
+"""
+
+import gc
+import json
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+from page_records import CompactContentDB, resolve_codec
+
+WORDS = ('docusaurus sidebar document page blog plugin theme config markdown react '
+         'component version deploy build route category navbar footer search front '
+         'matter slug tag author release guide tutorial intro install').split()
+HEADINGS = ('Overview', 'Getting Started', 'Installation', 'Configuration', 'Usage',
+            'Examples', 'Troubleshooting', 'Next steps', 'API', 'FAQ')
+
+def synthetic_pages(n_pages, body_words=500, seed=0):
+    """{url: page dict} shaped like the scraper's output"""
+    rng = random.Random(seed)
+    pages = {}
+    for i in range(n_pages):
+        url = f"https://four27-my-docs-site.onrender.com/docs/section-{i % 50}/page-{i}"
+        headings = [{'level': 'h1', 'text': f"Page {i}"}]
+        headings += [{'level': rng.choice(('h2', 'h3')), 'text': rng.choice(HEADINGS)}
+                     for _ in range(rng.randint(3, 10))]
+        words = [rng.choice(WORDS) for _ in range(body_words)]
+        pages[url] = {
+            'url': url,
+            'title': f"Page {i} | My Docs Site",
+            'headings': headings,
+            'content': ' '.join(words),
+            'metadata': {'description': f"Reference page {i}"},
+            'validators': {'etag': f'"{i:08x}"', 'last_modified': None, 'content_hash': f"{i:064x}"}
+        }
+    return pages
+
+def measure(build, pages, snippet_reads=200):
+    """Retained KiB after building one layout, and µs per body read"""
+    # Each layout is built from its own JSON load, as when reading scraped_content.json
+    text = json.dumps(pages)
+    gc.collect()
+    tracemalloc.start()
+    source = json.loads(text)
+    db = build(source)
+    del source
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    urls = list(db)
+    rng = random.Random(1)
+    timings = []
+    for _ in range(snippet_reads):
+        url = rng.choice(urls)
+        start = time.perf_counter()
+        db[url]['content'][:200]
+        timings.append((time.perf_counter() - start) * 1e6)
+    return retained / 1024, statistics.median(timings)
+
+def run_benchmark(pages):
+    layouts = [('dict of dicts', lambda source: source),
+               ('PageRecord', lambda source: CompactContentDB(source)),
+               ('PageRecord + zlib', lambda source: CompactContentDB(source, compress='zlib'))]
+    if resolve_codec('zstd') == 'zstd':
+        layouts.append(('PageRecord + zstd', lambda source: CompactContentDB(source, compress='zstd')))
+
+    body_kib = sum(len(page['content']) for page in pages.values()) / 1024
+    print(f"📏 {len(pages)} pages, {body_kib:.0f} KiB of body text")
+    print(f"{'layout':<22}{'retained KiB':>14}{'B/page':>10}{'µs/read':>10}")
+    results = {}
+    for name, build in layouts:
+        kib, read_us = measure(build, pages)
+        results[name] = {'retained_kib': kib, 'read_us': read_us}
+        print(f"{name:<22}{kib:>14.0f}{kib * 1024 / len(pages):>10.0f}{read_us:>10.1f}")
+    baseline = results['dict of dicts']['retained_kib']
+    best = min(results, key=lambda name: results[name]['retained_kib'])
+    print(f"ℹ️  {best}: {baseline / results[best]['retained_kib']:.1f}x less than the dict layout")
+    return results
+
+if __name__ == "__main__":
+    n_pages = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    if len(sys.argv) > 2:
+        with open(sys.argv[2], 'r', encoding='utf-8') as f:
+            pages = json.load(f)
+    else:
+        pages = synthetic_pages(n_pages)
+    run_benchmark(pages)
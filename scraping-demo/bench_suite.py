@@ -0,0 +1,402 @@
+"""
+Benchmark Suite
+Purpose: Measure scraping, loading, search and prompt building on synthetic
+Docusaurus corpora served locally, so no benchmark touches the live site
+
+    python bench_suite.py [--sizes 1000 10000 100000] [--output results.json]
+    python bench_suite.py compare old.json new.json
+
+Startup is measured in fresh interpreters: import, load and first query, from
+the JSON file, from SQLite, and from SQLite with a memory-mapped index snapshot.
+Batch throughput compares search_content in a loop with search_many.
+
+Pages are modeled on this repo's own docs/ and blog/ (vocabulary, headings,
+categories, dated blog routes) and rendered with Docusaurus-style markup:
+navbar, sidebar, article, pagination and footer. Generated corpora are cached
+under --corpus-dir and reused when the size and seed match.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import re
+import resource
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, redirect_stdout
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from html_extract import extract_page
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FALLBACK_WORDS = ('docusaurus document page sidebar blog post markdown react component '
+                  'version deploy build config plugin theme category navbar footer front '
+                  'matter slug tag author release translate locale static site').split()
+FALLBACK_HEADINGS = ['Getting Started', 'Create your first Doc', 'Configure the Sidebar',
+                     'Deploy your site', 'Markdown Features', 'Next steps']
+
+# --- corpus generation ---
+
+def repo_vocabulary():
+    """Words and headings from the repo's docs/ and blog/ Markdown"""
+    words, headings = [], []
+    for folder in ('docs', 'blog'):
+        for dirpath, _, filenames in os.walk(os.path.join(REPO_ROOT, folder)):
+            for filename in filenames:
+                if not filename.endswith(('.md', '.mdx')):
+                    continue
+                with open(os.path.join(dirpath, filename), 'r', encoding='utf-8') as f:
+                    for line in f:
+                        match = re.match(r'#{1,4}\s+(.+)', line)
+                        if match:
+                            headings.append(match.group(1).strip())
+                        words.extend(re.findall(r'[A-Za-z][A-Za-z0-9_-]+', line))
+    return words or FALLBACK_WORDS, sorted(set(headings)) or FALLBACK_HEADINGS
+
+def _category_names():
+    categories = [name for name in sorted(os.listdir(os.path.join(REPO_ROOT, 'docs')))
+                  if os.path.isdir(os.path.join(REPO_ROOT, 'docs', name))] \
+        if os.path.isdir(os.path.join(REPO_ROOT, 'docs')) else []
+    return categories or ['tutorial-basics', 'tutorial-extras']
+
+def render_page(title, sections, sidebar, canonical, description):
+    """Docusaurus-shaped HTML for one page"""
+    body = []
+    for heading, paragraphs in sections:
+        anchor = re.sub(r'[^a-z0-9]+', '-', heading.lower()).strip('-')
+        body.append(f'<h2 class="anchor" id="{anchor}">{heading}'
+                    f'<a href="#{anchor}" class="hash-link">​</a></h2>')
+        body.extend(f'<p>{paragraph}</p>' for paragraph in paragraphs)
+        body.append(f'<pre><code>npm run docusaurus -- {anchor}</code></pre>')
+    links = ''.join(f'<li><a class="menu__link" href="{href}">{label}</a></li>' for href, label in sidebar)
+    return f"""<!doctype html><html lang="en" dir="ltr"><head><meta charset="UTF-8">
+<title>{title} | My Docs Site</title><meta name="description" content="{description}">
+<link rel="canonical" href="{canonical}"><script>window.__docusaurus = {{}};</script></head><body>
+<nav class="navbar"><a href="/">My Docs Site</a><a href="/intro">Tutorial</a><a href="/blog">Blog</a></nav>
+<div class="main-wrapper"><div class="docPage"><aside class="theme-doc-sidebar-container"><nav><ul>{links}</ul></nav></aside>
+<main class="docMainContainer"><article><div class="theme-doc-markdown markdown"><header><h1>{title}</h1></header>
+{''.join(body)}</div><nav class="pagination-nav"><a href="/intro">Previous</a><a href="/blog">Next</a></nav></article></main></div></div>
+<footer class="footer"><p>Copyright © 2025 My Project, Inc. Built with Docusaurus.</p></footer></body></html>"""
+
+def generate_corpus(out_dir, n_pages, seed=0):
+    """Write n_pages of docs (85%) and blog posts (15%) plus sitemap.xml; return their routes"""
+    manifest_path = os.path.join(out_dir, 'corpus.json')
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest['n_pages'] == n_pages and manifest['seed'] == seed:
+            return manifest['routes']
+
+    rng = random.Random(seed)
+    words, headings = repo_vocabulary()
+    categories = _category_names() + [f"guides-{i}" for i in range(max(1, n_pages // 500))]
+    routes = []
+    for i in range(n_pages):
+        if i % 7 == 6:
+            day = 1 + i % 28
+            routes.append(f"/blog/{2019 + i % 7}/{1 + i % 12:02d}/{day:02d}/post-{i}")
+        else:
+            routes.append(f"/docs/{categories[i % len(categories)]}/page-{i}")
+
+    start = time.perf_counter()
+    for i, route in enumerate(routes):
+        # Neighbouring routes form the sidebar, like a category's doc list
+        sidebar = [(routes[j], f"Page {j}") for j in range(max(0, i - 15), min(n_pages, i + 15))]
+        sections = []
+        for _ in range(rng.randint(3, 8)):
+            paragraphs = [' '.join(rng.choice(words) for _ in range(rng.randint(25, 70)))
+                          for _ in range(rng.randint(1, 4))]
+            sections.append((rng.choice(headings), paragraphs))
+        title = f"{rng.choice(headings)} {i}"
+        html = render_page(title, sections, sidebar, f"https://four27-my-docs-site.onrender.com{route}",
+                           f"Synthetic page {i}")
+        path = os.path.join(out_dir, route.lstrip('/'), 'index.html')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(html)
+
+    with open(os.path.join(out_dir, 'sitemap.xml'), 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
+        for route in routes:
+            f.write(f"<url><loc>https://four27-my-docs-site.onrender.com{route}</loc>"
+                    f"<lastmod>2025-01-01</lastmod></url>\n")
+        f.write('</urlset>\n')
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump({'n_pages': n_pages, 'seed': seed, 'routes': routes}, f)
+    print(f"🏗️  Generated {n_pages} pages in {out_dir} ({time.perf_counter() - start:.1f}s)")
+    return routes
+
+# --- local HTTP stand-in ---
+
+class _CorpusHandler(SimpleHTTPRequestHandler):
+    """Serves /docs/x from docs/x/index.html without a redirect, quietly"""
+    def translate_path(self, path):
+        translated = super().translate_path(path)
+        index = os.path.join(translated, 'index.html')
+        return index if os.path.isdir(translated) and os.path.exists(index) else translated
+
+    def log_message(self, format, *args):
+        pass
+
+@contextmanager
+def serve_corpus(directory):
+    """Serve `directory` on a free localhost port; yields the base URL"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), partial(_CorpusHandler, directory=directory))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+# --- measurements ---
+
+def distribution(samples_ms):
+    ordered = sorted(samples_ms)
+    pick = lambda pct: ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+    return {'count': len(ordered), 'mean_ms': statistics.fmean(ordered), 'p50_ms': pick(50),
+            'p90_ms': pick(90), 'p99_ms': pick(99), 'max_ms': ordered[-1]}
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+def bench_scrape(base_url, routes, sample=500, max_workers=8):
+    """scrape_page latency (sequential) and throughput (worker pool) on a route sample"""
+    from simple_scraper import SimpleDocsScraper
+    urls = [base_url + route for route in random.Random(1).sample(routes, min(sample, len(routes)))]
+    scraper = SimpleDocsScraper(base_url, max_workers=max_workers, requests_per_second=100000)
+
+    # The scraper prints a line per page; keep that out of the timings and the report
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        latencies = [_timed(scraper.scrape_page, url)[1] for url in urls[:100]]
+        start = time.perf_counter()
+        pages = scraper.scrape_many(urls)
+        elapsed = time.perf_counter() - start
+    return {'scrape_page': distribution(latencies),
+            'pages_per_second': len(pages) / elapsed if elapsed else 0.0,
+            'workers': max_workers, 'sampled_pages': len(urls)}
+
+def build_content_file(corpus_dir, routes, path):
+    """Extract every generated page into a scraped_content.json (what a full scrape produces)"""
+    pages = {}
+    for route in routes:
+        with open(os.path.join(corpus_dir, route.lstrip('/'), 'index.html'), 'r', encoding='utf-8') as f:
+            page = extract_page(f.read())
+        url = "https://four27-my-docs-site.onrender.com" + route
+        pages[url] = {'url': url, 'title': page['title'], 'headings': page['headings'],
+                      'content': page['content'], 'metadata': page['metadata']}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(pages, f, ensure_ascii=False)
+    return pages
+
+def bench_load(content_file):
+    """LLMContextEnhancer.load_scraped_content time, then its tracemalloc peak in a second run"""
+    from llm_enhancer import LLMContextEnhancer
+    gc.collect()
+    enhancer, load_ms = _timed(LLMContextEnhancer, content_file)
+    del enhancer
+    gc.collect()
+    tracemalloc.start()
+    enhancer = LLMContextEnhancer(content_file)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return enhancer, {'load_ms': load_ms, 'peak_mib': peak / 2**20, 'retained_mib': retained / 2**20}
+
+# Run in a fresh interpreter: argv = content file, index snapshot ('' for none)
+STARTUP_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from llm_enhancer import LLMContextEnhancer
+imported = time.perf_counter()
+enhancer = LLMContextEnhancer(sys.argv[1], index_snapshot=sys.argv[2] or None)
+loaded = time.perf_counter()
+enhancer.search_content('create a document sidebar', 10)
+done = time.perf_counter()
+print(json.dumps({'import_ms': (imported - start) * 1000, 'load_ms': (loaded - imported) * 1000,
+                  'first_query_ms': (done - loaded) * 1000, 'total_ms': (done - start) * 1000,
+                  'heavy_modules': sorted(name for name in ('requests', 'bs4', 'lxml', 'openai', 'numpy')
+                                          if name in sys.modules)}))
+"""
+
+def _cold_start(content_file, snapshot=''):
+    completed = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT, content_file, snapshot],
+                               capture_output=True, text=True, check=True,
+                               cwd=os.path.dirname(os.path.abspath(__file__)))
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def bench_startup(content_file, runs=3):
+    """Cold-process startup (import + load + first query), best of `runs` per variant"""
+    from content_store import open_store
+    content_file = os.path.abspath(content_file)
+    db_file = os.path.splitext(content_file)[0] + '.db'
+    snapshot = db_file + '.idx'
+    open_store(db_file).close()   # seeded from the JSON file once
+    if os.path.exists(snapshot):
+        os.remove(snapshot)
+
+    best = lambda samples: min(samples, key=lambda sample: sample['total_ms'])
+    return {'json': best([_cold_start(content_file) for _ in range(runs)]),
+            'sqlite': best([_cold_start(db_file) for _ in range(runs)]),
+            # First start with a snapshot path builds the index and writes the snapshot
+            'sqlite_snapshot_write': _cold_start(db_file, snapshot),
+            'sqlite_snapshot': best([_cold_start(db_file, snapshot) for _ in range(runs)])}
+
+def bench_queries(enhancer, n_queries=200, seed=2):
+    """Latency distributions of search_content and enhance_prompt (cold and cached)"""
+    words, headings = repo_vocabulary()
+    rng = random.Random(seed)
+    questions = [f"How do I {rng.choice(headings).lower()} with {rng.choice(words)}?"
+                 for _ in range(n_queries)]
+
+    search = [_timed(enhancer.search_content, q, 10)[1] for q in questions]
+    cold = []
+    for question in questions:
+        enhancer.query_cache.clear()
+        cold.append(_timed(enhancer.enhance_prompt, question)[1])
+    cached = [_timed(enhancer.enhance_prompt, q)[1] for q in questions]
+    packed = []
+    for question in questions:
+        enhancer.query_cache.clear()
+        packed.append(_timed(enhancer.enhance_prompt, question, 3, 1500)[1])
+    return {'search_content': distribution(search), 'enhance_prompt': distribution(cold),
+            'enhance_prompt_cached': distribution(cached),
+            'enhance_prompt_token_budget': distribution(packed)}
+
+def bench_batch(enhancer, n_queries=1000, batch_sizes=(1, 16, 256), seed=3):
+    """Queries per second: search_content one at a time vs search_many in batches"""
+    words, headings = repo_vocabulary()
+    rng = random.Random(seed)
+    questions = [f"How do I {rng.choice(headings).lower()} with {rng.choice(words)}?"
+                 for _ in range(n_queries)]
+    enhancer.score_matrix('pages')   # built once per corpus version, not part of the rate
+
+    def rate(run, batch_size):
+        start = time.perf_counter()
+        for i in range(0, len(questions), batch_size):
+            run(questions[i:i + batch_size])
+        return len(questions) / (time.perf_counter() - start)
+
+    result = {'queries': n_queries,
+              'search_content_qps': rate(lambda batch: [enhancer.search_content(q, 10) for q in batch], 1)}
+    for size in batch_sizes:
+        result[f"search_many_{size}_qps"] = rate(lambda batch: enhancer.search_many(batch, 10), size)
+    return result
+
+def run_size(n_pages, corpus_root, scrape_sample=500, n_queries=200):
+    corpus_dir = os.path.join(corpus_root, f"corpus-{n_pages}")
+    start = time.perf_counter()
+    routes = generate_corpus(corpus_dir, n_pages)
+    result = {'pages': n_pages}
+
+    with serve_corpus(corpus_dir) as base_url:
+        result['scrape'] = bench_scrape(base_url, routes, scrape_sample)
+    print(f"   scrape: {result['scrape']['pages_per_second']:.0f} pages/s, "
+          f"p50 {result['scrape']['scrape_page']['p50_ms']:.1f} ms")
+
+    content_file = os.path.join(corpus_dir, 'scraped_content.json')
+    if not os.path.exists(content_file):
+        build_content_file(corpus_dir, routes, content_file)
+    enhancer, result['load'] = bench_load(content_file)
+    print(f"   load: {result['load']['load_ms']:.0f} ms, peak {result['load']['peak_mib']:.0f} MiB")
+    result['startup'] = bench_startup(content_file)
+    print("   cold start: " + ", ".join(f"{name} {run['total_ms']:.0f} ms"
+                                        for name, run in result['startup'].items()))
+
+    result['queries'] = bench_queries(enhancer, n_queries)
+    print(f"   search p50/p99: {result['queries']['search_content']['p50_ms']:.2f}/"
+          f"{result['queries']['search_content']['p99_ms']:.2f} ms, "
+          f"enhance p50/p99: {result['queries']['enhance_prompt']['p50_ms']:.2f}/"
+          f"{result['queries']['enhance_prompt']['p99_ms']:.2f} ms")
+    result['batch'] = bench_batch(enhancer, max(n_queries, 256))
+    print(f"   batch: {result['batch']['search_content_qps']:.0f} q/s one by one, "
+          f"{result['batch']['search_many_256_qps']:.0f} q/s with search_many(256)")
+    result['max_rss_mib'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_suite(sizes=(1000,), corpus_root='bench_corpus', output=None, scrape_sample=500, n_queries=200):
+    """Run every size and write the results as JSON; returns the results dict"""
+    results = {'commit': _git_commit(), 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+               'python': platform.python_version(), 'platform': platform.platform(),
+               'cpus': os.cpu_count(), 'sizes': {}}
+    for n_pages in sizes:
+        print(f"📏 {n_pages} pages")
+        results['sizes'][str(n_pages)] = run_size(n_pages, corpus_root, scrape_sample, n_queries)
+
+    output = output or os.path.join('bench_results', f"{results['commit'] or 'nocommit'}-{int(time.time())}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"💾 Results saved to {output}")
+    return results
+
+# Metrics compared by `compare`: (label, path, higher is better)
+COMPARED_METRICS = [
+    ('scrape pages/s', ('scrape', 'pages_per_second'), True),
+    ('scrape_page p50 ms', ('scrape', 'scrape_page', 'p50_ms'), False),
+    ('load ms', ('load', 'load_ms'), False),
+    ('load peak MiB', ('load', 'peak_mib'), False),
+    ('startup json ms', ('startup', 'json', 'total_ms'), False),
+    ('startup snapshot ms', ('startup', 'sqlite_snapshot', 'total_ms'), False),
+    ('search p50 ms', ('queries', 'search_content', 'p50_ms'), False),
+    ('search p99 ms', ('queries', 'search_content', 'p99_ms'), False),
+    ('enhance p50 ms', ('queries', 'enhance_prompt', 'p50_ms'), False),
+    ('enhance p99 ms', ('queries', 'enhance_prompt', 'p99_ms'), False),
+    ('search_many(256) q/s', ('batch', 'search_many_256_qps'), True),
+]
+
+def compare(old_path, new_path, tolerance=0.10):
+    """Print metric changes between two result files; returns the regressed metrics"""
+    with open(old_path, 'r', encoding='utf-8') as f:
+        old = json.load(f)
+    with open(new_path, 'r', encoding='utf-8') as f:
+        new = json.load(f)
+    print(f"📊 {old.get('commit')} → {new.get('commit')}")
+    regressions = []
+    for size in sorted(set(old['sizes']) & set(new['sizes']), key=int):
+        print(f"   {size} pages")
+        for label, path, higher_is_better in COMPARED_METRICS:
+            before, after = old['sizes'][size], new['sizes'][size]
+            for key in path:
+                before, after = before.get(key, {}), after.get(key, {})
+            if not isinstance(before, (int, float)) or not isinstance(after, (int, float)):
+                continue   # metric added after the older run
+            change = (after - before) / before if before else 0.0
+            worse = -change if higher_is_better else change
+            flag = '❌' if worse > tolerance else '✅'
+            if worse > tolerance:
+                regressions.append((size, label, change))
+            print(f"   {flag} {label:<20}{before:>12.2f}{after:>12.2f}{change:>+9.0%}")
+    return regressions
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == 'compare':
+        sys.exit(1 if compare(sys.argv[2], sys.argv[3]) else 0)
+    parser = argparse.ArgumentParser(description="Synthetic-corpus benchmark suite")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000])
+    parser.add_argument('--corpus-dir', default='bench_corpus')
+    parser.add_argument('--output')
+    parser.add_argument('--scrape-sample', type=int, default=500)
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+    run_suite(args.sizes, args.corpus_dir, args.output, args.scrape_sample, args.queries)
@@ -0,0 +1,261 @@
+"""
+Persistent Content Store
+Purpose: Keep scraped pages on disk with per-page upserts instead of rewriting one big JSON file
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+from collections.abc import MutableMapping
+
+from page_records import CompactContentDB
+
+class JsonContentStore:
+    """Legacy backend: the whole database in one JSON file
+
+    Every put rewrites the file, so it is O(N) per update; the rewrite goes to a
+    temp file first and is swapped in with os.replace so a crash never leaves a
+    truncated cache behind. Pages are held in memory as compact PageRecords,
+    with bodies optionally compressed (`compress='zlib'` or `'zstd'`).
+    """
+    def __init__(self, path, compress=None):
+        self.path = path
+        self.pages = CompactContentDB(compress=compress)
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.pages.update(json.load(f))
+
+    def get(self, url):
+        return self.pages.get(url)
+
+    def put(self, url, page):
+        self.pages[url] = page
+        self._flush()
+
+    def put_many(self, pages):
+        """Upsert many pages with a single rewrite"""
+        self.pages.update(pages)
+        self._flush()
+
+    def delete(self, url):
+        if self.pages.pop(url, None) is not None:
+            self._flush()
+
+    def urls(self):
+        return list(self.pages)
+
+    def generation(self):
+        """Changes whenever the file is rewritten; lets derived indexes detect staleness"""
+        if not os.path.exists(self.path):
+            return 'empty'
+        stat = os.stat(self.path)
+        return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+    def items(self):
+        return iter(list(self.pages.items()))
+
+    def __len__(self):
+        return len(self.pages)
+
+    def close(self):
+        pass
+
+    def _flush(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self.pages.to_dict(), f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+class SqliteContentStore:
+    """SQLite backend: one row per page, bodies kept in their own column
+
+    Upserts are single-row transactions, so an update costs O(page) and is atomic.
+    Everything except the body is stored as a JSON record, which keeps
+    `summaries()` cheap and lets pages carry extra keys without a schema change.
+    """
+    def __init__(self, path, migrate_from=None):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                record TEXT NOT NULL,
+                content TEXT NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        if migrate_from and len(self) == 0 and os.path.exists(migrate_from):
+            self.migrate_from_json(migrate_from)
+
+    def get(self, url):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT record, content FROM pages WHERE url = ?", (url,)).fetchone()
+        return self._to_page(*row) if row else None
+
+    def put(self, url, page):
+        record, content = self._split(page)
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO pages (url, record, content) VALUES (?, ?, ?) "
+                "ON CONFLICT(url) DO UPDATE SET record = excluded.record, content = excluded.content",
+                (url, record, content))
+            self._bump_generation()
+
+    def put_many(self, pages):
+        """Upsert many pages in one transaction"""
+        rows = [(url, *self._split(page)) for url, page in pages.items()]
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO pages (url, record, content) VALUES (?, ?, ?) "
+                "ON CONFLICT(url) DO UPDATE SET record = excluded.record, content = excluded.content",
+                rows)
+            self._bump_generation()
+
+    def delete(self, url):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM pages WHERE url = ?", (url,))
+            self._bump_generation()
+
+    def urls(self):
+        with self.lock:
+            return [url for (url,) in self.conn.execute("SELECT url FROM pages")]
+
+    def generation(self):
+        """Write counter, bumped in the same transaction as every change"""
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        return str(row[0]) if row else '0'
+
+    def items(self):
+        """Stream (url, page) pairs without holding every body in memory"""
+        with self.lock:
+            cursor = self.conn.cursor()
+            cursor.execute("SELECT url, record, content FROM pages")
+            rows = cursor.fetchmany(256)
+        while rows:
+            for url, record, content in rows:
+                yield url, self._to_page(record, content)
+            with self.lock:
+                rows = cursor.fetchmany(256)
+
+    def summaries(self):
+        """Stream (url, page-without-body) pairs; bodies are never read"""
+        with self.lock:
+            rows = self.conn.execute("SELECT url, record FROM pages").fetchall()
+        for url, record in rows:
+            yield url, json.loads(record)
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def migrate_from_json(self, json_path):
+        """One-shot import of a legacy scraped_content.json"""
+        with open(json_path, 'r', encoding='utf-8') as f:
+            pages = json.load(f)
+        self.put_many(pages)
+        print(f"📦 Migrated {len(pages)} pages from {json_path} to {self.path}")
+        return len(pages)
+
+    def _bump_generation(self):
+        self.conn.execute("INSERT INTO meta (key, value) VALUES ('generation', 1) "
+                          "ON CONFLICT(key) DO UPDATE SET value = value + 1")
+
+    def _split(self, page):
+        record = {key: value for key, value in page.items() if key != 'content'}
+        return json.dumps(record, ensure_ascii=False), page.get('content', '')
+
+    def _to_page(self, record, content):
+        page = json.loads(record)
+        page['content'] = content
+        return page
+
+def open_store(path, compress=None):
+    """Open the backend matching `path`
+
+    `.json` paths use the legacy JSON backend, which keeps every page in memory
+    (bodies compressed with `compress`). Anything else is SQLite; a new
+    database is seeded once from the `.json` file of the same name if one exists.
+    """
+    if path.endswith('.json'):
+        return JsonContentStore(path, compress)
+    legacy_json = os.path.splitext(path)[0] + '.json'
+    return SqliteContentStore(path, migrate_from=legacy_json)
+
+class StoreBackedContentDB(MutableMapping):
+    """Dict-like view of a content store, so `content_db[url]` keeps working
+
+    Reads go to the store and are kept in a small LRU; writes go straight
+    through as per-page upserts.
+    """
+    def __init__(self, store, cache_size=256):
+        self.store = store
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.cache_lock = threading.Lock()
+
+    def __getitem__(self, url):
+        with self.cache_lock:
+            if url in self.cache:
+                self.cache.move_to_end(url)
+                return self.cache[url]
+        page = self.store.get(url)
+        if page is None:
+            raise KeyError(url)
+        self.remember(url, page)
+        return page
+
+    def __setitem__(self, url, page):
+        self.store.put(url, page)
+        self.remember(url, page)
+
+    def __delitem__(self, url):
+        with self.cache_lock:
+            cached = self.cache.pop(url, None)
+        if self.store.get(url) is None:
+            if cached is None:
+                raise KeyError(url)
+            return   # already deleted straight in the store; only the cached copy was left
+        self.store.delete(url)
+
+    def __iter__(self):
+        return iter(self.store.urls())
+
+    def __len__(self):
+        return len(self.store)
+
+    def items(self):
+        return self.store.items()
+
+    def remember(self, url, page):
+        """Cache a page that was just written, possibly straight to the store"""
+        with self.cache_lock:
+            self.cache[url] = page
+            self.cache.move_to_end(url)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+if __name__ == "__main__":
+    # Usage: python content_store.py scraped_content.json scraped_content.db
+    source, target = (sys.argv[1:3] if len(sys.argv) >= 3
+                      else ('scraped_content.json', 'scraped_content.db'))
+    store = SqliteContentStore(target)
+    store.migrate_from_json(source)
+    store.close()
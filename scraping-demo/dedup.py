@@ -0,0 +1,231 @@
+"""
+Near-Duplicate Detection
+Purpose: Collapse near-identical pages (versioned docs, tag pages, blog pagination)
+into one canonical entry at ingest, and drop near-identical passages at ranking time
+
+- MinHash-LSH over word shingles finds near-duplicate pages in O(1) per lookup
+- SimHash fingerprints catch near-identical passages while packing a prompt
+"""
+
+import base64
+import zlib
+from collections import defaultdict, namedtuple
+from urllib.parse import urldefrag, urlparse
+
+from search_index import TOKEN_RE
+
+_EMPTY_SLOT = 1 << 32             # above every 32-bit hash value
+FINGERPRINT_PREFIX = 'mh2:'      # signatures of older hashers are recomputed, not compared
+
+def _normalize_url(url):
+    url, _ = urldefrag(url)
+    parsed = urlparse(url)
+    return parsed._replace(path=parsed.path.rstrip('/') or '/').geturl()
+
+def simhash(text):
+    """64-bit SimHash of the text's words; near-identical texts differ in few bits"""
+    counts = defaultdict(int)
+    for word in TOKEN_RE.findall(text.lower()):
+        counts[word] += 1
+    weights = [0] * 64
+    for word, count in counts.items():
+        # Two crc32s (plain and salted) make one stable 64-bit feature hash
+        data = word.encode('utf-8')
+        h = zlib.crc32(data) | (zlib.crc32(data, 0x5bd1e995) << 32)
+        for bit in range(64):
+            weights[bit] += count if h >> bit & 1 else -count
+    return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count('1')   # int.bit_count needs 3.10
+
+class MinHasher:
+    """MinHash signatures over k-word shingles (NumPy)
+
+    Each permutation is a multiply-add-shift hash, (a * x + b) mod 2**64 keeping
+    the top 32 bits, with random 64-bit a (odd) and b: a universal family for
+    32-bit shingle hashes whose members are effectively independent. The
+    parameters come from a fixed seed, so signatures computed in different
+    processes (e.g. ingest parse workers) are comparable and can be persisted.
+    """
+    def __init__(self, num_perm=64, shingle_size=4, seed=1):
+        import numpy as np
+        self.np = np
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(0, 1 << 64, num_perm, dtype=np.uint64, endpoint=False) | np.uint64(1)
+        self.b = rng.integers(0, 1 << 64, num_perm, dtype=np.uint64, endpoint=False)
+
+    def shingles(self, text):
+        words = TOKEN_RE.findall(text.lower())
+        k = min(self.shingle_size, len(words))
+        return {zlib.crc32(' '.join(words[i:i + k]).encode('utf-8'))
+                for i in range(len(words) - k + 1)} if words else set()
+
+    def signature(self, text):
+        """(num_perm,) uint64 array; the share of equal slots estimates Jaccard similarity"""
+        np = self.np
+        hashes = np.fromiter(self.shingles(text), dtype=np.uint64)
+        if not len(hashes):
+            return np.full(self.num_perm, _EMPTY_SLOT, dtype=np.uint64)
+        # uint64 array arithmetic wraps, which is the mod 2**64
+        permuted = (np.outer(hashes, self.a) + self.b) >> np.uint64(32)
+        return permuted.min(axis=0)
+
+    def encode(self, signature):
+        """Compact text form for storing a signature in a page record"""
+        return FINGERPRINT_PREFIX + base64.b64encode(signature.astype('<u8').tobytes()).decode('ascii')
+
+    def decode(self, text):
+        """Signature from encode(), or None if it was made by an older hasher"""
+        if not text.startswith(FINGERPRINT_PREFIX):
+            return None
+        data = base64.b64decode(text[len(FINGERPRINT_PREFIX):])
+        return self.np.frombuffer(data, dtype='<u8').astype(self.np.uint64)
+
+_default_hasher = None
+
+def page_fingerprint(text):
+    """Encoded MinHash signature of a page body with the default hasher"""
+    global _default_hasher
+    if _default_hasher is None:
+        _default_hasher = MinHasher()
+    return _default_hasher.encode(_default_hasher.signature(text))
+
+class NearDuplicateIndex:
+    """MinHash-LSH index: candidate pairs share a band bucket, then are verified
+
+    With `bands` bands of num_perm / bands rows, pages around `threshold`
+    Jaccard similarity collide in at least one band with high probability;
+    candidates are confirmed on their full signature.
+    """
+    def __init__(self, threshold=0.8, bands=16, hasher=None):
+        self.threshold = threshold
+        self.hasher = hasher or MinHasher()
+        if self.hasher.num_perm % bands:
+            raise ValueError(f"num_perm {self.hasher.num_perm} is not divisible by {bands} bands")
+        self.bands = bands
+        self.rows = self.hasher.num_perm // bands
+        self.buckets = defaultdict(set)   # (band, band bytes) -> keys
+        self.signatures = {}              # key -> signature
+
+    def __len__(self):
+        return len(self.signatures)
+
+    def __contains__(self, key):
+        return key in self.signatures
+
+    def add(self, key, signature):
+        self.remove(key)
+        self.signatures[key] = signature
+        for band_key in self._band_keys(signature):
+            self.buckets[band_key].add(key)
+
+    def remove(self, key):
+        signature = self.signatures.pop(key, None)
+        if signature is None:
+            return
+        for band_key in self._band_keys(signature):
+            bucket = self.buckets[band_key]
+            bucket.discard(key)
+            if not bucket:
+                del self.buckets[band_key]
+
+    def query(self, signature, exclude=None):
+        """[(key, estimated Jaccard)] of indexed near-duplicates, most similar first"""
+        candidates = set()
+        for band_key in self._band_keys(signature):
+            candidates |= self.buckets.get(band_key, set())
+        candidates.discard(exclude)
+        matches = []
+        for key in candidates:
+            similarity = float((self.signatures[key] == signature).mean())
+            if similarity >= self.threshold:
+                matches.append((key, similarity))
+        return sorted(matches, key=lambda match: (-match[1], match[0]))
+
+    def _band_keys(self, signature):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+# Store the page under `canonical`; when `alias` is set, that URL is only recorded as its alias
+Resolution = namedtuple('Resolution', ['canonical', 'alias'])
+
+class Deduplicator:
+    """Decides the canonical URL each ingested page is stored under
+
+    - a same-host `<link rel=canonical>` wins: the page is stored under that URL,
+      or becomes an alias of it when the canonical page is already stored
+    - otherwise a near-duplicate of an already stored page becomes its alias
+      (first seen wins)
+    Aliases are kept on the canonical page as `aliases`, so a store can be
+    re-opened without losing them.
+    """
+    def __init__(self, threshold=0.8, index=None):
+        self.index = index or NearDuplicateIndex(threshold)
+        self.canonical_of = {}            # alias url -> canonical url
+        self.aliases = defaultdict(set)   # canonical url -> alias urls
+
+    def build(self, pages):
+        """Index already stored pages, reusing their persisted fingerprints"""
+        for url, page in pages:
+            self.index.add(url, self.signature(page))
+            for alias in page.get('aliases', []):
+                self._link(alias, url)
+        return self
+
+    def resolve(self, url, page):
+        target = url
+        declared = page.get('canonical')
+        if declared and urlparse(declared).netloc == urlparse(url).netloc:
+            target = _normalize_url(declared)
+            if target != _normalize_url(url) and target in self.index:
+                return self._alias(url, target)
+
+        signature = self.signature(page)
+        matches = self.index.query(signature, exclude=target)
+        if matches:
+            return self._alias(url, matches[0][0])
+        self._unlink(target)
+        self.index.add(target, signature)
+        if target != _normalize_url(url):
+            # Stored under its declared canonical URL; the fetched URL is an alias
+            self._link(url, target)
+        return Resolution(target, None)
+
+    def aliases_for(self, canonical):
+        return sorted(self.aliases.get(canonical, ()))
+
+    def remove(self, url):
+        """Forget a stored page; its aliases are forgotten too"""
+        self.index.remove(url)
+        self._unlink(url)
+        for alias in self.aliases.pop(url, ()):
+            self.canonical_of.pop(alias, None)
+
+    def signature(self, page):
+        hasher = self.index.hasher
+        if page.get('fingerprint'):
+            signature = hasher.decode(page['fingerprint'])
+            if signature is not None and len(signature) == hasher.num_perm:
+                return signature
+        return hasher.signature(page.get('content', ''))
+
+    def _alias(self, url, canonical):
+        # A page that used to be stored on its own is now folded into `canonical`
+        self.index.remove(url)
+        self._link(url, canonical)
+        return Resolution(canonical, url)
+
+    def _link(self, alias, canonical):
+        self._unlink(alias)
+        self.canonical_of[alias] = canonical
+        self.aliases[canonical].add(alias)
+
+    def _unlink(self, alias):
+        canonical = self.canonical_of.pop(alias, None)
+        if canonical is not None:
+            self.aliases[canonical].discard(alias)
+            if not self.aliases[canonical]:
+                del self.aliases[canonical]
@@ -0,0 +1,612 @@
+"""
+Docusaurus Source Ingestion
+Purpose: Index this site straight from its sources (docs/ and blog/ Markdown/MDX)
+or from a local `npm run build` output, with no network or rate limiting
+
+URLs follow the site's own routing: url, baseUrl, trailingSlash and the docs /
+blog routeBasePath from docusaurus.config.js, front matter id / slug, number
+prefixes and index files, and blog dates. sidebars.js supplies each doc's
+sidebar and category path. The config files are JavaScript, so only their
+literal values are read (no Node.js needed).
+
+Every page records its source file's mtime, size and hash. Re-runs only stat
+the tree: files with an unchanged mtime and size are skipped, and a changed
+mtime with an unchanged hash is not re-parsed. Changed files are parsed in
+parallel; deleted files are dropped from the store.
+
+Usage: python docs_source.py [site_root] [content.db] [--build BUILD_DIR] [--base-url URL]
+"""
+
+import fnmatch
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import quote
+
+from content_store import open_store
+
+SITE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MARKDOWN_EXTENSIONS = ('.md', '.mdx')
+# Below this many changed files, starting worker processes costs more than parsing
+PARALLEL_MIN_FILES = 32
+
+# --- docusaurus.config.js / sidebars.js ---
+
+_JS_TOKEN = re.compile(r"""(?P<string>'(?:\\.|[^'\\])*'|"(?:\\.|[^"\\])*"|`(?:\\.|[^`\\])*`)"""
+                       r"""|(?P<comment>//[^\n]*|/\*.*?\*/)"""
+                       r"""|(?P<number>-?\d+(?:\.\d+)?)"""
+                       r"""|(?P<name>[A-Za-z_$][\w$.]*)"""
+                       r"""|(?P<punct>[{}\[\]:,()=?;])"""
+                       r"""|(?P<other>\S)""", re.S)
+
+def _js_tokens(text):
+    """(kind, value) tokens of JavaScript source, comments dropped"""
+    for match in _JS_TOKEN.finditer(text):
+        kind = match.lastgroup
+        if kind == 'comment':
+            continue
+        value = match.group()
+        if kind == 'string':
+            value = re.sub(r'\\(.)', r'\1', value[1:-1])
+        yield kind, value
+
+def parse_js_literal(text):
+    """Python value of the first object literal assigned in `text` (module.exports = {...})
+
+    Objects, arrays, strings, numbers and true/false/null; anything else
+    (function calls, expressions) becomes None, so data-only files such as
+    sidebars.js parse fully and docusaurus.config.js keeps its literal values.
+    """
+    tokens = list(_js_tokens(text))
+    start = next((i + 1 for i, (kind, value) in enumerate(tokens) if value == '='), 0)
+    value, _ = _parse_value(tokens, start)
+    return value
+
+def _parse_value(tokens, i):
+    kind, value = tokens[i]
+    if value == '{':
+        return _parse_container(tokens, i + 1, '}', {})
+    if value == '[':
+        return _parse_container(tokens, i + 1, ']', [])
+    if kind == 'string':
+        return value, i + 1
+    if kind == 'number':
+        return float(value) if '.' in value else int(value), i + 1
+    if kind == 'name' and value in ('true', 'false', 'null'):
+        return {'true': True, 'false': False, 'null': None}[value], i + 1
+    return None, _skip_expression(tokens, i)
+
+def _parse_container(tokens, i, close, container):
+    while tokens[i][1] != close:
+        if tokens[i][1] == ',':
+            i += 1
+            continue
+        if isinstance(container, dict):
+            key = tokens[i][1]
+            if tokens[i + 1][1] != ':':   # method or shorthand property
+                i = _skip_expression(tokens, i)
+                continue
+            container[key], i = _parse_value(tokens, i + 2)
+        else:
+            value, i = _parse_value(tokens, i)
+            container.append(value)
+    return container, i + 1
+
+def _skip_expression(tokens, i):
+    """Index of the ',' or closing bracket that ends the expression at `i`"""
+    depth = 0
+    while i < len(tokens):
+        value = tokens[i][1]
+        if value in '{[(':
+            depth += 1
+        elif value in '}])':
+            if not depth:
+                return i
+            depth -= 1
+        elif value == ',' and not depth:
+            return i
+        i += 1
+    return i
+
+def _find_key(value, key):
+    """First value stored under `key` anywhere in a parsed literal"""
+    if isinstance(value, dict):
+        if key in value:
+            return value[key]
+        value = value.values()
+    if isinstance(value, (list, type({}.values()))):
+        for item in value:
+            found = _find_key(item, key)
+            if found is not None:
+                return found
+    return None
+
+def load_site_config(root=SITE_ROOT, base_url=None):
+    """Routing settings of a Docusaurus site (JSON-serializable, shared with worker processes)"""
+    config_path = os.path.join(root, 'docusaurus.config.js')
+    with open(config_path, 'r', encoding='utf-8') as f:
+        source = f.read()
+    config = parse_js_literal(source) or {}
+    if not base_url:
+        # `url` is often an environment-dependent expression: use its public literal
+        match = re.search(r"^\s*url:(.*)$", source, re.M)
+        urls = re.findall(r"""['"](https?://[^'"]+)['"]""", match.group(1)) if match else []
+        public = [url for url in urls if 'localhost' not in url]
+        base_url = (public or urls or ['http://localhost:3000'])[0]
+    docs = _find_key(config.get('presets'), 'docs')
+    blog = _find_key(config.get('presets'), 'blog')
+    sitemap = _find_key(config.get('presets'), 'sitemap') or {}
+    # sidebarPath is usually require.resolve('./sidebars.js'), which is not a literal
+    match = re.search(r"sidebarPath:\s*(?:require\.resolve\()?\s*['\"]([^'\"]+)", source)
+    sidebar_path = match.group(1) if match else 'sidebars.js'
+    return {
+        'root': os.path.abspath(root),
+        'url': base_url.rstrip('/'),
+        'base_url': config.get('baseUrl') or '/',
+        'title': config.get('title') or '',
+        'trailing_slash': config.get('trailingSlash'),
+        'docs_path': None if docs is False else (docs or {}).get('path', 'docs'),
+        'docs_route': (docs or {}).get('routeBasePath', 'docs'),
+        'blog_path': None if blog is False else (blog or {}).get('path', 'blog'),
+        'blog_route': (blog or {}).get('routeBasePath', 'blog'),
+        'ignore_patterns': sitemap.get('ignorePatterns') or [],
+        'sidebars': load_sidebars(os.path.join(root, sidebar_path)),
+    }
+
+def load_sidebars(path):
+    """{doc id: {'sidebar', 'categories', 'position'}} plus autogenerated directory rules"""
+    if not os.path.exists(path):
+        return {'docs': {}, 'autogenerated': []}
+    with open(path, 'r', encoding='utf-8') as f:
+        sidebars = parse_js_literal(f.read()) or {}
+    docs, autogenerated = {}, []
+
+    def walk(sidebar, items, categories):
+        for item in items if isinstance(items, list) else [items]:
+            if isinstance(item, str):
+                docs.setdefault(item, {'sidebar': sidebar, 'categories': categories, 'position': len(docs)})
+            elif not isinstance(item, dict):
+                continue
+            elif item.get('type') in ('doc', 'ref'):
+                walk(sidebar, item.get('id'), categories)
+            elif item.get('type') == 'category':
+                label = categories + [item.get('label', '')]
+                link = item.get('link') or {}
+                if link.get('type') == 'doc':
+                    walk(sidebar, link.get('id'), label)
+                walk(sidebar, item.get('items', []), label)
+            elif item.get('type') == 'autogenerated':
+                autogenerated.append({'dir': item.get('dirName', '.'), 'sidebar': sidebar,
+                                      'categories': categories})
+            elif 'type' not in item:
+                # Shorthand categories: {'Label': [items]}
+                for label, sub_items in item.items():
+                    walk(sidebar, sub_items, categories + [label])
+
+    for name, items in sidebars.items() if isinstance(sidebars, dict) else ():
+        walk(name, items, [])
+    return {'docs': docs, 'autogenerated': autogenerated}
+
+# --- Markdown / MDX ---
+
+_FRONT_MATTER = re.compile(r'\A---[ \t]*\r?\n(.*?)\r?\n---[ \t]*(?:\r?\n|\Z)', re.S)
+_HEADING = re.compile(r'^(#{1,6})\s+(.*?)\s*#*\s*$')
+_HEADING_ID = re.compile(r'\s*\{#[^}]*\}$')
+_FENCE = re.compile(r'^\s*(```+|~~~+)')
+_INLINE = [
+    (re.compile(r'<!--.*?-->|\{/\*.*?\*/\}'), ''),              # HTML / MDX comments
+    (re.compile(r'!\[[^\]]*\]\([^)]*\)'), ''),                  # images
+    (re.compile(r'\[([^\]]*)\]\([^)]*\)'), r'\1'),              # links keep their text
+    (re.compile(r'</?[A-Za-z][^<>]*>'), ''),                    # HTML / JSX tags
+    (re.compile(r'(\*\*|__)(.+?)\1'), r'\2'),                   # bold
+    (re.compile(r'(?<![\w*])\*(?!\s)(.+?)(?<!\s)\*(?![\w*])'), r'\1'),   # italics
+    (re.compile(r'`([^`]*)`'), r'\1'),                          # inline code
+]
+_BLOCK_PREFIX = re.compile(r'^\s*(?:>\s*)*(?:[-*+]\s+(?:\[[ xX]\]\s+)?|\d+[.)]\s+)?')
+
+def parse_front_matter(text):
+    """(front matter dict, body) for the flat YAML subset Docusaurus front matter uses"""
+    match = _FRONT_MATTER.match(text)
+    if not match:
+        return {}, text
+    front_matter = {}
+    for line in match.group(1).splitlines():
+        key, sep, value = line.partition(':')
+        if not sep or not key.strip() or line[:1].isspace() or key.lstrip().startswith('#'):
+            continue   # nested mappings and list items are not needed for routing
+        front_matter[key.strip()] = _yaml_scalar(value.strip())
+    return front_matter, text[match.end():]
+
+def _yaml_scalar(value):
+    if value.startswith('[') and value.endswith(']'):
+        return [_yaml_scalar(item.strip()) for item in value[1:-1].split(',') if item.strip()]
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in '\'"':
+        return value[1:-1]
+    if value in ('true', 'false'):
+        return value == 'true'
+    if re.fullmatch(r'-?\d+', value):
+        return int(value)
+    return value
+
+def _inline_text(text):
+    for pattern, replacement in _INLINE:
+        text = pattern.sub(replacement, text)
+    return text.strip()
+
+def markdown_page(text):
+    """(front matter, title, headings, content lines, description) of a Markdown/MDX file
+
+    Content keeps prose and code as plain text lines; MDX imports/exports,
+    comments, admonition fences and JSX/HTML tags are dropped.
+    """
+    front_matter, body = parse_front_matter(text)
+    headings, lines, paragraphs = [], [], []
+    fence = None
+    in_comment = False
+    for raw in body.splitlines():
+        stripped = raw.strip()
+        fence_match = _FENCE.match(raw)
+        if fence is not None:
+            if fence_match and fence_match.group(1)[0] == fence[0] and len(fence_match.group(1)) >= len(fence):
+                fence = None
+            elif stripped:
+                lines.append(stripped)
+            continue
+        if fence_match:
+            fence = fence_match.group(1)
+            continue
+        if in_comment:
+            in_comment = '-->' not in stripped and '*/}' not in stripped
+            continue
+        if stripped.startswith(('<!--', '{/*')) and not stripped.endswith(('-->', '*/}')):
+            in_comment = True
+            continue
+        if not stripped or re.match(r'^(import|export)\s', stripped) or re.fullmatch(r'[|\s:-]+', stripped):
+            continue
+        if stripped.startswith(':::'):
+            stripped = stripped.lstrip(':').partition(' ')[2]   # keep an admonition's title
+        heading = _HEADING.match(stripped)
+        if heading:
+            heading_text = _inline_text(_HEADING_ID.sub('', heading.group(2)))
+            headings.append({'level': f"h{len(heading.group(1))}", 'text': heading_text})
+            lines.append(heading_text)
+            continue
+        if stripped.startswith('|'):
+            stripped = ' '.join(cell.strip() for cell in stripped.strip('|').split('|'))
+        line = _inline_text(_BLOCK_PREFIX.sub('', stripped))
+        if line:
+            lines.append(line)
+            paragraphs.append(line)
+
+    title = front_matter.get('title') or next(
+        (heading['text'] for heading in headings if heading['level'] == 'h1'), None)
+    if title and not any(heading['level'] == 'h1' for heading in headings):
+        # Docusaurus renders the front matter title as the page's h1
+        headings.insert(0, {'level': 'h1', 'text': title})
+        lines.insert(0, title)
+    description = front_matter.get('description') or (paragraphs[0] if paragraphs else '')
+    return front_matter, title, headings, lines, description
+
+# --- routing ---
+
+def _strip_number_prefix(name):
+    """`01-intro` → `intro`, as Docusaurus does for docs file and folder names"""
+    match = re.match(r'^\d+\s*[-_.]+\s*([^-_.\s].*)$', name)
+    return match.group(1) if match else name
+
+def _join_route(*parts):
+    route = '/'.join(str(part).strip('/') for part in parts if part and str(part).strip('/'))
+    return '/' + route
+
+def page_url(settings, route):
+    """Absolute URL of a route under the site's url and baseUrl"""
+    route = _join_route(settings['base_url'], route)
+    if settings['trailing_slash'] and not route.endswith('/'):
+        route += '/'
+    return settings['url'] + quote(route)
+
+def doc_route(settings, rel_path, front_matter):
+    """(doc id, route) of a file under the docs directory"""
+    parts = rel_path.replace(os.sep, '/').split('/')
+    directories = [_strip_number_prefix(part) for part in parts[:-1]]
+    stem = os.path.splitext(parts[-1])[0]
+    name = str(front_matter.get('id') or _strip_number_prefix(stem))
+    doc_id = '/'.join(directories + [name])
+    slug = front_matter.get('slug')
+    if slug is not None:
+        slug = str(slug)
+        route = slug if slug.startswith('/') else _join_route(*directories, slug)
+    elif stem.lower() in ('index', 'readme') or (directories and stem == parts[-2]):
+        route = _join_route(*directories)   # a category's index page
+    else:
+        route = _join_route(doc_id)
+    return doc_id, _join_route(settings['docs_route'], route)
+
+def blog_route(settings, rel_path, front_matter):
+    """(date, route) of a blog post: front matter slug, else /blog/YYYY/MM/DD/name"""
+    parts = rel_path.replace(os.sep, '/').split('/')
+    stem = os.path.splitext(parts[-1])[0]
+    name = parts[-2] if stem == 'index' and len(parts) > 1 else stem
+    match = re.match(r'^(\d{4})[-/](\d{2})[-/](\d{2})[-/]?(.*)$', name)
+    date = '-'.join(match.groups()[:3]) if match else None
+    if front_matter.get('date'):
+        date = str(front_matter['date'])[:10]
+    slug = front_matter.get('slug')
+    if slug is not None:
+        route = str(slug)
+    elif match:
+        route = _join_route(*match.groups()[:3], match.group(4) or name)
+    else:
+        route = _join_route(*parts[:-2], name) if stem == 'index' else _join_route(*parts[:-1], stem)
+    return date, _join_route(settings['blog_route'], route)
+
+def _sidebar_entry(settings, doc_id):
+    sidebars = settings['sidebars']
+    if doc_id in sidebars['docs']:
+        return sidebars['docs'][doc_id]
+    for rule in sidebars['autogenerated']:
+        prefix = rule['dir'].strip('/')
+        if prefix in ('', '.') or doc_id.startswith(prefix + '/'):
+            # Subfolders become categories, labelled by their _category_.json
+            parts = doc_id.split('/')
+            skip = len(prefix.split('/')) if prefix not in ('', '.') else 0
+            labels = [settings['category_labels'].get('/'.join(parts[:depth + 1]), parts[depth])
+                      for depth in range(skip, len(parts) - 1)]
+            return {'sidebar': rule['sidebar'], 'categories': rule['categories'] + labels, 'position': None}
+    return None
+
+# --- sources ---
+
+def discover_sources(settings, build_dir=None):
+    """[(kind, absolute path, path relative to the site root)] of the files to ingest
+
+    Docs and blog posts as 'doc' / 'blog' (partials and tests skipped as
+    Docusaurus does), or with `build_dir` every built page as 'html' except
+    assets and 404 (the sitemap's ignorePatterns are applied when parsing).
+    """
+    root = settings['root']
+    sources = []
+    if build_dir:
+        for dirpath, dirnames, filenames in os.walk(build_dir):
+            dirnames[:] = sorted(d for d in dirnames if d != 'assets')
+            for filename in sorted(filenames):
+                path = os.path.join(dirpath, filename)
+                if filename.endswith('.html') and filename != '404.html':
+                    sources.append(('html', path, os.path.relpath(path, root)))
+        return sources
+    for kind, directory in (('doc', settings['docs_path']), ('blog', settings['blog_path'])):
+        if not directory:
+            continue
+        directory = os.path.join(root, directory)
+        for dirpath, dirnames, filenames in os.walk(directory):
+            dirnames[:] = sorted(d for d in dirnames if not d.startswith('_') and d != '__tests__')
+            for filename in sorted(filenames):
+                if (filename.endswith(MARKDOWN_EXTENSIONS) and not filename.startswith('_')
+                        and '.test.' not in filename):
+                    path = os.path.join(dirpath, filename)
+                    sources.append((kind, path, os.path.relpath(path, root)))
+    return sources
+
+def _category_labels(settings):
+    """{docs-relative folder: label} from the _category_.json / .yml files"""
+    labels = {}
+    docs_dir = os.path.join(settings['root'], settings['docs_path'])
+    for dirpath, _, filenames in os.walk(docs_dir):
+        if '_category_.json' in filenames:
+            with open(os.path.join(dirpath, '_category_.json'), 'r', encoding='utf-8') as f:
+                label = json.load(f).get('label')
+        elif '_category_.yml' in filenames:
+            with open(os.path.join(dirpath, '_category_.yml'), 'r', encoding='utf-8') as f:
+                label = parse_front_matter('---\n' + f.read() + '\n---\n')[0].get('label')
+        else:
+            continue
+        rel = os.path.relpath(dirpath, docs_dir).replace(os.sep, '/')
+        labels['/'.join(_strip_number_prefix(part) for part in rel.split('/'))] = label
+    return labels
+
+def settings_fingerprint(settings):
+    """Hash of everything besides a file's own bytes that shapes its page (URLs, sidebar data)"""
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+def load_source(settings, kind, path, rel, known_hash=None):
+    """Read and parse one source file (runs in a worker process)
+
+    Returns ('unchanged', rel, source info) when its hash is `known_hash`,
+    ('skipped', rel, None) for drafts and ignored routes, else ('page', url, page).
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    stat = os.stat(path)
+    source = {'kind': kind, 'path': rel.replace(os.sep, '/'), 'mtime_ns': stat.st_mtime_ns,
+              'size': stat.st_size, 'sha256': hashlib.sha256(data).hexdigest(),
+              'settings': settings['fingerprint']}
+    if source['sha256'] == known_hash:
+        return 'unchanged', rel, source
+
+    if kind == 'html':
+        from ingest_pipeline import html_route, parse_document
+        route = html_route(settings['build_dir'], path)
+        if _ignored(settings, route):
+            return 'skipped', rel, None
+        url = page_url(settings, route)
+        page = parse_document(url, data)
+        page['source'] = source
+        return 'page', url, page
+
+    text = data.decode('utf-8', errors='replace')
+    front_matter, title, headings, lines, description = markdown_page(text)
+    if front_matter.get('draft') is True:
+        return 'skipped', rel, None
+    metadata = {'description': description}
+    if kind == 'doc':
+        docs_rel = os.path.relpath(path, os.path.join(settings['root'], settings['docs_path']))
+        doc_id, route = doc_route(settings, docs_rel, front_matter)
+        title = title or doc_id.rsplit('/', 1)[-1]
+        entry = _sidebar_entry(settings, doc_id)
+        metadata['doc_id'] = doc_id
+        if entry:
+            metadata['sidebar'] = entry['sidebar']
+            metadata['categories'] = entry['categories']
+        if 'sidebar_position' in front_matter:
+            metadata['sidebar_position'] = front_matter['sidebar_position']
+    else:
+        blog_rel = os.path.relpath(path, os.path.join(settings['root'], settings['blog_path']))
+        date, route = blog_route(settings, blog_rel, front_matter)
+        title = title or os.path.splitext(os.path.basename(path))[0]
+        if date:
+            metadata['date'] = date
+        for key in ('authors', 'tags'):
+            if front_matter.get(key):
+                metadata[key] = front_matter[key]
+    if front_matter.get('tags') and kind == 'doc':
+        metadata['tags'] = front_matter['tags']
+
+    url = page_url(settings, route)
+    page = {
+        'url': url,
+        'title': f"{title} | {settings['title']}" if settings['title'] else title,
+        'headings': headings,
+        'content': '\n'.join(lines),
+        'metadata': metadata,
+        'source': source,
+    }
+    return 'page', url, page
+
+def _load_source_args(args):
+    return load_source(*args)
+
+def _ignored(settings, route):
+    return any(fnmatch.fnmatch('/' + route.strip('/'), pattern.replace('**', '*'))
+               for pattern in settings['ignore_patterns'])
+
+class SourceIngester:
+    """Keeps a content store in sync with a Docusaurus source tree (or its build output)
+
+    Pass an enhancer opened on the same store to update its index page by page.
+    """
+    def __init__(self, store, enhancer=None, site_root=SITE_ROOT, base_url=None,
+                 build_dir=None, parse_workers=None):
+        self.store = store
+        self.enhancer = enhancer
+        self.site_root = site_root
+        self.base_url = base_url
+        self.build_dir = build_dir
+        self.parse_workers = parse_workers or os.cpu_count() or 1
+        self.stats = {}
+        self.changed_urls = []    # pages written or removed by the last run
+        self.recorded_urls = []   # pages whose file was touched but unchanged: only the mtime stored
+
+    def run(self):
+        start = time.perf_counter()
+        settings = load_site_config(self.site_root, self.base_url)
+        settings['category_labels'] = _category_labels(settings) if settings['docs_path'] else {}
+        settings['build_dir'] = self.build_dir and os.path.abspath(os.path.join(self.site_root, self.build_dir))
+        settings['fingerprint'] = settings_fingerprint(settings)
+        sources = discover_sources(settings, settings['build_dir'])
+        kinds = {kind for kind, _, _ in sources} or ({'html'} if self.build_dir else {'doc', 'blog'})
+        known = self._known_sources(kinds)
+        stats = {'files': len(sources), 'unchanged': 0, 'parsed': 0, 'skipped': 0, 'removed': 0}
+
+        # Unchanged mtime and size (and settings): skipped on a stat alone
+        todo = []
+        for kind, path, rel in sources:
+            url, source = known.get(rel.replace(os.sep, '/'), (None, None))
+            stat = os.stat(path)
+            if (source and source['mtime_ns'] == stat.st_mtime_ns and source['size'] == stat.st_size
+                    and source.get('settings') == settings['fingerprint']):
+                stats['unchanged'] += 1
+                continue
+            same_settings = source and source.get('settings') == settings['fingerprint']
+            todo.append((settings, kind, path, rel, source['sha256'] if same_settings else None))
+
+        if len(todo) >= PARALLEL_MIN_FILES and self.parse_workers > 1:
+            with ProcessPoolExecutor(self.parse_workers) as pool:
+                chunksize = max(1, len(todo) // (self.parse_workers * 4))
+                results = list(pool.map(_load_source_args, todo, chunksize=chunksize))
+        else:
+            results = [load_source(*args) for args in todo]
+
+        pages, touched, stale_urls = {}, {}, []
+        for (_, _, _, rel, _), (status, key, value) in zip(todo, results):
+            rel = rel.replace(os.sep, '/')
+            old_url = known.get(rel, (None, None))[0]
+            if status == 'unchanged':
+                # Touched but identical: only the recorded mtime moves
+                touched[old_url] = value
+                stats['unchanged'] += 1
+                continue
+            if status == 'skipped':
+                stats['skipped'] += 1
+            else:
+                pages[key] = value
+                stats['parsed'] += 1
+            if old_url and old_url != key:
+                stale_urls.append(old_url)   # slug changed, or the file is now a draft
+        seen = {rel.replace(os.sep, '/') for _, _, rel in sources}
+        stale_urls += [url for rel, (url, _) in known.items() if rel not in seen]
+        stale_urls = [url for url in stale_urls if url not in pages]
+
+        # Touched but identical: record the new mtime, no reindex and not reported as changed
+        recorded = {}
+        for url, source in touched.items():
+            page = self.store.get(url)
+            if page is not None and url not in pages:
+                recorded[url] = dict(page, source=source)
+        self._write(pages, stale_urls, recorded)
+        stats['removed'] = len(stale_urls)
+        stats['seconds'] = time.perf_counter() - start
+        self.stats = stats
+        self.changed_urls = list(pages) + stale_urls
+        self.recorded_urls = list(recorded)
+        print(f"📚 {stats['files']} source files: {stats['parsed']} parsed, {stats['unchanged']} unchanged, "
+              f"{stats['removed']} removed in {stats['seconds'] * 1000:.0f} ms")
+        return stats
+
+    def _known_sources(self, kinds):
+        """{source path: (url, source info)} of the stored pages ingested from these kinds"""
+        pages = self.store.summaries() if hasattr(self.store, 'summaries') else self.store.items()
+        return {page['source']['path']: (url, page['source']) for url, page in pages
+                if isinstance(page.get('source'), dict) and page['source'].get('kind') in kinds}
+
+    def _write(self, pages, stale_urls, recorded=None):
+        """Store changed pages and source-only updates (`recorded`), drop stale ones, update the index"""
+        stored = {**(recorded or {}), **pages}
+        if stored:
+            if hasattr(self.store, 'put_many'):
+                self.store.put_many(stored)
+            else:
+                for url, page in stored.items():
+                    self.store.put(url, page)
+        for url in stale_urls:
+            self.store.delete(url)
+        # The enhancer should be opened on the same store, so only its index needs updating
+        if self.enhancer is not None:
+            for url, page in pages.items():
+                self.enhancer.index_page(url, page)
+            for url in stale_urls:
+                self.enhancer.remove_page(url)
+
+def ingest_site(content_file='scraped_content.db', site_root=SITE_ROOT, build_dir=None, base_url=None):
+    """Sync `content_file` with the site's sources (or build output); returns the run's stats"""
+    store = open_store(content_file)
+    try:
+        return SourceIngester(store, site_root=site_root, base_url=base_url, build_dir=build_dir).run()
+    finally:
+        store.close()
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    options = {}
+    for flag in ('--build', '--base-url'):
+        if flag in args:
+            at = args.index(flag)
+            options[flag] = args[at + 1]
+            del args[at:at + 2]
+    build_dir, base_url = options.get('--build'), options.get('--base-url')
+    site_root = args[0] if args else SITE_ROOT
+    content_file = args[1] if len(args) > 1 else 'scraped_content.db'
+    ingest_site(content_file, site_root, build_dir, base_url)
@@ -0,0 +1,338 @@
+"""
+Federated Multi-Site Retrieval
+Purpose: Serve answers over many doc sites from per-site index shards that are
+built, refreshed and loaded independently
+
+Each SiteShard is one site: its own content store, index snapshot and scraper.
+A ShardRouter fans a query out to every shard in parallel (threads, or one
+process pool per shard), waits at most each shard's deadline, and merges the
+top-k by normalized score. BM25 scores depend on each index's document
+frequencies, so a shard's scores are divided by that query's highest possible
+score in that shard (InvertedIndex.score_bound) before merging.
+
+Every shard has its own executor: a slow or huge site can only queue behind
+itself. Up to `queue_per_shard` searches wait for a busy shard's workers
+(still within the deadline); past that the shard is skipped, and the skip is
+reported in the statuses and the prompt status.
+
+Usage: python federation.py sites.json search "query" [k]
+       python federation.py sites.json crawl|refresh|reindex [site] [max_pages]
+
+sites.json: {"deadline": 0.5, "mode": "thread", "workers_per_shard": 2, "sites": [{"name": "docusaurus",
+  "base_url": "https://docusaurus.io", "content_file": "docusaurus.db"}, ...]}
+A site with "source_root" (a local Docusaurus checkout) is ingested from its
+Markdown sources by docs_source.py instead of crawled.
+"""
+
+import heapq
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from llm_enhancer import context_parts, format_prompt
+from instrumentation import inc, observe, span
+
+class SiteShard:
+    """One site's content store and index, loaded, refreshed and reindexed on its own"""
+    def __init__(self, name, base_url, content_file, index_snapshot=None, deadline=None,
+                 source_root=None, build_dir=None):
+        self.name = name
+        self.base_url = base_url
+        self.content_file = content_file
+        # Snapshots make a shard load (and a process worker start) in milliseconds
+        self.index_snapshot = index_snapshot or content_file + '.idx'
+        self.deadline = deadline   # seconds; None uses the router's
+        # A local Docusaurus checkout (or its build/) is ingested instead of crawled
+        self.source_root = source_root
+        self.build_dir = build_dir
+        self.runtime = None
+        self.update_lock = threading.Lock()   # one crawl / refresh / reindex at a time
+
+    def config(self):
+        """Constructor arguments, e.g. to rebuild the shard in a worker process"""
+        return {'name': self.name, 'base_url': self.base_url, 'content_file': self.content_file,
+                'index_snapshot': self.index_snapshot, 'deadline': self.deadline,
+                'source_root': self.source_root, 'build_dir': self.build_dir}
+
+    def load(self):
+        if self.runtime is None:
+            from runtime_demo import RuntimeScrapingLLM
+            self.runtime = RuntimeScrapingLLM(self.base_url, self.content_file,
+                                              index_snapshot=self.index_snapshot)
+        return self
+
+    @property
+    def enhancer(self):
+        return self.load().runtime.enhancer
+
+    def __len__(self):
+        return len(self.enhancer.content_db)
+
+    def search(self, query, k=10):
+        """(top-k results, score bound of the query in this shard)"""
+        while True:
+            enhancer = self.enhancer   # pinned: a reindex may swap it mid-query
+            with enhancer.lock:
+                # Swapped out before we got the lock: it is being closed, use the new one
+                if enhancer is self.enhancer:
+                    return enhancer.search_content(query, k), enhancer.index.score_bound(query)
+
+    def crawl(self, max_pages=100):
+        """Crawl the site from base_url and index every page found"""
+        if self.source_root:
+            return self.refresh()
+        with self.update_lock:
+            pages = self.load().runtime.scraper.crawl(max_pages=max_pages)
+            for url, content in pages.items():
+                self.enhancer.update_page(url, content)
+            self.enhancer.save_index_snapshot()
+            return list(pages)
+
+    def refresh(self, max_pages=None):
+        """Re-scrape the pages whose sitemap <lastmod> moved; other shards are untouched
+
+        With a `source_root`, changed source files are re-ingested instead.
+        """
+        with self.update_lock:
+            if self.source_root:
+                changed, stored = self._ingest_sources()
+            else:
+                changed = stored = self.load().runtime.refresh_from_sitemap(max_pages)
+            if stored:
+                self.enhancer.save_index_snapshot()   # the store moved on: keep the snapshot current
+            return changed
+
+    def _ingest_sources(self):
+        from docs_source import SourceIngester
+        enhancer = self.enhancer
+        ingester = SourceIngester(enhancer.content_db.store, enhancer, self.source_root, self.base_url,
+                                  self.build_dir)
+        ingester.run()
+        return ingester.changed_urls, ingester.changed_urls + ingester.recorded_urls
+
+    def reindex(self):
+        """Rebuild this shard's index from its store and swap it in atomically
+
+        Queries keep using the old index until the new one is complete.
+        """
+        from llm_enhancer import LLMContextEnhancer
+        with self.update_lock:
+            self.load()
+            start = time.perf_counter()
+            enhancer = LLMContextEnhancer(self.content_file)
+            enhancer.index_snapshot = self.index_snapshot
+            enhancer.save_index_snapshot()
+            old, self.runtime.enhancer = self.runtime.enhancer, enhancer
+            # A query that pinned the old enhancer holds its lock; close once it is done
+            with old.lock:
+                old.close()
+            build_ms = (time.perf_counter() - start) * 1000
+            print(f"🔁 Reindexed {self.name}: {len(enhancer.content_db)} pages in {build_ms:.0f} ms")
+            return {'pages': len(enhancer.content_db), 'build_ms': build_ms}
+
+# Process mode: every worker process holds one loaded shard
+_worker_shard = None
+
+def _init_worker(config):
+    global _worker_shard
+    _worker_shard = SiteShard(**config).load()
+
+def _worker_search(query, k):
+    return _worker_shard.search(query, k)
+
+def _worker_ready():
+    return _worker_shard.name
+
+class ShardRouter:
+    """Parallel fan-out over SiteShards with per-shard deadlines and a normalized top-k merge
+
+    mode='thread' searches the shards' in-process indexes (search releases the
+    GIL only briefly, so this suits I/O-light shards and small fan-outs);
+    mode='process' gives each shard `workers_per_shard` processes that map its
+    snapshot, for CPU-parallel scoring across many sites. Beyond the workers,
+    `queue_per_shard` searches may queue per shard before it is skipped as busy.
+    """
+    def __init__(self, shards, deadline=0.5, mode='thread', workers_per_shard=2, queue_per_shard=4):
+        if mode not in ('thread', 'process'):
+            raise ValueError(f"unknown mode {mode!r}: use 'thread' or 'process'")
+        self.shards = {shard.name: shard for shard in shards}
+        self.deadline = deadline
+        self.mode = mode
+        self.workers_per_shard = workers_per_shard
+        self.queue_per_shard = queue_per_shard
+        self.executors = {}
+        self.in_flight = {name: 0 for name in self.shards}
+        self.lock = threading.Lock()
+        for name in self.shards:
+            self._start_executor(name)
+
+    def _start_executor(self, name):
+        shard = self.shards[name]
+        if self.mode == 'process':
+            executor = ProcessPoolExecutor(self.workers_per_shard, initializer=_init_worker,
+                                           initargs=(shard.config(),))
+            for _ in range(self.workers_per_shard):
+                executor.submit(_worker_ready)   # start and load workers now, not on the first query
+        else:
+            shard.load()
+            executor = ThreadPoolExecutor(self.workers_per_shard, thread_name_prefix=f'shard-{name}')
+        old, self.executors[name] = self.executors.get(name), executor
+        if old:
+            old.shutdown(wait=False)   # queries already running finish on the old workers
+
+    def _submit(self, name, query, k):
+        """Future of one shard's search, or None while its workers and queue are full"""
+        with self.lock:
+            if self.in_flight[name] >= self.workers_per_shard + self.queue_per_shard:
+                return None
+            self.in_flight[name] += 1
+        if self.mode == 'process':
+            future = self.executors[name].submit(_worker_search, query, k)
+        else:
+            future = self.executors[name].submit(self.shards[name].search, query, k)
+        future.add_done_callback(lambda _: self._release(name))
+        return future
+
+    def _release(self, name):
+        with self.lock:
+            self.in_flight[name] -= 1
+
+    def search(self, query, k=10, sites=None, deadline=None):
+        """Merged top-k over the shards that answered in time, plus per-shard status
+
+        Each result gains 'site' and 'normalized_score' (0..1, comparable
+        across shards). Statuses are {site: {'status': 'ok' | 'timeout' |
+        'busy' | 'error', 'ms': ...}}; missing shards only shrink the result,
+        and their statuses carry 'skipped': True.
+        """
+        names = [name for name in (sites or self.shards) if name in self.shards]
+        with span('federated_search', shards=len(names)):
+            start = time.perf_counter()
+            pending, statuses = {}, {}
+            for name in names:
+                limit = deadline or self.shards[name].deadline or self.deadline
+                future = self._submit(name, query, k)
+                if future is None:
+                    statuses[name] = {'status': 'busy', 'ms': 0.0, 'skipped': True}
+                else:
+                    pending[future] = (name, start + limit)
+
+            hits = []
+            while pending:
+                now = time.perf_counter()
+                for future, (name, expires) in list(pending.items()):
+                    if expires <= now and not future.done():
+                        future.cancel()
+                        del pending[future]
+                        statuses[name] = {'status': 'timeout', 'ms': (now - start) * 1000, 'skipped': True}
+                if not pending:
+                    break
+                timeout = min(expires for _, expires in pending.values()) - now
+                done, _ = wait(pending, timeout=max(timeout, 0), return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, _ = pending.pop(future)
+                    elapsed_ms = (time.perf_counter() - start) * 1000
+                    try:
+                        results, bound = future.result()
+                    except Exception as e:
+                        print(f"❌ Shard {name} failed: {e}")
+                        statuses[name] = {'status': 'error', 'ms': elapsed_ms, 'error': str(e),
+                                          'skipped': True}
+                        continue
+                    statuses[name] = {'status': 'ok', 'ms': elapsed_ms, 'results': len(results)}
+                    observe('shard_search_seconds', elapsed_ms / 1000, site=name)
+                    for result in results:
+                        hits.append(dict(result, site=name,
+                                         normalized_score=result['relevance_score'] / bound if bound else 0.0))
+
+            for name, status in statuses.items():
+                inc('shard_queries_total', site=name, status=status['status'])
+            return heapq.nlargest(k, hits, key=lambda hit: hit['normalized_score']), statuses
+
+    def enhance_prompt(self, user_question, max_context_items=3, sites=None, deadline=None):
+        """(enhanced prompt, status) with context drawn from every shard that answered in time"""
+        with span('prompt_assembly', federated=True):
+            # A few spares cover snippets skipped as near-duplicates
+            hits, statuses = self.search(user_question, max_context_items * 3, sites, deadline)
+            context = "\n".join(context_parts(hits, max_context_items))
+            prompt, status = format_prompt(user_question, context, len(hits))
+            skipped = sorted(f"{name} ({shard['status']})" for name, shard in statuses.items()
+                             if shard.get('skipped'))
+            if skipped:
+                status += f" (skipped: {', '.join(skipped)})"
+            return prompt, status
+
+    def refresh(self, name, max_pages=None):
+        """Refresh one site; only that shard's workers are restarted"""
+        changed = self.shards[name].refresh(max_pages)
+        if changed and self.mode == 'process':
+            self._start_executor(name)
+        return changed
+
+    def reindex(self, name):
+        result = self.shards[name].reindex()
+        if self.mode == 'process':
+            self._start_executor(name)
+        return result
+
+    def close(self):
+        for executor in self.executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def load_sites(path):
+    """(shards, router options) from a sites.json; relative paths are from its directory"""
+    with open(path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    if isinstance(config, list):
+        config = {'sites': config}
+    root = os.path.dirname(os.path.abspath(path))
+    shards = []
+    for site in config['sites']:
+        site = dict(site)
+        for key in ('content_file', 'index_snapshot', 'source_root', 'build_dir'):
+            if site.get(key):
+                site[key] = os.path.join(root, site[key])
+        shards.append(SiteShard(**site))
+    options = {key: config[key] for key in ('deadline', 'mode', 'workers_per_shard', 'queue_per_shard')
+               if key in config}
+    return shards, options
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(1)
+    shards, options = load_sites(sys.argv[1])
+    command, args = sys.argv[2], sys.argv[3:]
+    if command == 'search':
+        with ShardRouter(shards, **options) as router:
+            hits, statuses = router.search(args[0], int(args[1]) if len(args) > 1 else 10)
+            for name, status in statuses.items():
+                print(f"   {name}: {status['status']} in {status['ms']:.1f} ms")
+            skipped = [name for name, status in statuses.items() if status.get('skipped')]
+            if skipped:
+                print(f"⚠️  Partial result: skipped {', '.join(skipped)}")
+            for hit in hits:
+                print(f"🔎 {hit['normalized_score']:.3f} [{hit['site']}] {hit['title']} — {hit['url']}")
+    elif command in ('crawl', 'refresh', 'reindex'):
+        # Optional site name, then max_pages for crawl / refresh
+        selected = [shard for shard in shards if not args or shard.name == args[0]] or shards
+        max_pages = int(args[-1]) if args and args[-1].isdigit() else None
+        for shard in selected:
+            if command == 'crawl':
+                print(f"🕷️  {shard.name}: {len(shard.crawl(max_pages or 100))} pages crawled")
+            elif command == 'refresh':
+                print(f"🔄 {shard.name}: {len(shard.refresh(max_pages))} pages refreshed")
+            else:
+                shard.reindex()
+    else:
+        print(__doc__)
+        sys.exit(1)
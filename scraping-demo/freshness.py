@@ -0,0 +1,134 @@
+"""
+Stale-While-Revalidate Freshness
+Purpose: Keep answers current without putting crawl latency on the query path
+
+Pages a question draws context from are served from the cache right away.
+Those last verified more than `ttl` seconds ago (or never, in this process)
+are revalidated by a background worker, so the next question sees the update.
+Only a page that is not cached at all is fetched synchronously, and only when
+its expected fetch time fits the caller's deadline; the caller never waits
+past the deadline, and a fetch that overruns finishes in the background.
+
+Fetches are single-flight: concurrent questions about the same page share one
+in-flight fetch instead of each starting their own.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from instrumentation import inc, observe, span
+
+class FreshnessPolicy:
+    """TTL, single-flight revalidation and deadline-bounded fetches around one fetch function
+
+    `revalidate(url)` refreshes a page in the cache (conditional GET and
+    upsert, e.g. RuntimeScrapingLLM.scrape_fresh_content); `is_cached(url)`
+    says whether the cache holds it.
+    """
+    def __init__(self, revalidate, is_cached, ttl=300, workers=2):
+        self.revalidate = revalidate
+        self.is_cached = is_cached
+        self.ttl = ttl
+        self.checked = {}     # url -> monotonic time of the last completed check
+        self.in_flight = {}   # url -> Future of the one running fetch
+        self.lock = threading.Lock()
+        self.fetch_seconds = None   # moving average of fetch durations, for deadline decisions
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix='revalidate')
+
+    def age(self, url):
+        """Seconds since the page was last verified, or None if never (in this process)"""
+        with self.lock:
+            checked = self.checked.get(url)
+        return None if checked is None else time.monotonic() - checked
+
+    def is_stale(self, url):
+        age = self.age(url)
+        return age is None or age > self.ttl
+
+    def fetch(self, url):
+        """Future of a fetch of `url`; joins the one already in flight"""
+        with self.lock:
+            future = self.in_flight.get(url)
+            if future is None:
+                future = self.in_flight[url] = self.executor.submit(self._run, url)
+                inc('freshness_fetches_total')
+            else:
+                inc('freshness_fetches_joined_total')
+            return future
+
+    def _run(self, url):
+        start = time.perf_counter()
+        try:
+            return self.revalidate(url)
+        finally:
+            elapsed = time.perf_counter() - start
+            observe('freshness_fetch_seconds', elapsed)
+            with self.lock:
+                # Failed checks count too: the page is retried after the TTL, not on every question
+                self.checked[url] = time.monotonic()
+                self.in_flight.pop(url, None)
+                self.fetch_seconds = elapsed if self.fetch_seconds is None else (
+                    0.8 * self.fetch_seconds + 0.2 * elapsed)
+
+    def check(self, urls, deadline=None):
+        """Apply the policy to the pages an answer will use; returns {url: outcome}
+
+        Outcomes: 'fresh'; 'stale' (served now, revalidating in the background);
+        'fetched' (was missing, fetched within the deadline); 'deferred' (was
+        missing and did not fit the deadline; fetching in the background).
+        `deadline` is the caller's budget in seconds; without one nothing is
+        fetched synchronously.
+        """
+        expires = None if deadline is None else time.perf_counter() + deadline
+        outcomes = {}
+        with span('freshness_check'):
+            missing, stale = [], []
+            for url in dict.fromkeys(urls):
+                if not self.is_cached(url):
+                    missing.append(url)
+                elif self.is_stale(url):
+                    stale.append(url)
+                else:
+                    outcomes[url] = 'fresh'
+
+            # Missing pages are queued first and start together, so the wait is
+            # for the slowest of them, not the sum or the revalidations
+            waiting = {}
+            fits = expires is not None and (self.fetch_seconds is None or
+                                            self.fetch_seconds <= expires - time.perf_counter())
+            for url in missing:
+                if fits:
+                    waiting[url] = self.fetch(url)
+                else:
+                    self.fetch(url)
+                    outcomes[url] = 'deferred'
+            for url in stale:
+                self.fetch(url)
+                outcomes[url] = 'stale'
+            for url, future in waiting.items():
+                try:
+                    future.result(timeout=max(expires - time.perf_counter(), 0))
+                    outcomes[url] = 'fetched' if self.is_cached(url) else 'deferred'
+                except TimeoutError:
+                    outcomes[url] = 'deferred'   # still running; the page lands in the cache later
+                except Exception as e:
+                    print(f"❌ Fetching {url} failed: {e}")
+                    outcomes[url] = 'deferred'
+
+        for outcome in outcomes.values():
+            inc('freshness_total', result=outcome)
+        return outcomes
+
+    def wait_idle(self, timeout=None):
+        """Wait for the background fetches started so far (tests, demos, shutdown)"""
+        with self.lock:
+            futures = list(self.in_flight.values())
+        for future in futures:
+            try:
+                future.result(timeout)
+            except Exception:
+                pass
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
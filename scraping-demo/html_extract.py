@@ -0,0 +1,179 @@
+"""
+Single-Pass HTML Extraction
+Purpose: Pull title, headings, main text, paragraphs, meta, canonical URL and links out of a page in one pass
+"""
+
+from instrumentation import span
+
+try:
+    from lxml import etree
+except ImportError:  # BeautifulSoup fallback below
+    etree = None
+
+HEADING_TAGS = frozenset(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])
+NOISE_TAGS = frozenset(['nav', 'aside', 'footer'])       # stripped from main content
+SKIP_TAGS = frozenset(['script', 'style', 'template'])   # never part of visible text
+META_NAMES = ('description', 'keywords')
+
+class _PageExtractor:
+    """SAX-style target: receives start/end/data events and never builds a tree"""
+    def __init__(self):
+        self.depth = 0
+        self.skip_depth = 0
+        self.noise_depth = 0
+        self.title_parts = None
+        self.title_done = False
+        self.heading = None            # (level, parts) while inside a heading
+        self.headings = []
+        self.paragraph = None          # parts while inside a <p>
+        self.paragraphs = []
+        # First <main> and first <article>: [parts, depth at open, noise depth at open, open?]
+        self.containers = {'main': None, 'article': None}
+        self.metadata = {}
+        self.canonical = None
+        self.links = []
+
+    def start(self, tag, attrib):
+        self.depth += 1
+        if tag in SKIP_TAGS:
+            self.skip_depth += 1
+        elif self.skip_depth:
+            pass                       # markup inside script/style/template is never rendered
+        elif tag in NOISE_TAGS:
+            self.noise_depth += 1
+        elif tag in HEADING_TAGS:
+            self.heading = (tag, [])
+        elif tag == 'p':
+            self.paragraph = []
+        elif tag == 'title' and not self.title_done:
+            self.title_parts = []
+        elif tag in self.containers and self.containers[tag] is None:
+            self.containers[tag] = [[], self.depth, self.noise_depth, True]
+        elif tag == 'meta':
+            name = attrib.get('name')
+            if name in META_NAMES and name not in self.metadata:
+                self.metadata[name] = attrib.get('content', '')
+        elif tag == 'a' and attrib.get('href') is not None:
+            self.links.append(attrib['href'])
+        elif tag == 'link' and self.canonical is None and 'canonical' in attrib.get('rel', '').lower().split():
+            self.canonical = attrib.get('href')
+
+    def end(self, tag):
+        if tag in SKIP_TAGS:
+            self.skip_depth -= 1
+        elif self.skip_depth:
+            pass
+        elif tag in NOISE_TAGS:
+            self.noise_depth -= 1
+        elif tag in HEADING_TAGS and self.heading:
+            level, parts = self.heading
+            self.headings.append({'level': level, 'text': ''.join(parts).strip()})
+            self.heading = None
+        elif tag == 'p' and self.paragraph is not None:
+            text = ''.join(self.paragraph).strip()
+            if text:
+                self.paragraphs.append(text)
+            self.paragraph = None
+        elif tag == 'title' and self.title_parts is not None:
+            self.title_done = True
+        elif tag in self.containers:
+            container = self.containers[tag]
+            if container and container[3] and container[1] == self.depth:
+                container[3] = False
+        self.depth -= 1
+
+    def data(self, text):
+        if self.skip_depth:
+            return
+        if self.title_parts is not None and not self.title_done:
+            self.title_parts.append(text)
+        if self.heading:
+            self.heading[1].append(text)
+        if self.paragraph is not None:
+            self.paragraph.append(text)
+        for container in self.containers.values():
+            if container and container[3] and self.noise_depth == container[2]:
+                container[0].append(text)
+
+    def close(self):
+        main = self.containers['main'] or self.containers['article']
+        return {
+            'title': ''.join(self.title_parts).strip() if self.title_parts is not None else "No title",
+            'headings': self.headings,
+            'content': ''.join(main[0]).strip() if main else "No main content found",
+            'paragraphs': self.paragraphs,
+            'metadata': self.metadata,
+            'canonical': self.canonical,
+            'links': self.links
+        }
+
+def extract_page(html):
+    """Extract everything the scrapers need from one HTML document (str or bytes)"""
+    return extract_stream([html])
+
+def extract_stream(chunks):
+    """Extract from an iterable of HTML chunks, e.g. `response.iter_content()`
+
+    Uses lxml's streaming target parser when available; otherwise (or if lxml
+    rejects the markup) re-parses the joined document with BeautifulSoup.
+    """
+    chunks = iter(chunks)
+    received = []
+    if etree is not None:
+        try:
+            with span('extract', extractor='lxml'):
+                parser = etree.HTMLParser(target=_PageExtractor())
+                for chunk in chunks:
+                    received.append(chunk)
+                    parser.feed(chunk)
+                return parser.close()
+        except (etree.LxmlError, ValueError):
+            pass
+    with span('extract', extractor='soup'):
+        return extract_with_soup(_join(received + list(chunks)))
+
+def extract_with_soup(html):
+    """BeautifulSoup fallback: same output, one parse, one traversal per field"""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+    # The lxml path never collects script/style/template text; drop it so get_text() agrees
+    for hidden in soup.find_all(list(SKIP_TAGS)):
+        hidden.decompose()
+
+    title_tag = soup.find('title')
+    headings = [{'level': h.name, 'text': h.get_text().strip()}
+                for h in soup.find_all(list(HEADING_TAGS))]
+    paragraphs = [text for text in (p.get_text().strip() for p in soup.find_all('p')) if text]
+    links = [a['href'] for a in soup.find_all('a', href=True)]
+    canonical_tag = soup.find(lambda tag: tag.name == 'link' and tag.has_attr('href') and
+                              'canonical' in (rel.lower() for rel in tag.get('rel', [])))
+
+    metadata = {}
+    for name in META_NAMES:
+        tag = soup.find('meta', attrs={'name': name})
+        if tag:
+            metadata[name] = tag.get('content', '')
+
+    # Last: decomposing noise mutates the tree
+    main_content = soup.find('main') or soup.find('article')
+    if main_content:
+        for noise in main_content.find_all(list(NOISE_TAGS)):
+            noise.decompose()
+        content = main_content.get_text().strip()
+    else:
+        content = "No main content found"
+
+    return {
+        'title': title_tag.text.strip() if title_tag else "No title",
+        'headings': headings,
+        'content': content,
+        'paragraphs': paragraphs,
+        'metadata': metadata,
+        'canonical': canonical_tag['href'] if canonical_tag else None,
+        'links': links
+    }
+
+def _join(chunks):
+    if chunks and isinstance(chunks[0], bytes):
+        return b''.join(chunks)
+    return ''.join(chunks)
@@ -0,0 +1,416 @@
+"""
+Index Snapshot
+Purpose: Start query-only processes in milliseconds by memory-mapping a
+prebuilt index instead of re-tokenizing every page
+
+write_snapshot() dumps the page index and the passage store into one binary
+file of flat uint32/uint64 arrays and sorted string tables. open_snapshot()
+maps it read-only and decodes nothing up front: a query only touches the
+postings, lengths and positions of its own terms and hits. A snapshot
+records the store generation it was built from and is ignored once the
+store has changed.
+
+Usage: python index_snapshot.py [scraped_content.db] [scraped_content.db.idx]
+"""
+
+import bisect
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from collections.abc import Mapping
+
+from passages import Passage, PassageStore
+from search_index import InvertedIndex
+
+MAGIC = b'SCRIDX\x00\x01'
+FORMAT_VERSION = 2   # 1 could be written with misplaced sections
+
+def store_key(store):
+    """What a snapshot must have been built from to still be valid for `store`"""
+    return [os.path.abspath(store.path), store.generation(), len(store)]
+
+def vector_path(path):
+    """Where the semantic vectors that go with snapshot `path` are saved (see vector_index.py)"""
+    return path + '.vec'
+
+# --- writing ---
+
+def _strings(name, strings):
+    """A string table: uint64 end offsets plus the concatenated UTF-8 bytes"""
+    encoded = [text.encode('utf-8') for text in strings]
+    offsets = array('Q', [0])
+    for data in encoded:
+        offsets.append(offsets[-1] + len(data))
+    return {f"{name}.offsets": offsets, f"{name}.data": b''.join(encoded)}
+
+def postings_arrays(index):
+    """(docs, terms, lengths, postings, postings_index) of an index in snapshot layout
+
+    docs and terms are sorted and numbered by position; lengths holds 3 uint32
+    field lengths per doc; postings holds 4 uint32 per entry (doc id, tf title,
+    tf headings, tf content), grouped by term and sorted by doc id; entries of
+    term i are postings_index[i]:postings_index[i + 1]. A MappedIndex returns
+    its mapped arrays without copying.
+    """
+    if isinstance(index, MappedIndex):
+        return index.docs, index.terms, index.lengths, index.postings_data, index.postings_index
+    docs = sorted(index.doc_lengths)
+    doc_ids = {url: i for i, url in enumerate(docs)}
+    terms = sorted(index.postings)
+
+    lengths = array('I')
+    for url in docs:
+        lengths.extend(index.doc_lengths[url])
+    postings = array('I')
+    postings_index = array('Q', [0])
+    for term in terms:
+        for doc, tfs in sorted((doc_ids[url], tfs) for url, tfs in index.postings[term].items()):
+            postings.append(doc)
+            postings.extend(tfs)
+        postings_index.append(len(postings) // 4)
+    return docs, terms, lengths, postings, postings_index
+
+def _index_sections(prefix, index):
+    """Sections for one InvertedIndex; docs and terms are numbered in sorted order"""
+    docs, terms, lengths, postings, postings_index = postings_arrays(index)
+    term_ids = {term: i for i, term in enumerate(terms)}
+
+    # positions, per doc: [k, k sorted term ids, k + 1 relative starts, offsets...]
+    positions = array('I')
+    positions_index = array('Q', [0])
+    for url in docs:
+        doc_positions = sorted((term_ids[term], offsets)
+                               for term, offsets in index.doc_positions[url].items())
+        positions.append(len(doc_positions))
+        positions.extend(term_id for term_id, _ in doc_positions)
+        start = 0
+        for _, offsets in doc_positions:
+            positions.append(start)
+            start += len(offsets)
+        positions.append(start)
+        for _, offsets in doc_positions:
+            positions.extend(offsets)
+        positions_index.append(len(positions))
+
+    headings = [json.dumps([[text, sorted(tokens)] for text, tokens in index.doc_headings[url]],
+                           ensure_ascii=False) for url in docs]
+    sections = {f"{prefix}.lengths": lengths, f"{prefix}.postings": postings,
+                f"{prefix}.postings_index": postings_index, f"{prefix}.positions": positions,
+                f"{prefix}.positions_index": positions_index}
+    sections.update(_strings(f"{prefix}.docs", docs))
+    sections.update(_strings(f"{prefix}.terms", terms))
+    sections.update(_strings(f"{prefix}.headings", headings))
+    return sections, {'total_lengths': list(index.total_lengths)}
+
+def _passage_sections(passages):
+    """Passage records in passage index order plus each URL's passage ids in page order"""
+    ids = sorted(passages.passages)
+    rows = {passage_id: i for i, passage_id in enumerate(ids)}
+    urls = sorted(passages.by_url)
+    url_ids = {url: i for i, url in enumerate(urls)}
+
+    records = array('I')   # url id, start, end, token count
+    for passage_id in ids:
+        passage = passages.passages[passage_id]
+        records.extend((url_ids[passage.url], passage.start, passage.end, passage.token_count))
+    by_url = array('I')
+    by_url_index = array('Q', [0])
+    for url in urls:
+        by_url.extend(rows[passage_id] for passage_id in passages.by_url[url])
+        by_url_index.append(len(by_url))
+
+    sections = {'passages.records': records, 'passages.by_url': by_url,
+                'passages.by_url_index': by_url_index}
+    sections.update(_strings('passages.urls', urls))
+    sections.update(_strings('passages.heading_texts',
+                             [passages.passages[passage_id].heading for passage_id in ids]))
+    return sections
+
+def write_snapshot(path, index, passages, key):
+    """Atomically write the page index and passage store for store key `key`"""
+    sections, pages_meta = _index_sections('pages', index)
+    passage_index_sections, passages_meta = _index_sections('passages', passages.index)
+    sections.update(passage_index_sections)
+    sections.update(_passage_sections(passages))
+
+    blobs = [(name, data.tobytes() if isinstance(data, array) else data)
+             for name, data in sections.items()]
+    header = {'format': FORMAT_VERSION, 'byteorder': sys.byteorder, 'store_key': key,
+              'max_tokens': passages.max_tokens, 'pages': pages_meta, 'passages': passages_meta}
+    # Section offsets depend on the header length, which depends on the offsets: reserve
+    # room for the header, grow it until the laid-out header fits and pad it with spaces
+    reserved = len(json.dumps(header).encode('utf-8'))
+    while True:
+        offset = len(MAGIC) + 8 + reserved
+        layout = {}
+        for name, data in blobs:
+            offset += -offset % 8   # keep every array 8-byte aligned
+            layout[name] = [offset, len(data)]
+            offset += len(data)
+        header['sections'] = layout
+        header_bytes = json.dumps(header).encode('utf-8')
+        if len(header_bytes) <= reserved:
+            header_bytes = header_bytes.ljust(reserved)
+            break
+        reserved = len(header_bytes)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(MAGIC + struct.pack('<Q', len(header_bytes)) + header_bytes)
+            for name, data in blobs:
+                f.write(b'\0' * (layout[name][0] - f.tell()))
+                f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+# --- reading ---
+
+class IndexSnapshot:
+    """A snapshot file mapped read-only; sections are zero-copy memoryviews"""
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not an index snapshot")
+        (header_length,) = struct.unpack_from('<Q', self.mm, len(MAGIC))
+        start = len(MAGIC) + 8
+        self.header = json.loads(self.mm[start:start + header_length])
+        self.view = memoryview(self.mm)
+
+    def array(self, name, typecode):
+        offset, length = self.header['sections'][name]
+        return self.view[offset:offset + length].cast(typecode)
+
+    def strings(self, name):
+        return StringTable(self.array(f"{name}.offsets", 'Q'), self.array(f"{name}.data", 'B'))
+
+class StringTable:
+    """Sorted strings read straight from the mapping; lookups are binary searches"""
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+        self.rows = {}   # memoized find(): queries look up the same terms and URLs repeatedly
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return str(self.data[self.offsets[i]:self.offsets[i + 1]], 'utf-8')
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def __contains__(self, text):
+        return self.find(text) >= 0
+
+    def find(self, text):
+        """Row of `text`, or -1"""
+        row = self.rows.get(text)
+        if row is None:
+            i = bisect.bisect_left(self, text, 0, len(self))
+            row = self.rows[text] = i if i < len(self) and self[i] == text else -1
+        return row
+
+class _RowView(Mapping):
+    """Read-only {key: value} over a StringTable, decoding one row per lookup"""
+    def __init__(self, keys, load):
+        self.keys_table = keys
+        self.load = load
+
+    def __getitem__(self, key):
+        row = self.keys_table.find(key)
+        if row < 0:
+            raise KeyError(key)
+        return self.load(row)
+
+    def __contains__(self, key):
+        return key in self.keys_table
+
+    def __iter__(self):
+        return iter(self.keys_table)
+
+    def __len__(self):
+        return len(self.keys_table)
+
+class _DocPositions(Mapping):
+    """{term: char offsets} of one document, decoded per term"""
+    def __init__(self, terms, block):
+        self.terms = terms
+        k = block[0]
+        self.term_ids = block[1:k + 1]
+        self.starts = block[k + 1:2 * k + 2]
+        self.offsets = block[2 * k + 2:]
+
+    def _slot(self, term):
+        term_id = self.terms.find(term)
+        slot = bisect.bisect_left(self.term_ids, term_id)
+        return slot if term_id >= 0 and slot < len(self.term_ids) and self.term_ids[slot] == term_id else -1
+
+    def __getitem__(self, term):
+        slot = self._slot(term)
+        if slot < 0:
+            raise KeyError(term)
+        return self.offsets[self.starts[slot]:self.starts[slot + 1]]
+
+    def __contains__(self, term):
+        return self._slot(term) >= 0
+
+    def __iter__(self):
+        return (self.terms[term_id] for term_id in self.term_ids)
+
+    def __len__(self):
+        return len(self.term_ids)
+
+class MappedIndex(InvertedIndex):
+    """Read-only InvertedIndex backed by a snapshot; thaw() returns a mutable copy"""
+    def __init__(self, snapshot, prefix, k1=1.2, b=0.75):
+        self.store_key = snapshot.header.get('store_key')   # the store state it was built from
+        self.k1 = k1
+        self.b = b
+        self.docs = snapshot.strings(f"{prefix}.docs")
+        self.terms = snapshot.strings(f"{prefix}.terms")
+        self.lengths = snapshot.array(f"{prefix}.lengths", 'I')
+        self.postings_data = snapshot.array(f"{prefix}.postings", 'I')
+        self.postings_index = snapshot.array(f"{prefix}.postings_index", 'Q')
+        self.positions_data = snapshot.array(f"{prefix}.positions", 'I')
+        self.positions_index = snapshot.array(f"{prefix}.positions_index", 'Q')
+        self.headings = snapshot.strings(f"{prefix}.headings")
+        self.total_lengths = list(snapshot.header[prefix]['total_lengths'])
+        # Same read interface as the dicts of InvertedIndex, used by matching_headings / best_window
+        self.doc_headings = _RowView(self.docs, self._doc_headings)
+        self.doc_positions = _RowView(self.docs, self._doc_positions)
+
+    def __len__(self):
+        return len(self.docs)
+
+    def __contains__(self, url):
+        return url in self.docs
+
+    def add_page(self, url, page):
+        raise TypeError("a mapped snapshot index is read-only; use thaw() to update it")
+
+    def remove_page(self, url):
+        raise TypeError("a mapped snapshot index is read-only; use thaw() to update it")
+
+    def build(self, content_db):
+        return InvertedIndex(self.k1, self.b).build(content_db)
+
+    def _postings(self, term):
+        term_id = self.terms.find(term)
+        return self._term_postings(term_id) if term_id >= 0 else ()
+
+    def _term_postings(self, term_id):
+        rows = self.postings_data[4 * self.postings_index[term_id]:
+                                  4 * self.postings_index[term_id + 1]].tolist()
+        return [(rows[i], (rows[i + 1], rows[i + 2], rows[i + 3])) for i in range(0, len(rows), 4)]
+
+    def _lengths(self, doc):
+        return tuple(self.lengths[3 * doc:3 * doc + 3])
+
+    def _doc_url(self, doc):
+        return self.docs[doc]
+
+    def _doc_headings(self, doc):
+        return [(text, set(tokens)) for text, tokens in json.loads(self.headings[doc])]
+
+    def _doc_positions(self, doc):
+        return _DocPositions(self.terms, self.positions_data[self.positions_index[doc]:
+                                                             self.positions_index[doc + 1]])
+
+    def thaw(self):
+        """Decode everything into a regular, updatable InvertedIndex"""
+        index = InvertedIndex(self.k1, self.b)
+        urls = list(self.docs)
+        for doc, url in enumerate(urls):
+            index.doc_lengths[url] = self._lengths(doc)
+            index.doc_terms[url] = set()
+            index.doc_headings[url] = self._doc_headings(doc)
+            positions = self._doc_positions(doc)
+            index.doc_positions[url] = {self.terms[term_id]: array('I', positions.offsets[
+                positions.starts[slot]:positions.starts[slot + 1]])
+                for slot, term_id in enumerate(positions.term_ids)}
+        for term_id, term in enumerate(self.terms):
+            docs = index.postings[term]
+            for doc, tfs in self._term_postings(term_id):
+                docs[urls[doc]] = tfs
+                index.doc_terms[urls[doc]].add(term)
+        index.total_lengths = list(self.total_lengths)
+        return index
+
+class MappedPassageStore(PassageStore):
+    """Read-only PassageStore backed by a snapshot; thaw() returns a mutable copy"""
+    def __init__(self, snapshot, max_tokens=200):
+        self.max_tokens = max_tokens
+        self.index = MappedIndex(snapshot, 'passages')
+        self.records = snapshot.array('passages.records', 'I')
+        self.urls = snapshot.strings('passages.urls')
+        self.heading_texts = snapshot.strings('passages.heading_texts')
+        self.rows = snapshot.array('passages.by_url', 'I')
+        self.rows_index = snapshot.array('passages.by_url_index', 'Q')
+        self.passages = _RowView(self.index.docs, self._passage)
+        self.by_url = _RowView(self.urls, self._passage_ids)
+
+    def build(self, content_db):
+        return PassageStore(self.max_tokens).build(content_db)
+
+    def add_page(self, url, page):
+        raise TypeError("a mapped passage store is read-only; use thaw() to update it")
+
+    def remove_page(self, url):
+        raise TypeError("a mapped passage store is read-only; use thaw() to update it")
+
+    def _passage(self, row):
+        url_id, start, end, token_count = self.records[4 * row:4 * row + 4]
+        return Passage(self.urls[url_id], self.heading_texts[row], start, end, token_count)
+
+    def _passage_ids(self, url_id):
+        return [self.index.docs[row]
+                for row in self.rows[self.rows_index[url_id]:self.rows_index[url_id + 1]]]
+
+    def thaw(self):
+        store = PassageStore(self.max_tokens)
+        store.index = self.index.thaw()
+        store.passages = dict(self.passages.items())
+        store.by_url = dict(self.by_url.items())
+        return store
+
+def open_snapshot(path, key, max_tokens=200):
+    """(MappedIndex, MappedPassageStore) from `path`, or None if missing or stale"""
+    try:
+        snapshot = IndexSnapshot(path)
+    except (OSError, ValueError):
+        return None
+    header = snapshot.header
+    if (header.get('format') != FORMAT_VERSION or header.get('byteorder') != sys.byteorder
+            or header.get('store_key') != key or header.get('max_tokens') != max_tokens):
+        return None
+    return MappedIndex(snapshot, 'pages'), MappedPassageStore(snapshot, max_tokens)
+
+if __name__ == "__main__":
+    import time
+    from content_store import StoreBackedContentDB, open_store
+    content_file = sys.argv[1] if len(sys.argv) > 1 else 'scraped_content.db'
+    snapshot_path = sys.argv[2] if len(sys.argv) > 2 else content_file + '.idx'
+    store = open_store(content_file)
+    start = time.perf_counter()
+    content_db = StoreBackedContentDB(store)
+    index = InvertedIndex().build(content_db)
+    passages = PassageStore().build(content_db)
+    build_ms = (time.perf_counter() - start) * 1000
+    write_snapshot(snapshot_path, index, passages, store_key(store))
+    start = time.perf_counter()
+    open_snapshot(snapshot_path, store_key(store))
+    load_ms = (time.perf_counter() - start) * 1000
+    print(f"💾 {len(index)} pages, {len(passages)} passages → {snapshot_path} "
+          f"({os.path.getsize(snapshot_path) / 2**20:.1f} MiB)")
+    print(f"⏱️  build {build_ms:.0f} ms, mapped load {load_ms:.1f} ms")
+    store.close()
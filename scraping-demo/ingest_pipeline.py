@@ -0,0 +1,333 @@
+"""
+Bulk Ingestion Pipeline
+Purpose: Reindex large site mirrors at full core count
+
+    fetch (async, I/O) → parse (ProcessPoolExecutor, CPU) → write (single writer)
+
+Bounded queues between the stages give backpressure: a slow parser stalls
+fetching instead of buffering the whole site in memory, and a stage that fails
+stops the others instead of leaving them blocked on a full queue. Input can be live URLs,
+a local directory of saved HTML or a WARC file. Near-duplicate pages are folded
+into one canonical entry by the writer (see dedup.py).
+
+Usage:
+    python ingest_pipeline.py <directory | file.warc[.gz]> [content.db] [base_url]
+"""
+
+import asyncio
+import gzip
+import hashlib
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import quote, urljoin
+
+from content_store import open_store
+from dedup import Deduplicator, page_fingerprint
+from html_extract import extract_page
+
+_DONE = object()
+
+def parse_document(url, body, headers=None, fingerprint=False):
+    """Parse one document into a content_db page (runs in a worker process)
+    
+    `body` is the response body as received (bytes, decoded with the
+    Content-Type charset); its hash matches the one SimpleDocsScraper takes of
+    `response.content`, so validators from either path compare equal.
+    With `fingerprint`, the page's MinHash signature is computed here too, so
+    the single writer only does the near-duplicate lookup.
+    """
+    headers = headers or {}
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    page = extract_page(body.decode(_charset(headers), errors='replace'))
+    document = {
+        'url': url,
+        'title': page['title'],
+        'headings': page['headings'],
+        'content': page['content'],
+        'metadata': page['metadata'],
+        'validators': {
+            'etag': headers.get('etag'),
+            'last_modified': headers.get('last-modified'),
+            'content_hash': hashlib.sha256(body).hexdigest()
+        }
+    }
+    if page['canonical']:
+        document['canonical'] = urljoin(url, page['canonical'])
+    if fingerprint:
+        document['fingerprint'] = page_fingerprint(page['content'])
+    return document
+
+def iter_directory(root, base_url=None):
+    """Yield (url, body bytes, headers) for every saved .html file under `root`
+
+    `docs/intro/index.html` maps to `<base_url>/docs/intro`, matching how a
+    static host serves the mirror.
+    """
+    root = os.path.abspath(root)
+    base = (base_url or 'file://' + quote(root)).rstrip('/')
+    for dirpath, _, filenames in os.walk(root):
+        for filename in sorted(filenames):
+            if not filename.endswith(('.html', '.htm')):
+                continue
+            path = os.path.join(dirpath, filename)
+            with open(path, 'rb') as f:
+                yield f"{base}/{quote(html_route(root, path))}", f.read(), {}
+
+def html_route(root, path):
+    """Route of a saved .html file: `docs/intro/index.html` → `docs/intro`"""
+    route = os.path.relpath(path, root).replace(os.sep, '/').rsplit('.', 1)[0]
+    if route == 'index' or route.endswith('/index'):
+        route = route[:-len('index')].rstrip('/')
+    return route
+
+def iter_warc(path):
+    """Yield (url, body bytes, headers) for each 200 text/html response record in a WARC file"""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rb') as f:
+        while True:
+            line = f.readline()
+            if not line:
+                return
+            if not line.startswith(b'WARC/'):
+                continue
+            warc_headers = _read_headers(f)
+            payload = f.read(int(warc_headers.get('content-length', 0)))
+            if warc_headers.get('warc-type') != 'response' or b'\r\n\r\n' not in payload:
+                continue
+
+            head, body = payload.split(b'\r\n\r\n', 1)
+            status_line, *header_lines = head.decode('latin-1').split('\r\n')
+            if ' 200' not in status_line:
+                continue
+            headers = {}
+            for header in header_lines:
+                name, _, value = header.partition(':')
+                headers[name.strip().lower()] = value.strip()
+            if 'html' not in headers.get('content-type', ''):
+                continue
+            if headers.get('transfer-encoding', '').lower() == 'chunked':
+                body = _dechunk(body)
+            if headers.get('content-encoding', '').lower() == 'gzip':
+                body = gzip.decompress(body)
+            yield warc_headers.get('warc-target-uri', ''), body, headers
+
+def _read_headers(f):
+    headers = {}
+    while True:
+        line = f.readline()
+        if line in (b'\r\n', b'\n', b''):
+            return headers
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+def _dechunk(body):
+    out, pos = [], 0
+    while True:
+        end = body.find(b'\r\n', pos)
+        if end == -1:
+            return b''.join(out)
+        size = int(body[pos:end].split(b';')[0] or b'0', 16)
+        if size == 0:
+            return b''.join(out)
+        out.append(body[end + 2:end + 2 + size])
+        pos = end + 2 + size + 2
+
+def _charset(headers):
+    for part in headers.get('content-type', '').split(';'):
+        name, _, value = part.strip().partition('=')
+        if name.lower() == 'charset' and value:
+            return value.strip('"')
+    return 'utf-8'
+
+class IngestPipeline:
+    """Three-stage streaming ingestion into a content store (and optionally an enhancer's index)"""
+    def __init__(self, store, enhancer=None, parse_workers=None, fetch_concurrency=16,
+                 queue_size=64, batch_size=100, dedup=True, dedup_threshold=0.8):
+        self.store = store
+        self.enhancer = enhancer
+        self.parse_workers = parse_workers or os.cpu_count() or 1
+        self.fetch_concurrency = fetch_concurrency
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        # Near-duplicate detection; seeded from the store on the first run
+        self.dedup = Deduplicator(dedup_threshold) if dedup else None
+        self.dedup_loaded = False
+        self.stats = {'fetched': 0, 'parsed': 0, 'written': 0, 'duplicates': 0, 'errors': 0}
+
+    def ingest_documents(self, documents):
+        """Ingest already-fetched (url, body, headers) documents, e.g. a mirror or WARC"""
+        return asyncio.run(self.run(documents=documents))
+
+    def ingest_urls(self, urls, scraper):
+        """Fetch live URLs through a SimpleDocsScraper's pooled, rate-limited session"""
+        return asyncio.run(self.run(urls=urls, scraper=scraper))
+
+    async def run(self, documents=None, urls=None, scraper=None):
+        start = time.perf_counter()
+        raw_queue = asyncio.Queue(self.queue_size)
+        page_queue = asyncio.Queue(self.queue_size)
+        n_parsers = self.parse_workers * 2   # keep every process busy while results are handed off
+
+        if self.dedup is not None and not self.dedup_loaded:
+            await asyncio.to_thread(self.dedup.build, self.store.items())
+            self.dedup_loaded = True
+        
+        with ProcessPoolExecutor(self.parse_workers) as pool:
+            if urls is not None:
+                producers = [asyncio.create_task(self._fetch_stage(urls, scraper, raw_queue))]
+            else:
+                producers = [asyncio.create_task(self._read_stage(documents, raw_queue))]
+            parsers = [asyncio.create_task(self._parse_stage(pool, raw_queue, page_queue))
+                       for _ in range(n_parsers)]
+            writer = asyncio.create_task(self._write_stage(page_queue))
+
+            async def drain():
+                await asyncio.gather(*producers)
+                for _ in parsers:
+                    await raw_queue.put(_DONE)
+                await asyncio.gather(*parsers)
+                await page_queue.put(_DONE)
+                await writer
+
+            # A failed stage would leave the others blocked on a full queue: cancel them and re-raise
+            tasks = [*producers, *parsers, writer, asyncio.create_task(drain())]
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            failed = next((task for task in done if not task.cancelled() and task.exception()), None)
+            if failed is not None:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                raise failed.exception()
+
+        elapsed = time.perf_counter() - start
+        self.stats['seconds'] = elapsed
+        self.stats['pages_per_second'] = self.stats['written'] / elapsed if elapsed else 0.0
+        print(f"📥 Ingested {self.stats['written']} pages in {elapsed:.1f}s "
+              f"({self.stats['pages_per_second']:.0f} pages/s, {self.parse_workers} parse workers, "
+              f"{self.stats['duplicates']} near-duplicates folded)")
+        return self.stats
+
+    async def _read_stage(self, documents, raw_queue):
+        # Reading files is cheap next to parsing, but still keep the loop responsive
+        iterator = iter(documents)
+        while True:
+            batch = await asyncio.to_thread(lambda: [doc for _, doc in zip(range(32), iterator)])
+            if not batch:
+                return
+            for document in batch:
+                self.stats['fetched'] += 1
+                await raw_queue.put(document)
+
+    async def _fetch_stage(self, urls, scraper, raw_queue):
+        url_queue = asyncio.Queue()
+        for url in urls:
+            url_queue.put_nowait(url)
+
+        def fetch(url):
+            scraper.rate_limiter.acquire(url)
+            response = scraper.session.get(url, timeout=scraper.timeout)
+            response.raise_for_status()
+            return response.content, {k.lower(): v for k, v in response.headers.items()}
+
+        async def fetcher():
+            while not url_queue.empty():
+                url = url_queue.get_nowait()
+                try:
+                    body, headers = await asyncio.to_thread(fetch, url)
+                except Exception as e:
+                    print(f"Error fetching {url}: {e}")
+                    self.stats['errors'] += 1
+                    continue
+                self.stats['fetched'] += 1
+                await raw_queue.put((url, body, headers))
+
+        await asyncio.gather(*(fetcher() for _ in range(self.fetch_concurrency)))
+
+    async def _parse_stage(self, pool, raw_queue, page_queue):
+        loop = asyncio.get_running_loop()
+        while True:
+            document = await raw_queue.get()
+            if document is _DONE:
+                return
+            url, body, headers = document
+            try:
+                page = await loop.run_in_executor(pool, parse_document, url, body, headers,
+                                                  self.dedup is not None)
+            except Exception as e:
+                print(f"Error parsing {url}: {e}")
+                self.stats['errors'] += 1
+                continue
+            self.stats['parsed'] += 1
+            await page_queue.put(page)
+
+    async def _write_stage(self, page_queue):
+        batch = {}
+        while True:
+            page = await page_queue.get()
+            if page is not _DONE:
+                batch[page['url']] = page
+            if len(batch) >= self.batch_size or (page is _DONE and batch):
+                await asyncio.to_thread(self._write_batch, batch)
+                batch = {}
+            if page is _DONE:
+                return
+
+    def _write_batch(self, batch):
+        if self.dedup is not None:
+            batch = self._collapse_duplicates(batch)
+        if hasattr(self.store, 'put_many'):
+            self.store.put_many(batch)
+        else:
+            for url, page in batch.items():
+                self.store.put(url, page)
+        # The enhancer should be opened on the same store, so only its index needs updating
+        if self.enhancer is not None:
+            for url, page in batch.items():
+                self.enhancer.index_page(url, page)
+        self.stats['written'] += len(batch)
+    
+    def _collapse_duplicates(self, batch):
+        """Keep one canonical page per near-duplicate group; others become its aliases"""
+        pages = {}
+        touched = set()
+        for url, page in batch.items():
+            canonical, alias = self.dedup.resolve(url, page)
+            touched.add(canonical)
+            if alias is None:
+                pages[canonical] = dict(page, url=canonical)
+                if canonical == url:
+                    continue
+            else:
+                self.stats['duplicates'] += 1
+            # The fetched URL may have been stored on its own before
+            pages.pop(url, None)
+            if self.store.get(url) is not None:
+                self.store.delete(url)
+                if self.enhancer is not None:
+                    self.enhancer.remove_page(url)
+        
+        # Record aliases on their canonical page, which may only be in the store
+        for canonical in touched:
+            page = pages.get(canonical) or self.store.get(canonical)
+            if page is None:
+                continue
+            aliases = self.dedup.aliases_for(canonical)
+            if aliases or page.get('aliases'):
+                pages[canonical] = dict(page, aliases=aliases)
+        return pages
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    source = sys.argv[1]
+    db_path = sys.argv[2] if len(sys.argv) > 2 else 'scraped_content.db'
+    base_url = sys.argv[3] if len(sys.argv) > 3 else None
+
+    documents = iter_directory(source, base_url) if os.path.isdir(source) else iter_warc(source)
+    store = open_store(db_path)
+    IngestPipeline(store).ingest_documents(documents)
+    store.close()
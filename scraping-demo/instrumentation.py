@@ -0,0 +1,379 @@
+"""
+Hot-Path Instrumentation
+Purpose: Show where time goes across scrape → retrieve → prompt → LLM, with
+span timings, counters and histograms, plus opt-in sampled profiling
+
+    with span('parse'):
+        ...
+    inc('fetch_bytes_total', len(body))
+    METRICS.to_prometheus()       # text exposition format
+    METRICS.to_json_lines()       # one JSON object per series
+
+Spans nest (the parent is tracked per thread / asyncio task) and can also be
+streamed as JSON lines with `METRICS.set_span_sink(path)`.
+
+Profiling is off by default. `PROFILER.configure(rate=0.01, mode='cprofile')`
+(or SCRAPER_PROFILE_RATE / SCRAPER_PROFILE_MODE / SCRAPER_PROFILE_DIR, or
+POST /debug/profile on query_service.py) profiles that share of requests with
+cProfile or tracemalloc and writes one file per sampled request.
+"""
+
+import bisect
+import contextvars
+import cProfile
+import json
+import os
+import random
+import socket
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+
+NAMESPACE = 'scraper'
+# Seconds; spans range from sub-millisecond lookups to multi-second LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0)
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+class _Span:
+    __slots__ = ('metrics', 'name', 'labels', 'fields', 'parent', 'start', 'token')
+
+    def __init__(self, metrics, name, labels):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+        self.fields = {}
+
+    def set(self, **fields):
+        """Attach extra fields to the span's JSON line (not to the histogram)"""
+        self.fields.update(fields)
+
+    def __enter__(self):
+        self.parent = _current_span.get()
+        self.token = _current_span.set(self.name)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        _current_span.reset(self.token)
+        self.metrics.observe('span_duration_seconds', elapsed, span=self.name, **self.labels)
+        if exc_type is not None:
+            self.metrics.inc('span_errors_total', span=self.name)
+        if self.metrics.span_sink is not None:
+            self.metrics.emit_span(self, elapsed, exc_type)
+        return False
+
+class _NoopSpan:
+    def set(self, **fields):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NOOP_SPAN = _NoopSpan()
+
+class Metrics:
+    """Thread-safe counters and fixed-bucket histograms keyed by name and labels"""
+    def __init__(self, buckets=DEFAULT_BUCKETS, enabled=True):
+        self.buckets = tuple(buckets)
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.counters = defaultdict(float)   # (name, labels) -> value
+        self.histograms = {}                 # (name, labels) -> [bucket counts..., +Inf count, sum]
+        self.span_sink = None
+        self.sink_lock = threading.Lock()
+
+    def span(self, name, **labels):
+        """Time a block; recorded in the span_duration_seconds histogram"""
+        if not self.enabled:
+            return _NOOP_SPAN
+        return _Span(self, name, labels)
+
+    def inc(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] += value
+
+    def observe(self, name, value, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        slot = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            histogram[slot] += 1
+            histogram[-1] += value
+
+    def set_span_sink(self, path):
+        """Append every finished span to `path` as a JSON line (None stops it)"""
+        with self.sink_lock:
+            if self.span_sink is not None:
+                self.span_sink.close()
+            self.span_sink = open(path, 'a', encoding='utf-8') if path else None
+
+    def emit_span(self, span, elapsed, exc_type=None):
+        record = {'ts': time.time(), 'span': span.name, 'parent': span.parent,
+                  'ms': round(elapsed * 1000, 3), **span.labels, **span.fields}
+        if exc_type is not None:
+            record['error'] = exc_type.__name__
+        line = json.dumps(record, default=str) + '\n'
+        with self.sink_lock:
+            if self.span_sink is not None:
+                self.span_sink.write(line)
+                self.span_sink.flush()
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def snapshot(self):
+        """Plain-data copy: {'counters': [...], 'histograms': [...]}"""
+        with self.lock:
+            counters = [{'name': name, 'labels': dict(labels), 'value': value}
+                        for (name, labels), value in self.counters.items()]
+            histograms = []
+            for (name, labels), histogram in self.histograms.items():
+                counts = histogram[:-1]
+                histograms.append({'name': name, 'labels': dict(labels), 'count': sum(counts),
+                                   'sum': histogram[-1], 'buckets': list(zip(self.buckets, counts)),
+                                   'overflow': counts[-1]})
+        return {'counters': counters, 'histograms': histograms}
+
+    def to_json_lines(self):
+        """One JSON object per counter or histogram series"""
+        snapshot = self.snapshot()
+        lines = [json.dumps({'type': 'counter', **counter}) for counter in snapshot['counters']]
+        for histogram in snapshot['histograms']:
+            histogram['p50'] = _quantile(histogram, 0.5)
+            histogram['p99'] = _quantile(histogram, 0.99)
+            lines.append(json.dumps({'type': 'histogram', **histogram}))
+        return '\n'.join(lines) + '\n' if lines else ''
+
+    def to_prometheus(self):
+        """Prometheus text exposition format"""
+        snapshot = self.snapshot()
+        out = []
+        for name in sorted({counter['name'] for counter in snapshot['counters']}):
+            out.append(f"# TYPE {NAMESPACE}_{name} counter")
+            for counter in snapshot['counters']:
+                if counter['name'] == name:
+                    out.append(f"{NAMESPACE}_{name}{_labels(counter['labels'])} {counter['value']:g}")
+        for name in sorted({histogram['name'] for histogram in snapshot['histograms']}):
+            out.append(f"# TYPE {NAMESPACE}_{name} histogram")
+            for histogram in snapshot['histograms']:
+                if histogram['name'] != name:
+                    continue
+                cumulative = 0
+                for bound, count in histogram['buckets']:
+                    cumulative += count
+                    out.append(f"{NAMESPACE}_{name}_bucket"
+                               f"{_labels(histogram['labels'], le=f'{bound:g}')} {cumulative}")
+                out.append(f"{NAMESPACE}_{name}_bucket{_labels(histogram['labels'], le='+Inf')} "
+                           f"{histogram['count']}")
+                out.append(f"{NAMESPACE}_{name}_sum{_labels(histogram['labels'])} {histogram['sum']:g}")
+                out.append(f"{NAMESPACE}_{name}_count{_labels(histogram['labels'])} {histogram['count']}")
+        return '\n'.join(out) + '\n'
+
+def _labels(labels, **extra):
+    labels = dict(labels, **extra)
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _quantile(histogram, q):
+    """Upper bucket bound holding the q-th observation (None if it overflowed)"""
+    target = q * histogram['count']
+    seen = 0
+    for bound, count in histogram['buckets']:
+        seen += count
+        if count and seen >= target:
+            return bound
+    return None
+
+METRICS = Metrics(enabled=os.getenv('SCRAPER_METRICS', '1') != '0')
+span = METRICS.span
+inc = METRICS.inc
+observe = METRICS.observe
+
+# --- fetch timings: DNS, connect, TTFB, download ---
+
+class _TimedConnectionMixin:
+    """Resolves the host once (timed as DNS), then lets urllib3 connect to each address in turn
+
+    urllib3 is handed numeric addresses, so its own getaddrinfo does no lookup
+    and its error handling and socket options still apply.
+    """
+    def _new_conn(self):
+        from urllib3.exceptions import ConnectTimeoutError
+        from urllib3.util.connection import allowed_gai_family
+        start = time.perf_counter()
+        try:
+            addresses = socket.getaddrinfo(self._dns_host.strip('[]'), self.port,
+                                           allowed_gai_family(), socket.SOCK_STREAM)
+        except (OSError, UnicodeError):
+            addresses = []
+        resolved = time.perf_counter()
+        observe('fetch_dns_seconds', resolved - start)
+        if not addresses:
+            return super()._new_conn()   # urllib3 raises its own resolution error
+
+        dns_host = self._dns_host
+        try:
+            for i, (*_, sockaddr) in enumerate(addresses):
+                self._dns_host = sockaddr[0]
+                try:
+                    sock = super()._new_conn()
+                    break
+                except ConnectTimeoutError:   # NewConnectionError too; try the next address
+                    if i == len(addresses) - 1:
+                        raise
+        finally:
+            self._dns_host = dns_host
+        observe('fetch_connect_seconds', time.perf_counter() - resolved)
+        inc('fetch_connections_total')
+        return sock
+
+def _timed_http_adapter():
+    """Build TimedHTTPAdapter on first use, so query-only processes never import requests"""
+    from requests.adapters import HTTPAdapter
+    from urllib3.connection import HTTPConnection, HTTPSConnection
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+    class TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+        pass
+
+    class TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+        pass
+
+    class TimedHTTPConnectionPool(HTTPConnectionPool):
+        ConnectionCls = TimedHTTPConnection
+
+    class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+        ConnectionCls = TimedHTTPSConnection
+
+    class TimedHTTPAdapter(HTTPAdapter):
+        """HTTPAdapter whose new connections report DNS and connect time"""
+        def init_poolmanager(self, *args, **kwargs):
+            super().init_poolmanager(*args, **kwargs)
+            self.poolmanager.pool_classes_by_scheme = {'http': TimedHTTPConnectionPool,
+                                                       'https': TimedHTTPSConnectionPool}
+
+    globals()['TimedHTTPAdapter'] = TimedHTTPAdapter
+    return TimedHTTPAdapter
+
+def __getattr__(name):
+    # `from instrumentation import TimedHTTPAdapter` builds the class lazily
+    if name == 'TimedHTTPAdapter':
+        return _timed_http_adapter()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def record_response(response, started):
+    """TTFB, download time, bytes and status of a completed requests response"""
+    ttfb = response.elapsed.total_seconds()
+    observe('fetch_ttfb_seconds', ttfb)
+    observe('fetch_download_seconds', max(0.0, time.perf_counter() - started - ttfb))
+    inc('fetch_bytes_total', len(response.content))
+    inc('fetch_responses_total', status=response.status_code)
+
+# --- sampled profiling ---
+
+class Profiler:
+    """Profiles a random `rate` share of requests with cProfile or tracemalloc"""
+    def __init__(self, rate=0.0, mode='cprofile', directory='profiles'):
+        self.rate = rate
+        self.mode = mode
+        self.directory = directory
+        self.random = random.Random()
+        self.tracemalloc_lock = threading.Lock()   # tracemalloc is process-wide
+        self.cprofile_lock = threading.Lock()      # one enabled cProfile at a time (3.12+ raises otherwise)
+        self.written = 0
+
+    def configure(self, rate=None, mode=None, directory=None):
+        if mode is not None and mode not in ('cprofile', 'tracemalloc'):
+            raise ValueError(f"unknown profile mode {mode!r}; use 'cprofile' or 'tracemalloc'")
+        if rate is not None:
+            self.rate = max(0.0, min(1.0, float(rate)))
+        self.mode = mode or self.mode
+        self.directory = directory or self.directory
+        return {'rate': self.rate, 'mode': self.mode, 'directory': self.directory}
+
+    @contextmanager
+    def maybe_profile(self, name):
+        """Profile the block if this request is sampled; free when rate is 0"""
+        if not self.rate or self.random.random() >= self.rate:
+            yield None
+            return
+        if self.mode == 'tracemalloc':
+            with self._tracemalloc(name) as path:
+                yield path
+        else:
+            with self._cprofile(name) as path:
+                yield path
+
+    def wrap(self, name, func):
+        """`func` wrapped in maybe_profile, e.g. for asyncio.to_thread"""
+        def profiled(*args, **kwargs):
+            with self.maybe_profile(name):
+                return func(*args, **kwargs)
+        return profiled
+
+    def _path(self, name, suffix):
+        os.makedirs(self.directory, exist_ok=True)
+        self.written += 1
+        inc('profiles_written_total', mode=self.mode)
+        return os.path.join(self.directory, f"{name}-{int(time.time() * 1000)}-{self.written}{suffix}")
+
+    @contextmanager
+    def _cprofile(self, name):
+        if not self.cprofile_lock.acquire(blocking=False):
+            yield None   # another request is already being profiled
+            return
+        try:
+            profiler = cProfile.Profile()
+            path = self._path(name, '.prof')
+            profiler.enable()
+            try:
+                yield path
+            finally:
+                profiler.disable()
+                profiler.dump_stats(path)
+        finally:
+            self.cprofile_lock.release()
+
+    @contextmanager
+    def _tracemalloc(self, name):
+        if not self.tracemalloc_lock.acquire(blocking=False):
+            yield None   # another request is already being traced
+            return
+        path = self._path(name, '.txt')
+        tracemalloc.start(10)
+        try:
+            yield path
+        finally:
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self.tracemalloc_lock.release()
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(f"peak {peak / 1024:.1f} KiB\n")
+                for stat in snapshot.statistics('lineno')[:25]:
+                    f.write(f"{stat}\n")
+
+PROFILER = Profiler(float(os.getenv('SCRAPER_PROFILE_RATE', '0')),
+                    os.getenv('SCRAPER_PROFILE_MODE', 'cprofile'),
+                    os.getenv('SCRAPER_PROFILE_DIR', 'profiles'))
@@ -0,0 +1,349 @@
+"""
+LLM Backend Layer
+Purpose: One shared async client for all LLM calls, with a concurrency limit,
+retries, coalescing of identical in-flight prompts and a persistent response cache
+
+Run `python llm_backend.py` for an offline throughput / tail latency benchmark
+against the stub backend.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import statistics
+import threading
+import time
+import weakref
+
+from instrumentation import inc, observe, span
+
+class TransientLLMError(Exception):
+    """A failure worth retrying (rate limit, timeout, 5xx)"""
+
+class StubBackend:
+    """Offline backend with configurable latency, for demos, tests and benchmarks
+
+    `responder(prompt)` produces the answer (echoes by default). Answers can be
+    streamed word by word at `tokens_per_second`.
+    """
+    model = 'stub'
+
+    def __init__(self, responder=None, latency=0.2, jitter=0.0, failure_rate=0.0,
+                 tokens_per_second=50.0, seed=None):
+        self.responder = responder or (lambda prompt: f"Stub answer to: {prompt[-80:]}")
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.tokens_per_second = tokens_per_second
+        self.random = random.Random(seed)
+        self.calls = 0
+
+    async def complete(self, prompt, **params):
+        self.calls += 1
+        await asyncio.sleep(self.latency + self.random.uniform(0, self.jitter))
+        if self.random.random() < self.failure_rate:
+            raise TransientLLMError("stub transient failure")
+        return self.responder(prompt)
+
+    async def stream(self, prompt, **params):
+        """Yield the answer in word-sized chunks"""
+        self.calls += 1
+        await asyncio.sleep(self.latency + self.random.uniform(0, self.jitter))
+        words = self.responder(prompt).split(' ')
+        for i, word in enumerate(words):
+            yield word if i == len(words) - 1 else word + ' '
+            await asyncio.sleep(1 / self.tokens_per_second)
+
+    def is_retryable(self, error):
+        return isinstance(error, TransientLLMError)
+
+class OpenAIBackend:
+    """OpenAI chat completions over one pooled AsyncOpenAI client per event loop"""
+    def __init__(self, model="gpt-3.5-turbo", max_tokens=None, api_key=None):
+        self.model = model
+        self.max_tokens = max_tokens
+        self.api_key = api_key or os.getenv('OPENAI_API_KEY')
+        self._clients = {}   # event loop -> AsyncOpenAI; its connections belong to that loop
+
+    async def _client(self):
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            import openai
+            client = self._clients[loop] = openai.AsyncOpenAI(api_key=self.api_key)
+            # Clients of loops that have finished are never used again
+            for old_loop, old_client in list(self._clients.items()):
+                if old_loop.is_closed() and self._clients.pop(old_loop, None) is not None:
+                    await self._close(old_client)
+        return client
+
+    async def aclose(self):
+        """Close the client of the running event loop"""
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await self._close(client)
+
+    @staticmethod
+    async def _close(client):
+        try:
+            await client.close()
+        except RuntimeError:
+            pass   # connections opened on a closed loop go away with it
+
+    def _request(self, prompt, params):
+        request = {'model': self.model, 'messages': [{"role": "user", "content": prompt}]}
+        if self.max_tokens:
+            request['max_tokens'] = self.max_tokens
+        request.update(params)
+        return request
+
+    async def complete(self, prompt, **params):
+        client = await self._client()
+        response = await client.chat.completions.create(**self._request(prompt, params))
+        return response.choices[0].message.content
+
+    async def stream(self, prompt, **params):
+        client = await self._client()
+        response = await client.chat.completions.create(stream=True, **self._request(prompt, params))
+        async for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    def is_retryable(self, error):
+        import openai
+        return isinstance(error, (openai.RateLimitError, openai.APIConnectionError,
+                                  openai.APITimeoutError, openai.InternalServerError))
+
+class ResponseCache:
+    """Persistent prompt-hash → response cache in SQLite"""
+    def __init__(self, path='llm_responses.db'):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, response TEXT NOT NULL, created REAL NOT NULL)")
+
+    @staticmethod
+    def key(model, prompt, params):
+        payload = json.dumps([model, prompt, params], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        with self.lock:
+            row = self.conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def put(self, key, response):
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?)",
+                              (key, response, time.time()))
+
+    def close(self):
+        self.conn.close()
+
+class LLMClient:
+    """Shared async front end for a backend
+
+    - at most `max_concurrency` backend calls in flight per event loop
+    - retryable failures back off exponentially with full jitter
+    - identical prompts already in flight share one backend call
+    - answers are kept in an optional persistent ResponseCache
+
+    Blocking callers (complete_sync, run_sync) all run on one long-lived
+    background loop, so they share its limit, coalescing and connections.
+    """
+    def __init__(self, backend, max_concurrency=8, max_retries=4, base_delay=0.5,
+                 max_delay=8.0, cache=None):
+        self.backend = backend
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.cache = cache
+        self.stats = {'requests': 0, 'cache_hits': 0, 'coalesced': 0, 'backend_calls': 0,
+                      'retries': 0, 'failures': 0}
+        # asyncio primitives belong to one loop: event loop -> (semaphore, in-flight tasks)
+        self._loops = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self._sync_loop = None
+
+    def _loop_state(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            state = self._loops.get(loop)
+            if state is None:
+                state = self._loops[loop] = (asyncio.Semaphore(self.max_concurrency), {})
+        return state
+
+    async def complete(self, prompt, **params):
+        """Answer one prompt"""
+        in_flight = self._loop_state()[1]
+        self.stats['requests'] += 1
+        key = ResponseCache.key(self.backend.model, prompt, params)
+
+        if self.cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.stats['cache_hits'] += 1
+                inc('llm_requests_total', outcome='cache_hit')
+                return cached
+
+        task = in_flight.get(key)
+        if task is not None:
+            self.stats['coalesced'] += 1
+            inc('llm_requests_total', outcome='coalesced')
+        else:
+            inc('llm_requests_total', outcome='backend')
+            # Its own task: a caller that is cancelled (a disconnect, a deadline) only stops
+            # waiting, the call still completes for everyone else sharing it
+            task = in_flight[key] = asyncio.ensure_future(self._call_and_cache(key, prompt, params))
+            task.add_done_callback(lambda done: in_flight.pop(key, None))
+            # Mark retrieved so waiter-less failures don't log "exception never retrieved"
+            task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        return await asyncio.shield(task)
+
+    async def _call_and_cache(self, key, prompt, params):
+        response = await self._call_with_retries(prompt, params)
+        if self.cache:
+            self.cache.put(key, response)
+        return response
+
+    async def complete_many(self, prompts, **params):
+        """Answer a batch of prompts concurrently, in order"""
+        return await asyncio.gather(*(self.complete(prompt, **params) for prompt in prompts))
+
+    async def stream(self, prompt, **params):
+        """Stream answer chunks; a cached answer is replayed as one chunk"""
+        semaphore = self._loop_state()[0]
+        self.stats['requests'] += 1
+        key = ResponseCache.key(self.backend.model, prompt, params)
+        if self.cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.stats['cache_hits'] += 1
+                inc('llm_requests_total', outcome='cache_hit')
+                yield cached
+                return
+
+        # Timed by hand: a span's context must not stay open across yields
+        inc('llm_requests_total', outcome='backend')
+        parts = []
+        start = time.perf_counter()
+        async with semaphore:
+            self.stats['backend_calls'] += 1
+            async for chunk in self.backend.stream(prompt, **params):
+                if not parts:
+                    observe('llm_first_token_seconds', time.perf_counter() - start, model=self.backend.model)
+                parts.append(chunk)
+                yield chunk
+        observe('span_duration_seconds', time.perf_counter() - start, span='llm_stream',
+                model=self.backend.model)
+        if self.cache:
+            self.cache.put(key, ''.join(parts))
+
+    def complete_sync(self, prompt, **params):
+        """Blocking wrapper for scripts that are not async"""
+        return self.run_sync(self.complete(prompt, **params))
+
+    def run_sync(self, coroutine):
+        """Run a coroutine that uses this client on its background loop and wait for the result"""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        else:
+            coroutine.close()
+            raise RuntimeError("blocking LLMClient call inside a running event loop; await it instead")
+        return asyncio.run_coroutine_threadsafe(coroutine, self._background_loop()).result()
+
+    def _background_loop(self):
+        with self._lock:
+            if self._sync_loop is None:
+                self._sync_loop = asyncio.new_event_loop()
+                threading.Thread(target=_run_forever, args=(self._sync_loop,), name='llm-client-loop',
+                                 daemon=True).start()
+            return self._sync_loop
+
+    def close(self):
+        """Close the backend's connections on the background loop and stop it"""
+        with self._lock:
+            loop, self._sync_loop = self._sync_loop, None
+        if loop is None:
+            return
+        aclose = getattr(self.backend, 'aclose', None)
+        if aclose:
+            asyncio.run_coroutine_threadsafe(aclose(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+
+    async def _call_with_retries(self, prompt, params):
+        semaphore = self._loop_state()[0]
+        attempt = 0
+        while True:
+            try:
+                async with semaphore:
+                    self.stats['backend_calls'] += 1
+                    with span('llm_call', model=self.backend.model):
+                        return await self.backend.complete(prompt, **params)
+            except Exception as e:
+                if attempt >= self.max_retries or not self.backend.is_retryable(e):
+                    self.stats['failures'] += 1
+                    raise
+                attempt += 1
+                self.stats['retries'] += 1
+                inc('llm_retries_total', model=self.backend.model)
+                await asyncio.sleep(random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt)))
+
+def _run_forever(loop):
+    asyncio.set_event_loop(loop)
+    try:
+        loop.run_forever()
+    finally:
+        loop.close()
+
+_default_clients = {}
+
+def get_default_client(model="gpt-3.5-turbo", max_tokens=None, cache_path=None):
+    """Process-wide OpenAI client, so callers stop creating one per request"""
+    key = (model, max_tokens, cache_path)
+    if key not in _default_clients:
+        cache = ResponseCache(cache_path) if cache_path else None
+        _default_clients[key] = LLMClient(OpenAIBackend(model, max_tokens), cache=cache)
+    return _default_clients[key]
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+async def benchmark(requests=200, unique_prompts=50, max_concurrency=16, latency=0.05,
+                    jitter=0.05, failure_rate=0.05):
+    """Offline throughput and tail latency against the stub backend"""
+    backend = StubBackend(latency=latency, jitter=jitter, failure_rate=failure_rate, seed=1)
+    client = LLMClient(backend, max_concurrency=max_concurrency, base_delay=0.01)
+    rng = random.Random(2)
+    prompts = [f"question {rng.randrange(unique_prompts)}" for _ in range(requests)]
+    latencies = []
+
+    async def timed(prompt):
+        start = time.perf_counter()
+        try:
+            await client.complete(prompt)
+        except TransientLLMError:
+            pass
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(timed(prompt) for prompt in prompts))
+    elapsed = time.perf_counter() - start
+
+    print(f"📏 {requests} requests, {unique_prompts} unique prompts, concurrency {max_concurrency}")
+    print(f"   throughput: {requests / elapsed:.0f} req/s")
+    print(f"   latency p50: {statistics.median(latencies) * 1000:.0f} ms, "
+          f"p99: {_percentile(latencies, 99) * 1000:.0f} ms")
+    print(f"   stats: {client.stats}")
+    return client.stats
+
+if __name__ == "__main__":
+    asyncio.run(benchmark())
@@ -3,120 +3,423 @@ LLM Context Enhancement using Scraped Content
 Purpose: Use scraped content to provide current context to LLM prompts
 """
 
-import json
-from simple_scraper import SimpleDocsScraper
+import threading
+
+from search_index import InvertedIndex
+from content_store import StoreBackedContentDB, open_store
+from page_records import CompactContentDB
+from query_cache import QueryCache, normalize_question
+from passages import NEAR_DUPLICATE_BITS, PassageStore, pack_passages
+from dedup import hamming_distance, simhash
+from index_snapshot import (MappedIndex, MappedPassageStore, open_snapshot, store_key, vector_path,
+                            write_snapshot)
+from instrumentation import inc, span
+
+def context_parts(relevant_content, max_context_items):
+    """Source blocks from ranked results (read lazily), skipping near-identical snippets"""
+    parts = []
+    fingerprints = []
+    for item in relevant_content:
+        if len(parts) >= max_context_items:
+            break
+        fingerprint = simhash(item['content_snippet'])
+        if any(hamming_distance(fingerprint, other) <= NEAR_DUPLICATE_BITS for other in fingerprints):
+            continue
+        fingerprints.append(fingerprint)
+        parts.append(f"""
+Source {len(parts)+1}: {item['title']}
+URL: {item['url']}
+Content: {item['content_snippet']}
+""")
+    return parts
+
+def format_prompt(user_question, context, match_count):
+    """(enhanced prompt, status) for a context block built from `match_count` matches"""
+    if not match_count:
+        return user_question, "No relevant documentation found."
+    
+    # Enhanced prompt
+    enhanced_prompt = f"""
+CONTEXT FROM DOCUMENTATION:
+{context}
+
+USER QUESTION: {user_question}
+
+Please answer the user's question using the provided documentation context when relevant. 
+If the context doesn't contain relevant information, mention that and provide general guidance.
+"""
+    
+    return enhanced_prompt, f"Found {match_count} relevant sections"
 
 class LLMContextEnhancer:
-    def __init__(self, scraped_content_file=None):
-        """Initialize with optional pre-scraped content"""
-        self.content_db = {}
+    def __init__(self, scraped_content_file=None, cache_size=1024, cache_ttl=300, compress=None,
+                 index_snapshot=None):
+        """Initialize with optional pre-scraped content
+        
+        Pages held in memory are compact PageRecords; `compress` ('zlib' or
+        'zstd') also compresses their bodies, which are then only inflated
+        for snippet and passage extraction.
+        
+        `index_snapshot` is a path for a memory-mapped index (see
+        index_snapshot.py): loading maps it when it matches the content store
+        and rebuilds and rewrites it otherwise.
+        """
+        self.compress = compress
+        self.index_snapshot = index_snapshot
+        self.content_db = CompactContentDB(compress=compress)
+        self.index = InvertedIndex()
+        self.passages = PassageStore()
+        self.semantic = None   # SemanticRetriever once enable_semantic_search() is called
+        self.hybrid_alpha = 0.5
+        # Bumped on every content change; cached query results from older versions are stale
+        self.corpus_version = 0
+        self.query_cache = QueryCache(cache_size, cache_ttl)
+        self.score_matrices = {}   # 'pages' / 'passages' -> (corpus_version, ScoreMatrix) for batch scoring
+        # Guards the index structures: a background refresh may update pages mid-query
+        self.lock = threading.RLock()
         if scraped_content_file:
             self.load_scraped_content(scraped_content_file)
     
     def load_scraped_content(self, file_path):
-        """Load previously scraped content from JSON file"""
+        """Load previously scraped content from a JSON file or SQLite content store
+        
+        Pages stay in the store; only the index is built in memory and page
+        bodies are read back on demand. With a current index snapshot not
+        even the index is built.
+        """
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                self.content_db = json.load(f)
+            store = open_store(file_path, self.compress)
+            with self.lock:
+                self.close()   # the store of a previous load, once no query is reading it
+                self.content_db = StoreBackedContentDB(store)
+            key = store_key(store)
+            mapped = self.index_snapshot and open_snapshot(self.index_snapshot, key,
+                                                           self.passages.max_tokens)
+            if mapped:
+                self.index, self.passages = mapped
+            else:
+                self.index = self.index.build(self.content_db)
+                self.passages = self.passages.build(self.content_db)
+                if self.index_snapshot:
+                    write_snapshot(self.index_snapshot, self.index, self.passages, key)
+            if self.semantic:
+                self.enable_semantic_search(self.semantic.embedder, self.semantic.ivf_lists,
+                                            self.semantic.n_probe, self.hybrid_alpha)
+            self.corpus_version += 1
             print(f"✅ Loaded {len(self.content_db)} pages from {file_path}")
         except Exception as e:
             print(f"❌ Error loading content: {e}")
     
-    def search_content(self, query_keywords):
-        """Simple keyword search in scraped content"""
-        relevant_content = []
-        query_lower = query_keywords.lower()
+    def update_page(self, url, content):
+        """Add or replace one page without rebuilding the index"""
+        with self.lock:
+            self.content_db[url] = content
+            self.index_page(url, content)
+    
+    def index_page(self, url, content):
+        """Re-index one page that is already persisted in the content store"""
+        with self.lock:
+            self._thaw()
+            if isinstance(self.content_db, StoreBackedContentDB):
+                self.content_db.remember(url, content)
+            self.index.add_page(url, content)
+            old_passages = self.passages.by_url.get(url, [])
+            self.passages.add_page(url, content)
+            if self.semantic:
+                self.semantic.remove_ids(old_passages)
+                self.semantic.add_page(url)
+            self.corpus_version += 1
+    
+    def remove_page(self, url):
+        """Drop one page from the content database and the index"""
+        with self.lock:
+            self._thaw()
+            self.content_db.pop(url, None)
+            self.index.remove_page(url)
+            if self.semantic:
+                self.semantic.remove_ids(self.passages.by_url.get(url, []))
+            self.passages.remove_page(url)
+            self.corpus_version += 1
+    
+    def save_index_snapshot(self, path=None):
+        """Write the current index as a snapshot of the content store's current state
         
-        for url, content in self.content_db.items():
-            relevance_score = 0
-            matched_sections = []
-            
-            # Check title
-            if any(keyword in content['title'].lower() for keyword in query_lower.split()):
-                relevance_score += 3
-                matched_sections.append("title")
-            
-            # Check headings
-            for heading in content['headings']:
-                if any(keyword in heading['text'].lower() for keyword in query_lower.split()):
-                    relevance_score += 2
-                    matched_sections.append(f"heading: {heading['text']}")
-            
-            # Check main content
-            if any(keyword in content['content'].lower() for keyword in query_lower.split()):
-                relevance_score += 1
-                matched_sections.append("content")
-            
-            if relevance_score > 0:
-                relevant_content.append({
-                    'url': url,
-                    'title': content['title'],
-                    'relevance_score': relevance_score,
-                    'matched_sections': matched_sections,
-                    'content_snippet': self._extract_snippet(content['content'], query_keywords)
-                })
+        After in-place updates (a refresh, a reindex) the next start can then
+        map the index again instead of rebuilding it. Returns the path written,
+        or None without a path or a content store.
+        """
+        path = path or self.index_snapshot
+        store = getattr(self.content_db, 'store', None)
+        if not path or store is None:
+            return None
+        with self.lock:
+            key = store_key(store)
+            # A mapped index is still current for the file it was mapped from, unless the
+            # store moved on without changing the index (e.g. only source mtimes recorded)
+            if not (isinstance(self.index, MappedIndex) and path == self.index_snapshot
+                    and self.index.store_key == key):
+                self._thaw()
+                write_snapshot(path, self.index, self.passages, key)
+            if self.semantic:
+                self.semantic.save(vector_path(path), key)
+        return path
+    
+    def close(self):
+        """Close the content store; the enhancer must not be used afterwards"""
+        store = getattr(self.content_db, 'store', None)
+        if store is not None:
+            store.close()
+    
+    def _thaw(self):
+        """Swap a memory-mapped snapshot index for updatable in-memory structures"""
+        if isinstance(self.index, MappedIndex):
+            self.index = self.index.thaw()
+        if isinstance(self.passages, MappedPassageStore):
+            self.passages = self.passages.thaw()
+            if self.semantic:
+                self.semantic.passages = self.passages
+    
+    def enable_semantic_search(self, embedder=None, ivf_lists=None, n_probe=None, hybrid_alpha=0.5):
+        """Build a local embedding index over the passages (needs NumPy, no network)
+        
+        Packed contexts then use hybrid ranking: keyword BM25 fused with
+        embedding similarity. `ivf_lists`/`n_probe` enable the IVF partition
+        for larger corpora. With an index snapshot the vectors are saved next
+        to it and memory-mapped on the next start instead of re-embedded.
+        """
+        from vector_index import SemanticRetriever
+        self.semantic = SemanticRetriever(self.passages, self._passage_text, embedder, n_probe)
+        store = getattr(self.content_db, 'store', None)
+        path = self.index_snapshot and store is not None and vector_path(self.index_snapshot)
+        key = store_key(store) if path else None
+        if not (path and self.semantic.load(path, key, ivf_lists)):
+            self.semantic.build(ivf_lists=ivf_lists)
+            if path:
+                self.semantic.save(path, key)
+        self.hybrid_alpha = hybrid_alpha
+        self.corpus_version += 1
+    
+    def search_passages(self, query, mode=None, k=20):
+        """Rank passages by 'keyword', 'semantic' or 'hybrid' retrieval
+        
+        Defaults to hybrid when semantic search is enabled, keyword otherwise.
+        """
+        mode = mode or ('hybrid' if self.semantic else 'keyword')
+        with self.lock, span('index_lookup', index=mode):
+            if mode == 'keyword':
+                return self.passages.search(query, k)
+            if not self.semantic:
+                raise ValueError("call enable_semantic_search() before semantic retrieval")
+            if mode == 'semantic':
+                return self.semantic.search(query, k)
+            from vector_index import fuse_scores
+            fused = fuse_scores(self.passages.search(query, k), self.semantic.search(query, k),
+                                self.hybrid_alpha)
+            return fused[:k]
+    
+    def search_passages_many(self, queries, mode=None, k=20):
+        """search_passages for a batch of queries; keyword scores come from one vectorized pass"""
+        mode = mode or ('hybrid' if self.semantic else 'keyword')
+        if mode != 'keyword' and not self.semantic:
+            raise ValueError("call enable_semantic_search() before semantic retrieval")
+        with self.lock, span('index_lookup', index=f"{mode}_batch"):
+            if mode == 'semantic':
+                return self.semantic.search_many(queries, k)
+            hits, _ = self.score_matrix('passages').search_many(queries, k)
+            keyword = [[(self.passages.passages[passage_id], score) for passage_id, score, _ in query_hits]
+                       for query_hits in hits]
+            if mode == 'keyword':
+                return keyword
+            from vector_index import fuse_scores
+            return [fuse_scores(keyword_hits, semantic_hits, self.hybrid_alpha)[:k]
+                    for keyword_hits, semantic_hits in zip(keyword, self.semantic.search_many(queries, k))]
+    
+    def score_matrix(self, name='pages'):
+        """Batch-scoring matrix of the 'pages' or 'passages' index, rebuilt once content changes"""
+        from batch_search import ScoreMatrix
+        with self.lock:
+            cached = self.score_matrices.get(name)
+            if cached is None or cached[0] != self.corpus_version:
+                index = self.index if name == 'pages' else self.passages.index
+                cached = self.score_matrices[name] = (self.corpus_version, ScoreMatrix(index))
+            return cached[1]
+    
+    def cache_stats(self):
+        """Hit/miss statistics of the enhance_prompt cache"""
+        return dict(self.query_cache.stats(), corpus_version=self.corpus_version)
+    
+    def search_content(self, query_keywords, limit=None):
+        """BM25 keyword search over titles, headings and content via the inverted index"""
+        with self.lock:
+            with span('index_lookup', index='pages'):
+                hits = self.index.search(query_keywords, limit)
+            # Already sorted by relevance
+            return [self._format_hit(*hit) for hit in hits]
+    
+    def search_many(self, queries, limit=10):
+        """search_content for a batch of queries in one vectorized scoring pass
         
-        # Sort by relevance
-        relevant_content.sort(key=lambda x: x['relevance_score'], reverse=True)
-        return relevant_content
-    
-    def _extract_snippet(self, content, query_keywords, snippet_length=200):
-        """Extract relevant snippet around query keywords"""
-        query_lower = query_keywords.lower()
-        content_lower = content.lower()
+        Each query gets its top `limit` results (equal scores ordered by URL);
+        snippets are only built for those winners.
+        """
+        with self.lock:
+            with span('index_lookup', index='pages_batch'):
+                hits, _ = self.score_matrix('pages').search_many(queries, limit)
+            return [[self._format_hit(*hit) for hit in query_hits] for query_hits in hits]
+    
+    def _format_hit(self, url, score, matched):
+        """Result dict of one ranked page: matched sections and a snippet"""
+        title_terms, heading_terms, content_terms = matched
+        content = self.content_db[url]
+        matched_sections = []
+        if title_terms:
+            matched_sections.append("title")
+        for heading in self.index.matching_headings(url, heading_terms):
+            matched_sections.append(f"heading: {heading}")
+        if content_terms:
+            matched_sections.append("content")
         
-        # Find first occurrence of any keyword
-        for keyword in query_lower.split():
-            pos = content_lower.find(keyword)
-            if pos != -1:
-                # Extract snippet around the keyword
-                start = max(0, pos - snippet_length // 2)
-                end = min(len(content), pos + snippet_length // 2)
-                snippet = content[start:end]
-                
-                # Clean up snippet
-                if start > 0:
-                    snippet = "..." + snippet
-                if end < len(content):
-                    snippet = snippet + "..."
-                
-                return snippet
+        with span('snippet'):
+            snippet = self._extract_snippet(url, content['content'], content_terms)
+        return {
+            'url': url,
+            'title': content['title'],
+            'relevance_score': score,
+            'matched_sections': matched_sections,
+            'content_snippet': snippet
+        }
+    
+    def _extract_snippet(self, url, content, terms, snippet_length=200):
+        """Extract the snippet window with the densest coverage of the matched terms
+        
+        Term positions come from the index, so no per-query copy of the page is made.
+        """
+        window = self.index.best_window(url, terms, snippet_length)
+        if window:
+            # Center the snippet on the covered matches
+            match_start, match_end = window
+            start = max(0, (match_start + match_end - snippet_length) // 2)
+            end = min(len(content), start + snippet_length)
+            start = max(0, end - snippet_length)
+            snippet = content[start:end]
+            
+            # Clean up snippet
+            if start > 0:
+                snippet = "..." + snippet
+            if end < len(content):
+                snippet = snippet + "..."
+            
+            return snippet
         
         # If no keywords found, return beginning of content
         return content[:snippet_length] + "..." if len(content) > snippet_length else content
     
-    def enhance_prompt(self, user_question, max_context_items=3):
-        """Enhance a user question with relevant scraped content"""
+    def enhance_prompt(self, user_question, max_context_items=3, token_budget=None):
+        """Enhance a user question with relevant scraped content
         
-        # Search for relevant content
-        relevant_content = self.search_content(user_question)
+        With `token_budget`, the context is packed from the best heading-aligned
+        passages until the budget is spent instead of `max_context_items` snippets.
+        """
         
-        if not relevant_content:
-            return user_question, "No relevant documentation found."
+        # Retrieval and context building run in nested index_lookup / snippet spans
+        with span('prompt_assembly', packed=token_budget is not None):
+            # Search for relevant content; results only depend on the normalized question
+            cache_key = (normalize_question(user_question), max_context_items, token_budget)
+            # One version for the lookup and the fill: a context that races an update
+            # is filed under the older version, so it is never served as current
+            with self.lock:
+                version = self.corpus_version
+            cached = self.query_cache.get(cache_key, version)
+            inc('prompt_cache_total', result='miss' if cached is None else 'hit')
+            if cached is None:
+                with self.lock:
+                    if token_budget is None:
+                        cached = self._build_context(user_question, max_context_items)
+                    else:
+                        cached = self._build_packed_context(user_question, token_budget)
+                self.query_cache.put(cache_key, version, cached)
+            return format_prompt(user_question, *cached)
+    
+    def enhance_many(self, user_questions, max_context_items=3, token_budget=None):
+        """enhance_prompt for a batch of questions; returns [(enhanced prompt, status)]
+        
+        Cached questions are served from the query cache; the others are
+        retrieved together through batch scoring (search_many /
+        search_passages_many) and cached for later single calls.
+        """
+        with span('batch_prompt_assembly', packed=token_budget is not None):
+            keys = [(normalize_question(question), max_context_items, token_budget)
+                    for question in user_questions]
+            # One version for the lookups and the fills, as in enhance_prompt
+            with self.lock:
+                version = self.corpus_version
+            contexts = {}
+            missing = {}   # cache key -> question to retrieve for
+            for key, question in zip(keys, user_questions):
+                if key in contexts or key in missing:
+                    continue
+                cached = self.query_cache.get(key, version)
+                inc('prompt_cache_total', result='miss' if cached is None else 'hit')
+                if cached is None:
+                    missing[key] = question
+                else:
+                    contexts[key] = cached
+            
+            if missing:
+                with self.lock:
+                    questions = list(missing.values())
+                    if token_budget is None:
+                        built = self._build_contexts(questions, max_context_items)
+                    else:
+                        built = [self._pack_context(candidates, token_budget)
+                                 for candidates in self.search_passages_many(questions)]
+                for key, context in zip(missing, built):
+                    self.query_cache.put(key, version, context)
+                    contexts[key] = context
+            
+            return [format_prompt(question, *contexts[key])
+                    for question, key in zip(user_questions, keys)]
+    
+    def _build_context(self, user_question, max_context_items):
+        """Search and format the context block; returns (context, match count)"""
+        relevant_content = self.search_content(user_question)
+        return "\n".join(context_parts(relevant_content, max_context_items)), len(relevant_content)
+    
+    def _build_contexts(self, user_questions, max_context_items):
+        """_build_context for a batch: one scoring pass, snippets only for the top hits"""
+        # A few spare hits per question cover snippets skipped as near-duplicates
+        hits, match_counts = self.score_matrix('pages').search_many(user_questions, max_context_items * 3)
+        contexts = []
+        for question, query_hits, match_count in zip(user_questions, hits, match_counts):
+            parts = context_parts((self._format_hit(*hit) for hit in query_hits), max_context_items)
+            if len(parts) < max_context_items and match_count > len(query_hits):
+                # Spares ran out on near-duplicates: rank this one question in full
+                contexts.append(self._build_context(question, max_context_items))
+            else:
+                contexts.append(("\n".join(parts), match_count))
+        return contexts
+    
+    def _build_packed_context(self, user_question, token_budget):
+        """Fill `token_budget` with the highest-scoring de-duplicated passages"""
+        return self._pack_context(self.search_passages(user_question), token_budget)
+    
+    def _pack_context(self, candidates, token_budget):
+        """Packed context block from ranked (passage, score) candidates; returns (context, match count)"""
+        packed, _ = pack_passages(candidates, token_budget, self._passage_text)
         
-        # Build context from top matches
         context_parts = []
-        for i, item in enumerate(relevant_content[:max_context_items]):
+        for i, (passage, text) in enumerate(packed):
+            title = self.content_db[passage.url]['title']
             context_parts.append(f"""
-Source {i+1}: {item['title']}
-URL: {item['url']}
-Content: {item['content_snippet']}
+Source {i+1}: {title} - {passage.heading}
+URL: {passage.url}
+Content: {text.strip()}
 """)
         
-        context = "\n".join(context_parts)
-        
-        # Enhanced prompt
-        enhanced_prompt = f"""
-CONTEXT FROM DOCUMENTATION:
-{context}
-
-USER QUESTION: {user_question}
-
-Please answer the user's question using the provided documentation context when relevant. 
-If the context doesn't contain relevant information, mention that and provide general guidance.
-"""
-        
-        return enhanced_prompt, f"Found {len(relevant_content)} relevant sections"
+        return "\n".join(context_parts), len(candidates)
+    
+    def _passage_text(self, passage):
+        return self.content_db[passage.url]['content'][passage.start:passage.end]
 
 def demo_context_enhancement():
     """Demo the context enhancement functionality"""
@@ -140,6 +443,10 @@ def demo_context_enhancement():
         print("🔍 Enhanced Prompt Preview:")
         print(enhanced_prompt[:300] + "..." if len(enhanced_prompt) > 300 else enhanced_prompt)
         print("-" * 80)
+    
+    # Repeat a question with different casing: served from the cache
+    enhancer.enhance_prompt(test_questions[0].upper())
+    print(f"📈 Cache: {enhancer.cache_stats()}")
 
 if __name__ == "__main__":
     demo_context_enhancement()
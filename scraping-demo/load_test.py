@@ -0,0 +1,90 @@
+"""
+Query Service Load Test
+Purpose: Measure QPS and p50/p99 latency of a running query_service.py
+
+Usage: python load_test.py [host:port] [concurrency] [duration_seconds] [endpoint]
+"""
+
+import http.client
+import json
+import random
+import statistics
+import sys
+import threading
+import time
+from urllib.parse import urlencode
+
+QUESTIONS = [
+    "How do I create a new document?",
+    "What is Docusaurus?",
+    "How do I get started with this site?",
+    "How do I customize the sidebar?",
+    "What are froquetisms?",
+    "How do I deploy my site?",
+    "Tell me about React components",
+    "How do I add a blog post?",
+]
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def worker(host, port, endpoint, deadline, latencies, errors, seed):
+    """One keep-alive connection issuing requests back to back until the deadline"""
+    rng = random.Random(seed)
+    conn = http.client.HTTPConnection(host, port, timeout=10)
+    while time.perf_counter() < deadline:
+        path = f"/{endpoint}?" + urlencode({'q': rng.choice(QUESTIONS)})
+        start = time.perf_counter()
+        try:
+            conn.request('GET', path)
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(response.status)
+                continue
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(str(e))
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=10)
+            continue
+        latencies.append(time.perf_counter() - start)
+    conn.close()
+
+def run_load_test(address='127.0.0.1:8080', concurrency=16, duration=10.0, endpoint='enhance'):
+    host, _, port = address.partition(':')
+    latencies, errors = [], []
+    deadline = time.perf_counter() + duration
+    threads = [threading.Thread(target=worker, args=(host, int(port or 80), endpoint, deadline,
+                                                     latencies, errors, i))
+               for i in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    report = {
+        'endpoint': endpoint,
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'qps': len(latencies) / elapsed,
+        'p50_ms': statistics.median(latencies) * 1000 if latencies else None,
+        'p99_ms': percentile(latencies, 99) * 1000 if latencies else None,
+    }
+    print(f"📈 /{endpoint}: {report['requests']} requests, {report['errors']} errors, "
+          f"concurrency {concurrency}")
+    if latencies:
+        print(f"   QPS: {report['qps']:.0f}   p50: {report['p50_ms']:.1f} ms   p99: {report['p99_ms']:.1f} ms")
+    return report
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    report = run_load_test(
+        args[0] if len(args) > 0 else '127.0.0.1:8080',
+        int(args[1]) if len(args) > 1 else 16,
+        float(args[2]) if len(args) > 2 else 10.0,
+        args[3] if len(args) > 3 else 'enhance')
+    print(json.dumps(report))
@@ -0,0 +1,162 @@
+"""
+Compact Page Records
+Purpose: Hold many scraped pages in memory without a dict of dicts per page
+
+A PageRecord still reads like the page dict the scraper produces
+(`page['title']`, `page.get('headings', [])`, `dict(page)`), but stores:
+- the URL as an interned prefix plus a suffix, so pages of one site share the prefix
+- headings as two columns: a bytes string of level codes and a tuple of interned texts
+- the body optionally compressed (zlib, or zstd when `zstandard` is installed),
+  decompressed only when `content` is read, e.g. for snippet extraction
+"""
+
+import sys
+import zlib
+from collections.abc import Mapping, MutableMapping
+from functools import lru_cache
+
+# Interned heading levels: 'h1'..'h6' get fixed codes, anything else is appended
+_level_names = ['h0', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6']
+_level_codes = {name: code for code, name in enumerate(_level_names)}
+
+_BASE_KEYS = ('url', 'title', 'headings', 'content', 'metadata')
+
+def _level_code(level):
+    code = _level_codes.get(level)
+    if code is None:
+        if len(_level_names) >= 256:
+            raise ValueError(f"too many distinct heading levels to intern {level!r}")
+        code = _level_codes[level] = len(_level_names)
+        _level_names.append(sys.intern(str(level)))
+    return code
+
+def _zstd():
+    try:
+        import zstandard
+        return zstandard
+    except ImportError:
+        return None
+
+def resolve_codec(compress):
+    """Map a `compress` option to the codec actually used: None, 'zlib' or 'zstd'
+
+    'zstd' falls back to zlib when the zstandard package is not installed.
+    """
+    if compress in (None, False):
+        return None
+    if compress == 'zstd':
+        return 'zstd' if _zstd() else 'zlib'
+    if compress in (True, 'zlib'):
+        return 'zlib'
+    raise ValueError(f"unknown compression {compress!r}; use None, 'zlib' or 'zstd'")
+
+def _compress(codec, text):
+    data = text.encode('utf-8')
+    if codec == 'zstd':
+        return _zstd().ZstdCompressor(level=3).compress(data)
+    return zlib.compress(data, 6)
+
+@lru_cache(maxsize=32)
+def _decompress(codec, blob):
+    # Packing a context reads several passages of the same page back to back
+    if codec == 'zstd':
+        return _zstd().ZstdDecompressor().decompress(blob).decode('utf-8')
+    return zlib.decompress(blob).decode('utf-8')
+
+class PageRecord(Mapping):
+    """Read-only, slotted page record with the same keys as a scraped page dict"""
+    __slots__ = ('_url_prefix', '_url_suffix', 'title', 'heading_levels', 'heading_texts',
+                 '_body', 'codec', '_metadata', '_extras')
+
+    def __init__(self, url, title='', headings=(), content='', metadata=None, extras=None,
+                 compress=None):
+        cut = url.rfind('/') + 1
+        self._url_prefix = sys.intern(url[:cut])
+        self._url_suffix = url[cut:]
+        self.title = title
+        self.heading_levels = bytes(_level_code(h['level']) for h in headings)
+        self.heading_texts = tuple(sys.intern(h['text']) for h in headings)
+        self.codec = resolve_codec(compress) if content else None
+        self._body = _compress(self.codec, content) if self.codec else content
+        self._metadata = metadata or None
+        self._extras = extras or None
+
+    @classmethod
+    def from_page(cls, url, page, compress=None):
+        """Build a record from a page dict (or return an existing record as is)"""
+        if isinstance(page, PageRecord):
+            return page
+        extras = {key: value for key, value in page.items() if key not in _BASE_KEYS}
+        return cls(page.get('url', url), page.get('title', ''), page.get('headings', ()),
+                   page.get('content', ''), page.get('metadata'), extras, compress)
+
+    @property
+    def url(self):
+        return self._url_prefix + self._url_suffix
+
+    @property
+    def headings(self):
+        return [{'level': _level_names[code], 'text': text}
+                for code, text in zip(self.heading_levels, self.heading_texts)]
+
+    @property
+    def content(self):
+        if self.codec is None:
+            return self._body
+        return _decompress(self.codec, self._body)
+
+    @property
+    def metadata(self):
+        return dict(self._metadata) if self._metadata else {}
+
+    def __getitem__(self, key):
+        if key in _BASE_KEYS:
+            return getattr(self, key)
+        if self._extras and key in self._extras:
+            return self._extras[key]
+        raise KeyError(key)
+
+    def __iter__(self):
+        yield from _BASE_KEYS
+        if self._extras:
+            yield from self._extras
+
+    def __len__(self):
+        return len(_BASE_KEYS) + len(self._extras or ())
+
+    def __repr__(self):
+        return f"PageRecord({self.url!r}, title={self.title!r})"
+
+    def to_dict(self):
+        return dict(self.items())
+
+class CompactContentDB(MutableMapping):
+    """In-memory content database of PageRecords
+
+    Assigning a page dict stores it as a compact record; reads return the
+    record, which behaves like the original dict for every existing caller.
+    """
+    def __init__(self, pages=None, compress=None):
+        self.compress = resolve_codec(compress)
+        self.records = {}
+        if pages:
+            self.update(pages)
+
+    def __getitem__(self, url):
+        return self.records[url]
+
+    def __setitem__(self, url, page):
+        self.records[url] = PageRecord.from_page(url, page, self.compress)
+
+    def __delitem__(self, url):
+        del self.records[url]
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __len__(self):
+        return len(self.records)
+
+    def to_dict(self):
+        """Plain {url: page dict}, e.g. for json.dump"""
+        return {url: record.to_dict() for url, record in self.records.items()}
@@ -0,0 +1,152 @@
+"""
+Passage Store and Context Packing
+Purpose: Split pages into heading-aligned passages and fill a token budget with the best ones
+"""
+
+from collections import namedtuple
+
+from dedup import hamming_distance, simhash
+from search_index import InvertedIndex
+
+# Rough GPT-style tokenizer ratio; good enough to keep prompts inside a budget
+CHARS_PER_TOKEN = 4
+
+# Per-passage formatting overhead in the prompt (source header, URL line)
+PASSAGE_OVERHEAD_TOKENS = 24
+
+# Passages whose SimHash differs in at most this many bits are treated as the same text
+NEAR_DUPLICATE_BITS = 6
+
+# A passage is a span of its page's content, so the text itself is never duplicated
+Passage = namedtuple('Passage', ['url', 'heading', 'start', 'end', 'token_count'])
+
+def estimate_tokens(text):
+    """Approximate token count of `text`"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def split_passages(url, page, max_tokens=200):
+    """Cut a page's content into passages at heading boundaries
+
+    Uses the `headings` the scraper already extracted: each heading text is
+    located in the body and starts a new section. Sections longer than
+    `max_tokens` are split further at line breaks (or hard-cut as a last resort).
+    """
+    content = page.get('content', '')
+    title = page.get('title', '')
+
+    # Section starts: (offset, heading); text before the first heading belongs to the title
+    sections = [(0, title)]
+    cursor = 0
+    for heading in page.get('headings', []):
+        text = heading['text']
+        pos = content.find(text, cursor) if text else -1
+        if pos == -1:
+            continue  # heading outside the main content (navbar, footer)
+        if pos == sections[-1][0]:
+            sections[-1] = (pos, text)
+        else:
+            sections.append((pos, text))
+        cursor = pos + len(text)
+
+    passages = []
+    boundaries = [start for start, _ in sections[1:]] + [len(content)]
+    for (start, heading), end in zip(sections, boundaries):
+        for chunk_start, chunk_end in _split_span(content, start, end, max_tokens * CHARS_PER_TOKEN):
+            text = content[chunk_start:chunk_end]
+            if text.strip():
+                passages.append(Passage(url, heading, chunk_start, chunk_end, estimate_tokens(text)))
+    return passages
+
+def _split_span(content, start, end, max_chars):
+    """Yield (start, end) pieces of at most max_chars, preferring line breaks"""
+    while end - start > max_chars:
+        cut = content.rfind('\n', start + 1, start + max_chars)
+        if cut == -1:
+            cut = content.rfind(' ', start + 1, start + max_chars)
+        if cut == -1:
+            cut = start + max_chars
+        yield start, cut
+        start = cut
+    yield start, end
+
+class PassageStore:
+    """Passages of every page plus a BM25 index over them, updated page by page"""
+    def __init__(self, max_tokens=200):
+        self.max_tokens = max_tokens
+        self.passages = {}   # passage id -> Passage
+        self.by_url = {}     # url -> [passage ids]
+        self.index = InvertedIndex()
+
+    def __len__(self):
+        return len(self.passages)
+
+    def build(self, content_db):
+        self.__init__(self.max_tokens)
+        for url, page in content_db.items():
+            self.add_page(url, page)
+        return self
+
+    def add_page(self, url, page):
+        self.remove_page(url)
+        content = page.get('content', '')
+        ids = []
+        for i, passage in enumerate(split_passages(url, page, self.max_tokens)):
+            passage_id = f"{url}#passage-{i}"
+            self.passages[passage_id] = passage
+            self.index.add_page(passage_id, {
+                'title': page.get('title', ''),
+                'headings': [{'text': passage.heading}],
+                'content': content[passage.start:passage.end]
+            })
+            ids.append(passage_id)
+        self.by_url[url] = ids
+
+    def remove_page(self, url):
+        for passage_id in self.by_url.pop(url, []):
+            del self.passages[passage_id]
+            self.index.remove_page(passage_id)
+
+    def search(self, query, limit=None):
+        """Return [(passage, score)] by BM25 score"""
+        return [(self.passages[passage_id], score)
+                for passage_id, score, _ in self.index.search(query, limit)]
+
+def pack_passages(candidates, token_budget, text_of, overhead_tokens=PASSAGE_OVERHEAD_TOKENS):
+    """Greedily fill `token_budget` with the best de-duplicated passages
+
+    `candidates` are (passage, score) pairs in descending score order and
+    `text_of(passage)` returns its text. Passages that do not fit are skipped so
+    a smaller, lower-ranked one can still use the remaining budget. Returns
+    [(passage, text)] and the tokens used.
+    """
+    packed = []
+    seen = []
+    fingerprints = []
+    used = 0
+    for passage, _ in candidates:
+        cost = passage.token_count + overhead_tokens
+        if used + cost > token_budget:
+            continue
+        text = text_of(passage)
+        normalized = ' '.join(text.lower().split())
+        # Exact repeats, passages contained in an already chosen one and
+        # near-identical ones (e.g. the same section of two doc versions) add nothing
+        if any(normalized in other for other in seen):
+            continue
+        fingerprint = simhash(normalized)
+        if any(hamming_distance(fingerprint, other) <= NEAR_DUPLICATE_BITS for other in fingerprints):
+            continue
+        seen.append(normalized)
+        fingerprints.append(fingerprint)
+        packed.append((passage, text))
+        used += cost
+        if token_budget - used < overhead_tokens:
+            break
+    return packed, used
+
+def pack_texts(texts, token_budget, overhead_tokens=0):
+    """Pack plain strings in their given order under the same rules as pack_passages"""
+    candidates = [(Passage(None, '', i, i, estimate_tokens(text)), 0) for i, text in enumerate(texts)]
+    packed, used = pack_passages(candidates, token_budget, lambda passage: texts[passage.start],
+                                 overhead_tokens)
+    return [text for _, text in packed], used
@@ -0,0 +1,74 @@
+"""
+Query Result Cache
+Purpose: Skip search and snippet work for repeated questions until the corpus changes
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+def normalize_question(question):
+    """Case- and whitespace-insensitive cache key for a question"""
+    return ' '.join(question.lower().split()).rstrip('?!. ')
+
+class QueryCache:
+    """Thread-safe LRU cache with a TTL, tagged with the corpus version it was filled at
+
+    An entry filled at an older corpus version counts as a miss (and an
+    invalidation), so bumping the version invalidates everything in O(1).
+    """
+    def __init__(self, max_entries=1024, ttl_seconds=300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries = OrderedDict()   # key -> (corpus_version, stored_at, value)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key, corpus_version):
+        """Return the cached value, or None on a miss"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                version, stored_at, value = entry
+                if version != corpus_version:
+                    self.invalidations += 1
+                elif self.ttl_seconds is not None and time.monotonic() - stored_at > self.ttl_seconds:
+                    self.expirations += 1
+                else:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self.entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, corpus_version, value):
+        with self.lock:
+            self.entries[key] = (corpus_version, time.monotonic(), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        """Counters for sizing the cache"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self.entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations
+            }
@@ -0,0 +1,272 @@
+"""
+HTTP Query Service
+Purpose: Serve /search and /enhance from one warm in-memory index instead of reloading per script
+
+Usage: python query_service.py [content_file] [port]
+
+The index is memory-mapped from <content_file>.idx when that snapshot is
+current (written on the first start), so restarts serve in milliseconds.
+
+Endpoints (GET with query string, or POST with a JSON body):
+  /search   q, limit                     → ranked results
+  /enhance  q, max_items, token_budget   → enhanced prompt and status
+  /health                                → page count, corpus version, cache stats
+  /reload   (POST)                       → rebuild the index from the content file and hot-swap it in
+  /metrics  format=prometheus|json       → span timings, counters and histograms
+  /debug/profile (POST) rate, mode       → sample requests with cProfile or tracemalloc
+                                           (loopback clients only unless SCRAPER_REMOTE_DEBUG=1)
+"""
+
+import asyncio
+import ipaddress
+import json
+import os
+import signal
+import sys
+import time
+from urllib.parse import parse_qs, urlsplit
+
+from instrumentation import METRICS, PROFILER, span
+from llm_enhancer import LLMContextEnhancer
+
+MAX_BODY_BYTES = 1 << 20
+ENDPOINTS = ('/search', '/enhance', '/health', '/reload', '/metrics', '/debug/profile')
+REASONS = {200: 'OK', 400: 'Bad Request', 403: 'Forbidden', 404: 'Not Found',
+           405: 'Method Not Allowed', 413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+class BodyTooLarge(Exception):
+    """The request declared a body over MAX_BODY_BYTES"""
+
+class BadRequest(Exception):
+    """The request body is not a JSON object; carries the request's keep-alive"""
+    def __init__(self, message, keep_alive):
+        super().__init__(message)
+        self.keep_alive = keep_alive
+
+class QueryService:
+    def __init__(self, content_file, host='127.0.0.1', port=8080, index_snapshot=None,
+                 remote_debug=False):
+        self.content_file = content_file
+        self.host = host
+        self.port = port
+        self.index_snapshot = index_snapshot
+        # /debug/profile writes files on the server: loopback clients only unless opted in
+        self.remote_debug = remote_debug
+        self.enhancer = LLMContextEnhancer(content_file, index_snapshot=index_snapshot)
+        self.in_use = {}   # enhancer -> requests running on it; a swapped-out one closes at 0
+        self.loaded_at = time.time()
+        self.reload_lock = asyncio.Lock()
+        self.requests_served = 0
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        print(f"🌐 Serving {len(self.enhancer.content_db)} pages on http://{self.host}:{self.port}")
+        return self.server
+
+    async def serve_forever(self):
+        await self.start()
+        loop = asyncio.get_running_loop()
+        try:
+            # SIGHUP rebuilds the index from the content file without a restart
+            loop.add_signal_handler(signal.SIGHUP, lambda: asyncio.ensure_future(self.reload()))
+        except (NotImplementedError, AttributeError):
+            pass
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def reload(self, content_file=None):
+        """Build a fresh enhancer off the event loop, then swap it in atomically
+
+        Requests already running keep the enhancer they started with, so no
+        request is dropped or sees a half-built index; the old one's store is
+        closed once the last of them finishes. A different `content_file` gets
+        its own `<content_file>.idx` snapshot.
+        """
+        async with self.reload_lock:
+            content_file = content_file or self.content_file
+            if not os.path.exists(content_file):
+                raise ValueError(f"content file not found: {content_file}")
+            index_snapshot = self.index_snapshot
+            if index_snapshot and content_file != self.content_file:
+                index_snapshot = content_file + '.idx'
+            start = time.perf_counter()
+            enhancer = await asyncio.to_thread(LLMContextEnhancer, content_file,
+                                               index_snapshot=index_snapshot)
+            old = self.enhancer
+            try:
+                if not len(enhancer.content_db) and len(old.content_db):
+                    raise ValueError(f"refusing to swap in an empty index from {content_file}")
+                if old.semantic:
+                    await asyncio.to_thread(enhancer.enable_semantic_search, old.semantic.embedder,
+                                            old.semantic.ivf_lists, old.semantic.n_probe, old.hybrid_alpha)
+            except BaseException:
+                enhancer.close()
+                raise
+            self.enhancer, self.content_file, self.index_snapshot = enhancer, content_file, index_snapshot
+            if old not in self.in_use:
+                old.close()
+            self.loaded_at = time.time()
+            build_ms = (time.perf_counter() - start) * 1000
+            print(f"🔁 Hot-swapped index: {len(enhancer.content_db)} pages in {build_ms:.0f} ms")
+            return {'pages': len(enhancer.content_db), 'build_ms': build_ms}
+
+    # --- request handling ---
+
+    async def _handle_connection(self, reader, writer):
+        local = _is_loopback(writer.get_extra_info('peername'))
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except BodyTooLarge:
+                    # The unread body would be parsed as the next request: answer and hang up
+                    self._write_response(writer, 413, {'error': f'body over {MAX_BODY_BYTES} bytes'}, False)
+                    await writer.drain()
+                    break
+                except BadRequest as e:
+                    # The body was read in full, so the connection stays usable
+                    self._write_response(writer, 400, {'error': str(e)}, e.keep_alive)
+                    await writer.drain()
+                    if e.keep_alive:
+                        continue
+                    break
+                if request is None:
+                    break
+                method, path, params, keep_alive = request
+                status, payload = await self._dispatch(method, path, params, local)
+                self._write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                self.requests_served += 1
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        method, target, version = request_line.decode('latin-1').split(' ', 2)
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        connection = headers.get('connection', '').lower()
+        keep_alive = connection != 'close' if version.strip() == 'HTTP/1.1' else connection == 'keep-alive'
+        url = urlsplit(target)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        length = int(headers.get('content-length', 0) or 0)
+        if length > MAX_BODY_BYTES:
+            raise BodyTooLarge()
+        if length:
+            body = await reader.readexactly(length)
+            try:
+                payload = json.loads(body)
+            except ValueError:
+                payload = None
+            if not isinstance(payload, dict):
+                raise BadRequest('body must be a JSON object', keep_alive)
+            params.update(payload)
+        return method, url.path, params, keep_alive
+
+    async def _dispatch(self, method, path, params, local=False):
+        endpoint = path if path in ENDPOINTS else 'other'   # bounded label values
+        enhancer = self.enhancer   # pinned for the whole request, even across a hot swap
+        self.in_use[enhancer] = self.in_use.get(enhancer, 0) + 1
+        try:
+            with span('request', endpoint=endpoint):
+                return await self._route(enhancer, method, path, params, local)
+        finally:
+            self._release(enhancer)
+
+    def _release(self, enhancer):
+        self.in_use[enhancer] -= 1
+        if not self.in_use[enhancer]:
+            del self.in_use[enhancer]
+            if enhancer is not self.enhancer:
+                enhancer.close()   # last request on an index that was swapped out
+
+    async def _route(self, enhancer, method, path, params, local=False):
+        try:
+            if path in ('/search', '/enhance') and not isinstance(params.get('q', ''), str):
+                return 400, {'error': 'q must be a string'}
+            if path == '/search':
+                results = await asyncio.to_thread(
+                    PROFILER.wrap('search', enhancer.search_content),
+                    params['q'], int(params.get('limit', 10)))
+                return 200, {'results': results}
+            if path == '/enhance':
+                token_budget = params.get('token_budget')
+                prompt, status = await asyncio.to_thread(
+                    PROFILER.wrap('enhance', enhancer.enhance_prompt),
+                    params['q'], int(params.get('max_items', 3)),
+                    int(token_budget) if token_budget else None)
+                return 200, {'prompt': prompt, 'status': status}
+            if path == '/health':
+                return 200, {'pages': len(enhancer.content_db), 'loaded_at': self.loaded_at,
+                             'requests_served': self.requests_served, 'cache': enhancer.cache_stats()}
+            if path == '/reload':
+                if method != 'POST':
+                    return 405, {'error': 'use POST'}
+                # Only the configured content file; a client must not pick files on the server
+                if params.get('file') not in (None, self.content_file):
+                    return 403, {'error': 'reload only rebuilds the configured content file'}
+                return 200, await self.reload()
+            if path == '/metrics':
+                if params.get('format') == 'json':
+                    return 200, METRICS.snapshot()
+                return 200, METRICS.to_prometheus()
+            if path == '/debug/profile':
+                if not (local or self.remote_debug):
+                    return 403, {'error': 'profiling can only be configured from loopback clients'}
+                if method != 'POST':
+                    return 200, PROFILER.configure()
+                return 200, PROFILER.configure(params.get('rate'), params.get('mode'))
+            return 404, {'error': f'unknown path {path}'}
+        except KeyError as e:
+            return 400, {'error': f'missing parameter {e}'}
+        except (ValueError, TypeError) as e:
+            return 400, {'error': str(e)}
+        except Exception as e:
+            print(f"❌ Error handling {path}: {e}")
+            return 500, {'error': 'internal error'}
+
+    def _write_response(self, writer, status, payload, keep_alive):
+        # Strings are sent as text (Prometheus exposition), everything else as JSON
+        if isinstance(payload, str):
+            body = payload.encode('utf-8')
+            content_type = 'text/plain; version=0.0.4; charset=utf-8'
+        else:
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            content_type = 'application/json; charset=utf-8'
+        writer.write(
+            f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + body)
+
+def _is_loopback(peer):
+    """Whether a connection's peername is a loopback address"""
+    try:
+        return ipaddress.ip_address(peer[0]).is_loopback
+    except (TypeError, IndexError, ValueError):
+        return False
+
+if __name__ == "__main__":
+    content_file = sys.argv[1] if len(sys.argv) > 1 else 'scraped_content.json'
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 8080
+    # Restarts map the index from <content file>.idx; SCRAPER_INDEX_SNAPSHOT='' disables it
+    index_snapshot = os.getenv('SCRAPER_INDEX_SNAPSHOT', content_file + '.idx') or None
+    service = QueryService(content_file, port=port, index_snapshot=index_snapshot,
+                           remote_debug=os.getenv('SCRAPER_REMOTE_DEBUG') == '1')
+    try:
+        asyncio.run(service.serve_forever())
+    except KeyboardInterrupt:
+        print("\n👋 Service stopped")
@@ -4,59 +4,206 @@ Purpose: Show how to integrate runtime scraping with LLM calls
 """
 
 from llm_enhancer import LLMContextEnhancer
-from simple_scraper import SimpleDocsScraper
-import json
+from llm_backend import LLMClient, StubBackend
+from freshness import FreshnessPolicy
+from instrumentation import METRICS, PROFILER, span
+from collections import Counter
+from urllib.parse import urldefrag, urlparse
+import asyncio
+import re
+import sys
 import time
 
 class RuntimeScrapingLLM:
-    def __init__(self, base_url, content_cache_file='scraped_content.json'):
-        """Initialize with scraper and content enhancer"""
+    def __init__(self, base_url, content_cache_file='scraped_content.db', llm_client=None,
+                 index_snapshot=None, freshness_ttl=300):
+        """Initialize with scraper, content enhancer and LLM client
+        
+        Without `llm_client` answers come from the offline stub backend
+        (see `_simulate_llm_call`); pass e.g. `llm_backend.get_default_client()`
+        for real OpenAI calls. `index_snapshot` maps a prebuilt index instead
+        of indexing the cache at startup (see index_snapshot.py). Cached pages
+        older than `freshness_ttl` seconds are revalidated in the background
+        when a question uses them (see freshness.py).
+        """
         self.base_url = base_url
-        self.scraper = SimpleDocsScraper(base_url)
-        self.enhancer = LLMContextEnhancer(content_cache_file)
+        self._scraper = None
+        self.enhancer = LLMContextEnhancer(content_cache_file, index_snapshot=index_snapshot)
         self.cache_file = content_cache_file
+        self.llm = llm_client or LLMClient(StubBackend(responder=self._simulate_llm_call, latency=0))
+        self.freshness = FreshnessPolicy(self.scrape_fresh_content,
+                                         lambda url: url in self.enhancer.content_db, ttl=freshness_ttl)
+    
+    @property
+    def scraper(self):
+        """The scraper is created on first fetch: answering from cache never imports requests/bs4"""
+        if self._scraper is None:
+            from simple_scraper import SimpleDocsScraper
+            self._scraper = SimpleDocsScraper(self.base_url)
+        return self._scraper
+    
+    @scraper.setter
+    def scraper(self, scraper):
+        self._scraper = scraper
     
     def scrape_fresh_content(self, url):
-        """Scrape fresh content from a specific URL"""
+        """Scrape fresh content from a specific URL
+        
+        Sends the stored ETag/Last-Modified validators so unchanged pages cost a
+        304 (or at worst a body hash comparison) and are never re-parsed.
+        Returns True only when the stored content actually changed.
+        """
         print(f"🔄 Scraping fresh content from: {url}")
-        content = self.scraper.scrape_page(url)
+        existing = self.enhancer.content_db.get(url)
+        validators = existing.get('validators') if existing else None
+        status, content, new_validators = self.scraper.scrape_page_if_changed(url, validators)
+        
+        if status in ('not_modified', 'unchanged'):
+            if new_validators != validators:
+                # Validators only: a per-page upsert, no re-index
+                self.enhancer.content_db[url] = dict(existing, validators=new_validators)
+            print(f"✅ Content unchanged for: {existing['title']}")
+            return False
         
         if content:
-            # Update our content database
-            self.enhancer.content_db[url] = content
-            
-            # Save updated content to cache
-            with open(self.cache_file, 'w', encoding='utf-8') as f:
-                json.dump(self.enhancer.content_db, f, indent=2, ensure_ascii=False)
+            # Upsert this page in the content store and re-index just this page
+            self.enhancer.update_page(url, content)
             
             print(f"✅ Fresh content added for: {content['title']}")
             return True
         return False
     
-    def answer_with_context(self, user_question, check_fresh_content=False):
-        """Answer user question with enhanced context"""
+    def refresh_all(self):
+        """Conditionally re-check every cached page; return the URLs that changed"""
+        return [url for url in list(self.enhancer.content_db) if self.scrape_fresh_content(url)]
+    
+    def answer_with_context(self, user_question, check_fresh_content=False, max_context_items=3,
+                            deadline=None):
+        """Answer user question with enhanced context
+        
+        With `check_fresh_content`, stale source pages are served as cached and
+        revalidated in the background; only uncached pages the question links
+        to are fetched first, and only within `deadline` seconds.
+        """
         print(f"\n❓ User Question: {user_question}")
         print("=" * 60)
         
-        # Optional: Scrape fresh content if needed
+        # Sampled requests are profiled when PROFILER is configured (off by default)
+        with PROFILER.maybe_profile('answer'), span('answer'):
+            # Optional: stale-while-revalidate for the pages this question draws context from
+            if check_fresh_content:
+                self.check_freshness(user_question, max_context_items, deadline)
+            
+            # Get enhanced prompt with current content
+            enhanced_prompt, status = self.enhancer.enhance_prompt(user_question, max_context_items)
+            print(f"📊 Context Status: {status}")
+            
+            # LLM call through the shared client (stub backend unless configured)
+            answer = self.llm.complete_sync(enhanced_prompt)
+        
+        print(f"\n🤖 LLM Response:")
+        print(answer)
+        print("=" * 60)
+        
+        return answer
+    
+    def refresh_from_sitemap(self, max_pages=None):
+        """Re-scrape only pages whose sitemap <lastmod> moved, newest first"""
+        queue = self.scraper.discover_changed(self._known_lastmods())
+        print(f"🗺️  {len(queue)} pages changed according to the sitemap")
+        results = self.scraper.scrape_prioritized(queue, max_pages)
+        for url, content in results.items():
+            self.enhancer.update_page(url, content)
+        return list(results)
+    
+    def _known_lastmods(self):
+        """{url: sitemap lastmod} of cached pages, read without loading page bodies"""
+        from simple_scraper import parse_lastmod
+        db = self.enhancer.content_db
+        store = getattr(db, 'store', None)
+        pages = store.summaries() if hasattr(store, 'summaries') else db.items()
+        return {url: parse_lastmod(page.get('sitemap_lastmod')) for url, page in pages}
+    
+    async def answer_stream(self, user_question, check_fresh_content=False, max_context_items=3,
+                            token_budget=None, deadline=None):
+        """Stream an answer as events while the stages overlap
+        
+        The optional freshness check runs in a background thread while
+        retrieval and the LLM call proceed; pages it revalidates or fetches
+        (within `deadline`) serve the next question. Yields dicts:
+          {'type': 'token', 'text': ...}                  as LLM chunks arrive
+          {'type': 'timing', 'stage': ..., 'ms': ...}     when a stage finishes
+          {'type': 'done', 'timings': {...}, 'status': ...}
+        `timings['time_to_first_token']` is measured from the call.
+        """
+        start = time.perf_counter()
+        timings = {}
+        
+        def elapsed_ms(since=start):
+            return (time.perf_counter() - since) * 1000
+        
+        freshness = None
         if check_fresh_content:
-            print("🔄 Checking for fresh content...")
-            # In a real implementation, you'd determine which URLs to refresh
-            # For demo, we'll just note this capability
-            print("ℹ️  (In production: would check specific URLs for updates)")
+            async def timed_check():
+                freshness_start = time.perf_counter()
+                await asyncio.to_thread(self.check_freshness, user_question, max_context_items, deadline)
+                timings['freshness_check'] = elapsed_ms(freshness_start)
+            freshness = asyncio.create_task(timed_check())
         
-        # Get enhanced prompt with current content
-        enhanced_prompt, status = self.enhancer.enhance_prompt(user_question)
-        print(f"📊 Context Status: {status}")
+        retrieval_start = time.perf_counter()
+        enhanced_prompt, status = await asyncio.to_thread(
+            self.enhancer.enhance_prompt, user_question, max_context_items, token_budget)
+        timings['retrieval'] = elapsed_ms(retrieval_start)
+        yield {'type': 'timing', 'stage': 'retrieval', 'ms': timings['retrieval']}
         
-        # Simulate LLM call (in reality you'd call OpenAI, Claude, etc.)
-        simulated_answer = self._simulate_llm_call(enhanced_prompt)
+        llm_start = time.perf_counter()
+        async for chunk in self.llm.stream(enhanced_prompt):
+            if 'time_to_first_token' not in timings:
+                timings['time_to_first_token'] = elapsed_ms()
+                yield {'type': 'timing', 'stage': 'time_to_first_token', 'ms': timings['time_to_first_token']}
+            yield {'type': 'token', 'text': chunk}
+        timings['llm'] = elapsed_ms(llm_start)
+        yield {'type': 'timing', 'stage': 'llm', 'ms': timings['llm']}
         
-        print(f"\n🤖 LLM Response:")
-        print(simulated_answer)
-        print("=" * 60)
+        if freshness:
+            await freshness
+            yield {'type': 'timing', 'stage': 'freshness_check', 'ms': timings['freshness_check']}
         
-        return simulated_answer
+        timings['total'] = elapsed_ms()
+        yield {'type': 'done', 'timings': timings, 'status': status}
+    
+    def answer_streaming(self, user_question, check_fresh_content=False, max_context_items=3):
+        """Print an answer token by token as it streams; returns the stage timings"""
+        async def consume():
+            print(f"\n❓ User Question: {user_question}")
+            print("🤖 ", end="", flush=True)
+            async for event in self.answer_stream(user_question, check_fresh_content, max_context_items):
+                if event['type'] == 'token':
+                    print(event['text'], end="", flush=True)
+                elif event['type'] == 'done':
+                    print()
+                    print("⏱️  " + ", ".join(f"{stage}: {ms:.0f} ms" for stage, ms in event['timings'].items()))
+                    return event['timings']
+        # On the client's own loop, so its connections outlive this call
+        return self.llm.run_sync(consume())
+    
+    def check_freshness(self, user_question, max_context_items=3, deadline=None):
+        """Apply the freshness policy to a question's top-ranked pages and the site pages it links to
+        
+        Returns {url: 'fresh' | 'stale' | 'fetched' | 'deferred'}; see FreshnessPolicy.check.
+        """
+        with self.enhancer.lock:
+            ranked = [url for url, _, _ in self.enhancer.index.search(user_question, max_context_items)]
+        outcomes = self.freshness.check(self._linked_pages(user_question) + ranked, deadline)
+        counts = Counter(outcomes.values())
+        print("🔄 Freshness: " + (", ".join(f"{n} {outcome}" for outcome, n in counts.items()) or "no pages"))
+        return outcomes
+    
+    def _linked_pages(self, user_question):
+        """Pages of this site pasted into the question: needed even if not cached yet"""
+        site = urlparse(self.base_url).netloc
+        urls = (urldefrag(url.rstrip('.,;:!?)\'"'))[0] for url in re.findall(r'https?://\S+', user_question))
+        return [url for url in urls if urlparse(url).netloc == site]
     
     def _simulate_llm_call(self, enhanced_prompt):
         """Simulate what an LLM would respond with the enhanced prompt"""
@@ -150,5 +297,23 @@ def demo_runtime_integration():
     print("   • Current documentation integration")
     print("   • Scalable to any number of sources")
 
+def demo_streaming():
+    """Demo the streaming pipeline: tokens print as they arrive"""
+    print("🚀 Streaming Answer Demo")
+    print("=" * 60)
+    
+    runtime_llm = RuntimeScrapingLLM("https://four27-my-docs-site.onrender.com")
+    for question in ["How do I create a new document in this system?",
+                     "What is Docusaurus and why should I use it?"]:
+        runtime_llm.answer_streaming(question, check_fresh_content=True)
+    runtime_llm.freshness.wait_idle()
+
 if __name__ == "__main__":
-    demo_runtime_integration()
+    # `python runtime_demo.py stream` runs the streaming variant; add `metrics`
+    # to print per-stage timings in Prometheus format afterwards
+    if len(sys.argv) > 1 and sys.argv[1] == 'stream':
+        demo_streaming()
+    else:
+        demo_runtime_integration()
+    if 'metrics' in sys.argv:
+        print(METRICS.to_prometheus())
@@ -0,0 +1,202 @@
+"""
+Inverted Index with BM25 Ranking
+Purpose: Answer keyword queries by touching only the postings of the query terms
+"""
+
+import heapq
+import math
+import re
+from array import array
+from collections import Counter, defaultdict
+
+# Field order used in postings; boosts keep the old title 3 / heading 2 / content 1 weighting
+FIELDS = ('title', 'headings', 'content')
+FIELD_BOOSTS = {'title': 3.0, 'headings': 2.0, 'content': 1.0}
+
+# Words that match nearly every page and only add noise to the ranking
+STOPWORDS = frozenset("""
+a an and are as at be by can do does for from how i in is it me my of on or so
+that the this to what when where which who why will with you your
+""".split())
+
+# Unicode word characters: "café" and "Straße" stay one token (offsets are match.start() in the original text)
+TOKEN_RE = re.compile(r"\w+")
+
+def iter_tokens(text):
+    """Yield (token, char offset) pairs: lowercased, stopwords removed, plurals folded"""
+    for match in TOKEN_RE.finditer(text):
+        token = match.group().lower()
+        if token in STOPWORDS:
+            continue
+        # Light stemming: "documents" and "document" should meet in one posting list
+        if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+            token = token[:-1]
+        yield token, match.start()
+
+def tokenize(text):
+    """Lowercase word tokens with stopwords removed and plurals folded"""
+    return [token for token, _ in iter_tokens(text)]
+
+class InvertedIndex:
+    """BM25F index over title, heading and body fields with incremental updates"""
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(dict)   # term -> {url: (tf_title, tf_headings, tf_content)}
+        self.doc_lengths = {}               # url -> (len_title, len_headings, len_content)
+        self.doc_headings = {}              # url -> [(heading text, heading token set)]
+        self.doc_terms = {}                 # url -> terms, so removal touches only its postings
+        self.doc_positions = {}             # url -> {term: array of char offsets in content}
+        self.total_lengths = [0, 0, 0]
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def __contains__(self, url):
+        return url in self.doc_lengths
+
+    def add_page(self, url, page):
+        """Index (or re-index) a single page"""
+        if url in self.doc_lengths:
+            self.remove_page(url)
+
+        heading_tokens = [(h['text'], tokenize(h['text'])) for h in page.get('headings', [])]
+        field_tokens = (
+            tokenize(page.get('title', '')),
+            [token for _, tokens in heading_tokens for token in tokens],
+            []
+        )
+        # Body positions are kept so snippets are a lookup, not a per-query scan
+        positions = defaultdict(lambda: array('I'))
+        for token, offset in iter_tokens(page.get('content', '')):
+            field_tokens[2].append(token)
+            positions[token].append(offset)
+        field_counts = [Counter(tokens) for tokens in field_tokens]
+
+        terms = set().union(*field_counts)
+        for term in terms:
+            self.postings[term][url] = tuple(counts[term] for counts in field_counts)
+
+        lengths = tuple(len(tokens) for tokens in field_tokens)
+        self.doc_lengths[url] = lengths
+        self.doc_terms[url] = terms
+        self.doc_positions[url] = dict(positions)
+        self.doc_headings[url] = [(text, set(tokens)) for text, tokens in heading_tokens]
+        for i, length in enumerate(lengths):
+            self.total_lengths[i] += length
+
+    def remove_page(self, url):
+        """Drop a page's postings; a no-op for unknown URLs"""
+        lengths = self.doc_lengths.pop(url, None)
+        if lengths is None:
+            return
+        for i, length in enumerate(lengths):
+            self.total_lengths[i] -= length
+
+        del self.doc_headings[url]
+        del self.doc_positions[url]
+        for term in self.doc_terms.pop(url):
+            docs = self.postings[term]
+            del docs[url]
+            if not docs:
+                del self.postings[term]
+
+    def build(self, content_db):
+        """Index every page of a content database from scratch"""
+        self.__init__(self.k1, self.b)
+        for url, page in content_db.items():
+            self.add_page(url, page)
+        return self
+
+    def search(self, query, limit=None):
+        """Return [(url, score, matched_terms_per_field)] sorted by BM25F score"""
+        terms = set(tokenize(query))
+        n_docs = len(self)
+        if not terms or not n_docs:
+            return []
+
+        avg_lengths = [max(total / n_docs, 1e-9) for total in self.total_lengths]
+        boosts = [FIELD_BOOSTS[field] for field in FIELDS]
+        scores = defaultdict(float)
+        matches = defaultdict(lambda: ([], [], []))
+
+        for term in terms:
+            docs = self._postings(term)
+            if not docs:
+                continue
+            idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            for doc, tfs in docs:
+                lengths = self._lengths(doc)
+                weighted_tf = 0.0
+                for i, tf in enumerate(tfs):
+                    if tf:
+                        norm = 1 - self.b + self.b * lengths[i] / avg_lengths[i]
+                        weighted_tf += boosts[i] * tf / norm
+                        matches[doc][i].append(term)
+                scores[doc] += idf * weighted_tf / (self.k1 + weighted_tf)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        if limit is not None:
+            ranked = ranked[:limit]
+        return [(self._doc_url(doc), score, matches[doc]) for doc, score in ranked]
+
+    def score_bound(self, query):
+        """Upper bound of search() scores for `query`: the sum of its terms' idf
+
+        Each term adds idf * tf / (k1 + tf) < idf, so score / bound is a 0..1
+        relevance that can be compared between indexes of different sizes. A
+        term missing from this index still counts, with the highest idf.
+        """
+        n_docs = len(self)
+        bound = 0.0
+        for term in set(tokenize(query)):
+            df = len(self._postings(term))
+            bound += math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+        return bound
+
+    # Storage hooks used by search(); a memory-mapped snapshot keys docs by row number instead of URL
+    def _postings(self, term):
+        """(doc, field tfs) pairs of the docs containing `term`"""
+        docs = self.postings.get(term)
+        return docs.items() if docs else ()
+
+    def _lengths(self, doc):
+        return self.doc_lengths[doc]
+
+    def _doc_url(self, doc):
+        return doc
+
+    def matching_headings(self, url, terms):
+        """Heading texts of `url` that contain any of `terms`"""
+        terms = set(terms)
+        return [text for text, tokens in self.doc_headings.get(url, []) if tokens & terms]
+
+    def best_window(self, url, terms, width):
+        """Char span of `width` in the body covering the most distinct query terms
+        
+        Returns (start, end) of the covered matches, or None if no term occurs
+        in the body. Ties prefer more total hits, then the earliest window.
+        """
+        doc_positions = self.doc_positions.get(url, {})
+        # Lists, not generators: a generator would read `term` late and tag every hit with the last term
+        streams = [[(offset, term) for offset in doc_positions[term]]
+                   for term in set(terms) if term in doc_positions]
+        hits = list(heapq.merge(*streams))
+        if not hits:
+            return None
+
+        best = None
+        counts = Counter()
+        left = 0
+        for right, (offset, term) in enumerate(hits):
+            counts[term] += 1
+            while offset + len(term) - hits[left][0] > width:
+                left_term = hits[left][1]
+                counts[left_term] -= 1
+                if not counts[left_term]:
+                    del counts[left_term]
+                left += 1
+            score = (len(counts), right - left + 1)
+            if best is None or score > best[0]:
+                best = (score, hits[left][0], offset + len(term))
+        return best[1], best[2]
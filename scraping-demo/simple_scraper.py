@@ -4,81 +4,336 @@ Purpose: Extract content to enhance LLM prompts at runtime
 """
 
 import requests
-from bs4 import BeautifulSoup
+import gzip
+import hashlib
+import heapq
+import io
 import json
-from urllib.parse import urljoin, urlparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime, timezone
+from xml.etree import ElementTree
+from urllib.parse import urljoin, urlparse, urldefrag
+import sys
+import threading
 import time
 
+from html_extract import extract_page
+from instrumentation import TimedHTTPAdapter, record_response, span
+from page_records import CompactContentDB
+
+SITEMAP_NS = '{http://www.sitemaps.org/schemas/sitemap/0.9}'
+GZIP_MAGIC = b'\x1f\x8b'
+
+# Links with these extensions are assets, not doc pages
+SKIP_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.svg', '.ico', '.css', '.js',
+                   '.json', '.xml', '.zip', '.pdf', '.woff', '.woff2', '.ttf')
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, up to `capacity`"""
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def acquire(self):
+        """Block until a token is available, then consume it"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_time = (1 - self.tokens) / self.rate
+            time.sleep(wait_time)
+
+class HostRateLimiter:
+    """One token bucket per host so politeness is enforced per origin"""
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}
+        self.lock = threading.Lock()
+    
+    def acquire(self, url):
+        host = urlparse(url).netloc
+        with self.lock:
+            bucket = self.buckets.get(host)
+            if bucket is None:
+                bucket = self.buckets[host] = TokenBucket(self.rate, self.burst)
+        bucket.acquire()
+
 class SimpleDocsScraper:
-    def __init__(self, base_url):
+    def __init__(self, base_url, max_workers=8, requests_per_second=2.0, burst=None, timeout=30):
         self.base_url = base_url
-        self.scraped_content = {}
+        # Every page scraped so far, as compact records with compressed bodies
+        self.scraped_content = CompactContentDB(compress='zlib')
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.rate_limiter = HostRateLimiter(requests_per_second, burst)
+        
+        # Shared session: keep-alive connections are reused across pages and workers
+        self.session = requests.Session()
+        adapter = TimedHTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
     
     def scrape_page(self, url):
         """Scrape a single page and extract key content"""
+        content, _ = self._fetch_and_parse(url)
+        return content
+    
+    def _fetch_and_parse(self, url):
+        """Fetch a page through the pooled session; return (content, links)"""
         try:
             print(f"Scraping: {url}")
-            response = requests.get(url)
+            self.rate_limiter.acquire(url)
+            with span('fetch'):
+                started = time.perf_counter()
+                response = self.session.get(url, timeout=self.timeout)
+                record_response(response, started)
             response.raise_for_status()
+            return self._parse_response(url, response)
             
-            soup = BeautifulSoup(response.text, 'html.parser')
+        except Exception as e:
+            print(f"Error scraping {url}: {e}")
+            return None, []
+    
+    def scrape_page_if_changed(self, url, validators=None):
+        """Re-scrape a page only if it changed since `validators` were stored
+        
+        Returns (status, content, validators) where status is one of
+        'not_modified' (304), 'unchanged' (same body hash), 'changed' or 'error'.
+        content is only parsed and returned for 'changed'.
+        """
+        validators = validators or {}
+        headers = {}
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+        
+        try:
+            print(f"Checking: {url}")
+            self.rate_limiter.acquire(url)
+            with span('fetch', conditional=True):
+                started = time.perf_counter()
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+                record_response(response, started)
+            if response.status_code == 304:
+                return 'not_modified', None, validators
+            response.raise_for_status()
             
-            # Extract key content from Docusaurus page
-            content = {
-                'url': url,
-                'title': self._extract_title(soup),
-                'headings': self._extract_headings(soup),
-                'content': self._extract_main_content(soup),
-                'metadata': self._extract_metadata(soup)
-            }
+            new_validators = self._extract_validators(response)
+            if new_validators['content_hash'] == validators.get('content_hash'):
+                return 'unchanged', None, new_validators
             
-            return content
+            content, _ = self._parse_response(url, response, new_validators)
+            return 'changed', content, new_validators
             
         except Exception as e:
-            print(f"Error scraping {url}: {e}")
-            return None
-    
-    def _extract_title(self, soup):
-        """Extract page title"""
-        title_tag = soup.find('title')
-        return title_tag.text.strip() if title_tag else "No title"
-    
-    def _extract_headings(self, soup):
-        """Extract all headings (h1-h6)"""
-        headings = []
-        for heading in soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6']):
-            headings.append({
-                'level': heading.name,
-                'text': heading.get_text().strip()
-            })
-        return headings
-    
-    def _extract_main_content(self, soup):
-        """Extract main content text"""
-        # Docusaurus typically puts content in main tag or article
-        main_content = soup.find('main') or soup.find('article')
-        if main_content:
-            # Remove navigation and other noise
-            for nav in main_content.find_all(['nav', 'aside', 'footer']):
-                nav.decompose()
-            return main_content.get_text().strip()
-        return "No main content found"
-    
-    def _extract_metadata(self, soup):
-        """Extract useful metadata"""
-        metadata = {}
+            print(f"Error checking {url}: {e}")
+            return 'error', None, validators
+    
+    def _parse_response(self, url, response, validators=None):
+        """Parse a fetched page into (content, links) in a single pass"""
+        with span('parse'):
+            page = extract_page(response.text)
+            links = self._extract_links(page['links'], response.url)
+        
+        # Extract key content from Docusaurus page
+        content = {
+            'url': url,
+            'title': page['title'],
+            'headings': page['headings'],
+            'content': page['content'],
+            'metadata': page['metadata'],
+            'validators': validators or self._extract_validators(response)
+        }
+        if page['canonical']:
+            content['canonical'] = self._normalize_link(urljoin(response.url, page['canonical']))
+        
+        return content, links
+    
+    def _extract_validators(self, response):
+        """HTTP cache validators plus a body hash for servers that send neither"""
+        return {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'content_hash': hashlib.sha256(response.content).hexdigest()
+        }
+    
+    def scrape_many(self, urls):
+        """Scrape a fixed list of URLs with the bounded worker pool"""
+        results = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for url, content in zip(urls, pool.map(self.scrape_page, urls)):
+                if content:
+                    results[url] = content
+        self.scraped_content.update(results)
+        return results
+    
+    def crawl(self, start_url=None, max_pages=100):
+        """Discover and scrape same-site pages breadth-first from base_url"""
+        start = self._normalize_link(start_url or self.base_url)
+        seen = {start}
+        frontier = deque([start])
+        results = {}
+        
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            in_flight = {}
+            while frontier or in_flight:
+                # Keep at most max_workers requests queued so the frontier stays ordered
+                while frontier and len(in_flight) < self.max_workers and len(results) + len(in_flight) < max_pages:
+                    url = frontier.popleft()
+                    in_flight[pool.submit(self._fetch_and_parse, url)] = url
+                if not in_flight:
+                    break
+                
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    url = in_flight.pop(future)
+                    content, links = future.result()
+                    if not content:
+                        continue
+                    results[url] = content
+                    for link in links:
+                        if link not in seen:
+                            seen.add(link)
+                            frontier.append(link)
+        
+        self.scraped_content.update(results)
+        return results
+    
+    def _extract_links(self, hrefs, page_url):
+        """Resolve same-site page links, normalized and de-fragmented"""
+        links = []
+        for href in hrefs:
+            link = self._normalize_link(urljoin(page_url, href))
+            if link and self._is_crawlable(link):
+                links.append(link)
+        return links
+    
+    def _normalize_link(self, url):
+        """Strip fragments and trailing slashes so each page is visited once"""
+        url, _ = urldefrag(url)
+        parsed = urlparse(url)
+        path = parsed.path.rstrip('/') or '/'
+        return parsed._replace(path=path).geturl()
+    
+    def _is_crawlable(self, url):
+        """Only follow http(s) links on the base_url host that look like pages"""
+        parsed = urlparse(url)
+        if parsed.scheme not in ('http', 'https'):
+            return False
+        if parsed.netloc != urlparse(self.base_url).netloc:
+            return False
+        return not parsed.path.lower().endswith(SKIP_EXTENSIONS)
+    
+    def iter_sitemap(self, sitemap_url=None, since=None):
+        """Stream (url, lastmod) entries from sitemap.xml, following sitemap indexes
         
-        # Description
-        desc_tag = soup.find('meta', attrs={'name': 'description'})
-        if desc_tag:
-            metadata['description'] = desc_tag.get('content', '')
+        The XML is parsed incrementally off the response stream, so huge
+        sitemaps never sit in memory. Child sitemaps whose own <lastmod> is
+        not after `since` are skipped without being fetched.
+        """
+        sitemap_url = sitemap_url or urljoin(self.base_url.rstrip('/') + '/', 'sitemap.xml')
+        pending = [sitemap_url]
+        while pending:
+            url = pending.pop()
+            try:
+                self.rate_limiter.acquire(url)
+                response = self.session.get(url, stream=True, timeout=self.timeout)
+                response.raise_for_status()
+                response.raw.decode_content = True
+                # .xml.gz is often served with Content-Encoding: gzip, and then already decoded
+                stream = io.BufferedReader(response.raw)
+                if stream.peek(2)[:2] == GZIP_MAGIC:
+                    stream = gzip.GzipFile(fileobj=stream)
+                
+                for kind, loc, lastmod in self._parse_sitemap(stream):
+                    if kind == 'sitemap':
+                        if since is None or lastmod is None or lastmod > since:
+                            pending.append(loc)
+                    else:
+                        yield loc, lastmod
+            except Exception as e:
+                print(f"Error reading sitemap {url}: {e}")
+    
+    def _parse_sitemap(self, stream):
+        """Yield ('url' | 'sitemap', loc, lastmod) from a sitemap or sitemap index
         
-        # Keywords
-        keywords_tag = soup.find('meta', attrs={'name': 'keywords'})
-        if keywords_tag:
-            metadata['keywords'] = keywords_tag.get('content', '')
+        Only sitemap-namespace (or unqualified) elements count, so extension
+        entries such as <image:loc> never replace the page's own <loc>.
+        """
+        loc = lastmod = None
+        for _, element in ElementTree.iterparse(stream, events=('end',)):
+            namespace, _, tag = element.tag.rpartition('}')
+            if namespace and namespace + '}' != SITEMAP_NS:
+                continue
+            if tag == 'loc':
+                loc = (element.text or '').strip()
+            elif tag == 'lastmod':
+                lastmod = parse_lastmod(element.text)
+            elif tag in ('url', 'sitemap'):
+                if loc:
+                    yield tag, loc, lastmod
+                loc = lastmod = None
+                element.clear()   # keep memory flat on huge sitemaps
+    
+    def discover_changed(self, known_lastmods=None, since=None, sitemap_url=None):
+        """Priority queue of pages that changed, most recently modified first
+        
+        A known page ({url: datetime} in `known_lastmods`) is scheduled when its
+        <lastmod> is newer than the recorded one; a new page unless its
+        <lastmod> is not after `since`. Entries without a <lastmod> go last.
+        Returns a heap of (priority, url, lastmod); pop it with heapq.heappop.
+        """
+        known_lastmods = known_lastmods or {}
+        queue = []
+        for url, lastmod in self.iter_sitemap(sitemap_url, since):
+            if url in known_lastmods:
+                known = known_lastmods[url]
+                if lastmod is None or (known is not None and lastmod <= known):
+                    continue
+            elif since is not None and lastmod is not None and lastmod <= since:
+                continue
+            priority = -lastmod.timestamp() if lastmod else float('inf')
+            heapq.heappush(queue, (priority, url, lastmod))
+        return queue
+    
+    def scrape_prioritized(self, queue, max_pages=None):
+        """Scrape a discover_changed() queue in priority order with the worker pool"""
+        ordered = []
+        while queue and (max_pages is None or len(ordered) < max_pages):
+            _, url, lastmod = heapq.heappop(queue)
+            ordered.append((url, lastmod))
         
-        return metadata
+        results = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            # Submitted in priority order, so the freshest docs are fetched first
+            futures = [(url, lastmod, pool.submit(self.scrape_page, url)) for url, lastmod in ordered]
+            for url, lastmod, future in futures:
+                content = future.result()
+                if content:
+                    content['sitemap_lastmod'] = lastmod.isoformat() if lastmod else None
+                    results[url] = content
+        self.scraped_content.update(results)
+        return results
+
+def parse_lastmod(text):
+    """Parse a sitemap <lastmod> (W3C datetime) into an aware datetime, or None"""
+    if not text:
+        return None
+    try:
+        value = datetime.fromisoformat(text.strip().replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
 
 def test_simple_scraping():
     """Test scraping your Docusaurus site"""
@@ -92,18 +347,14 @@ def test_simple_scraping():
         f"{base_url}/tutorial-basics/create-a-document"  # Tutorial page
     ]
     
-    results = {}
+    # Fetched concurrently; the per-host token bucket keeps us polite
+    results = scraper.scrape_many(test_pages)
     
     for url in test_pages:
-        content = scraper.scrape_page(url)
-        if content:
-            results[url] = content
-            print(f"✅ Successfully scraped: {content['title']}")
+        if url in results:
+            print(f"✅ Successfully scraped: {results[url]['title']}")
         else:
             print(f"❌ Failed to scrape: {url}")
-        
-        # Be polite - don't hammer the server
-        time.sleep(1)
     
     # Save results for inspection
     with open('scraped_content.json', 'w', encoding='utf-8') as f:
@@ -113,9 +364,45 @@ def test_simple_scraping():
     print("📄 Content saved to 'scraped_content.json'")
     return results
 
+def crawl_site(max_pages=200):
+    """Crawl the whole site starting from the homepage"""
+    base_url = "https://four27-my-docs-site.onrender.com"
+    scraper = SimpleDocsScraper(base_url, max_workers=8, requests_per_second=4.0)
+    
+    start = time.time()
+    results = scraper.crawl(max_pages=max_pages)
+    elapsed = time.time() - start
+    
+    with open('scraped_content.json', 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    
+    print(f"\n🎉 Crawled {len(results)} pages in {elapsed:.1f}s")
+    print("📄 Content saved to 'scraped_content.json'")
+    return results
+
+def sitemap_site(max_pages=None):
+    """Scrape every page listed in the sitemap, most recently modified first"""
+    base_url = "https://four27-my-docs-site.onrender.com"
+    scraper = SimpleDocsScraper(base_url, max_workers=8, requests_per_second=4.0)
+    
+    queue = scraper.discover_changed()
+    print(f"🗺️  Sitemap lists {len(queue)} pages")
+    results = scraper.scrape_prioritized(queue, max_pages)
+    
+    with open('scraped_content.json', 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    
+    print(f"\n🎉 Scraped {len(results)} pages from the sitemap")
+    return results
+
 if __name__ == "__main__":
-    # Run the test
-    scraped_data = test_simple_scraping()
+    # `python simple_scraper.py crawl|sitemap` discovers pages instead of the test list
+    if len(sys.argv) > 1 and sys.argv[1] == 'crawl':
+        scraped_data = crawl_site()
+    elif len(sys.argv) > 1 and sys.argv[1] == 'sitemap':
+        scraped_data = sitemap_site()
+    else:
+        scraped_data = test_simple_scraping()
     
     # Show a sample of what we extracted
     if scraped_data:
@@ -0,0 +1,164 @@
+"""
+Term Watch Engine
+Purpose: Scan crawled paragraphs for hundreds of watch terms (product names,
+deprecated APIs) in one pass per paragraph
+
+Terms are compiled into an Aho-Corasick automaton, which reports every
+occurrence of every term, overlapping ones included. A regex built from the
+same trie runs first in C and skips paragraphs that mention no term at all.
+
+Usage: python term_watch.py terms.txt [scraped_content.json | content.db]
+"""
+
+import re
+import sys
+from collections import deque, namedtuple
+
+Match = namedtuple('Match', ['term', 'start', 'end'])
+
+def _fold_char(ch):
+    lowered = ch.lower()
+    return lowered if len(lowered) == 1 else ch
+
+def _fold(text):
+    """Lowercase without changing length, so match offsets stay valid"""
+    folded = text.lower()
+    if len(folded) != len(text):
+        folded = ''.join(_fold_char(ch) for ch in text)
+    return folded
+
+class TermWatcher:
+    """Aho-Corasick matcher over a fixed set of terms"""
+    def __init__(self, terms, case_sensitive=False, whole_words=False):
+        self.terms = list(dict.fromkeys(term for term in terms if term))
+        self.case_sensitive = case_sensitive
+        self.whole_words = whole_words
+
+        # Trie: goto[node] = {char: node}; ends[node] = ids of terms ending exactly here
+        self.goto = [{}]
+        ends = [()]
+        self.lengths = []
+        for term_id, term in enumerate(self.terms):
+            node = 0
+            for ch in self._fold(term):
+                child = self.goto[node].get(ch)
+                if child is None:
+                    child = self.goto[node][ch] = len(self.goto)
+                    self.goto.append({})
+                    ends.append(())
+                node = child
+            ends[node] += (term_id,)
+            self.lengths.append(len(term))
+
+        # Failure links (breadth first); out[node] also holds the terms of its suffixes
+        self.fail = [0] * len(self.goto)
+        self.out = list(ends)
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self.goto[node].items():
+                queue.append(child)
+                fallback = self.fail[node]
+                while fallback and ch not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(ch, 0)
+                self.out[child] = ends[child] + self.out[self.fail[child]]
+
+        self.prefilter = re.compile(self._trie_pattern(0, ends)) if self.terms else None
+
+    def __len__(self):
+        return len(self.terms)
+
+    def _fold(self, text):
+        return text if self.case_sensitive else _fold(text)
+
+    def _trie_pattern(self, node, ends):
+        branches = [re.escape(ch) + self._trie_pattern(child, ends)
+                    for ch, child in self.goto[node].items()]
+        if not branches:
+            return ''
+        pattern = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return f'(?:{pattern})?' if ends[node] and node else pattern
+
+    def iter_matches(self, text):
+        """Yield every Match in `text`, overlapping ones included, by end offset"""
+        if self.prefilter is None:
+            return
+        folded = self._fold(text)
+        if not self.prefilter.search(folded):
+            return
+        goto, fail, out, lengths = self.goto, self.fail, self.out, self.lengths
+        root = goto[0]
+        node = 0
+        for i, ch in enumerate(folded):
+            if not node and ch not in root:
+                continue
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for term_id in out[node]:
+                start = i + 1 - lengths[term_id]
+                if self.whole_words and not self._at_word_boundaries(text, start, i + 1):
+                    continue
+                yield Match(self.terms[term_id], start, i + 1)
+
+    def find_terms(self, text):
+        """Distinct terms found in `text`, in order of first occurrence"""
+        return list(dict.fromkeys(match.term for match in self.iter_matches(text)))
+
+    def contains_any(self, text):
+        return next(self.iter_matches(text), None) is not None
+
+    def scan_paragraphs(self, paragraphs):
+        """Yield (url, paragraph index, text, terms) for each matching paragraph
+
+        `paragraphs` is any iterable of (url, text), e.g. a generator over a
+        crawl, so only the matching paragraphs are ever held.
+        """
+        counters = {}
+        for url, text in paragraphs:
+            index = counters[url] = counters.get(url, -1) + 1
+            terms = self.find_terms(text)
+            if terms:
+                yield url, index, text, terms
+
+    def report(self, paragraphs):
+        """{term: [(url, paragraph index), ...]} over a paragraph stream"""
+        hits = {}
+        for url, index, _, terms in self.scan_paragraphs(paragraphs):
+            for term in terms:
+                hits.setdefault(term, []).append((url, index))
+        return hits
+
+    @staticmethod
+    def _at_word_boundaries(text, start, end):
+        return ((start == 0 or not (text[start - 1].isalnum() or text[start - 1] == '_')) and
+                (end == len(text) or not (text[end].isalnum() or text[end] == '_')))
+
+def load_terms(path):
+    """Watch terms from a file: one per line, blank lines and # comments ignored"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+
+def iter_page_paragraphs(pages):
+    """(url, paragraph) pairs from {url: page} content, one per non-empty line"""
+    for url, page in pages:
+        for line in page.get('content', '').splitlines():
+            if line.strip():
+                yield url, line.strip()
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    from content_store import open_store
+    watcher = TermWatcher(load_terms(sys.argv[1]))
+    store = open_store(sys.argv[2] if len(sys.argv) > 2 else 'scraped_content.json')
+    hits = watcher.report(iter_page_paragraphs(store.items()))
+    print(f"🔎 {len(watcher)} watch terms, {len(hits)} found")
+    for term, locations in sorted(hits.items(), key=lambda item: -len(item[1])):
+        urls = sorted({url for url, _ in locations})
+        print(f"   {term}: {len(locations)} paragraphs on {len(urls)} pages")
+        for url in urls[:3]:
+            print(f"      - {url}")
+    store.close()
@@ -0,0 +1,81 @@
+import random
+
+import pytest
+
+from batch_search import ScoreMatrix
+from index_snapshot import open_snapshot, write_snapshot
+from llm_enhancer import LLMContextEnhancer
+from passages import PassageStore
+from search_index import InvertedIndex
+
+WORDS = ['sidebar', 'navbar', 'plugin', 'theme', 'config', 'deploy', 'version', 'blog',
+         'search', 'category', 'markdown', 'café', 'docs', 'footer']
+
+def random_pages(seed, n=40):
+    rng = random.Random(seed)
+    words = lambda k: ' '.join(rng.choice(WORDS) for _ in range(k))
+    return {f'https://docs.example.com/p{i:02d}': {
+        'title': words(rng.randint(1, 3)),
+        'content': '\n\n'.join(words(rng.randint(5, 30)) for _ in range(rng.randint(1, 4))),
+        'headings': [{'level': 'h2', 'text': words(2)} for _ in range(rng.randint(0, 2))],
+        'paragraphs': [],
+    } for i in range(n)}
+
+def random_queries(seed, n=60):
+    rng = random.Random(seed)
+    return [' '.join(rng.choice(WORDS + ['unknown']) for _ in range(rng.randint(0, 4))) for _ in range(n)]
+
+def ranked(hits):
+    # Equal scores may come back in either order (the batch path breaks ties by URL),
+    # sums differ in the last bits and matched terms are listed in any order
+    return sorted(((url, round(score, 9), tuple(sorted(terms) for terms in matched))
+                   for url, score, matched in hits), key=lambda hit: (-hit[1], hit[0]))
+
+@pytest.mark.parametrize('seed', range(3))
+def test_search_many_matches_search(seed):
+    index = InvertedIndex().build(random_pages(seed))
+    queries = random_queries(seed)
+    results, match_counts = ScoreMatrix(index).search_many(queries, limit=None)
+    for query, batch, count in zip(queries, results, match_counts):
+        single = index.search(query)
+        assert ranked(batch) == ranked(single)
+        assert count == len(single)
+
+def test_limit_keeps_the_top_scores():
+    index = InvertedIndex().build(random_pages(3))
+    queries = random_queries(3)
+    results, _ = ScoreMatrix(index).search_many(queries, limit=5)
+    for query, batch in zip(queries, results):
+        single = index.search(query, limit=5)
+        assert [round(score, 9) for _, score, _ in batch] == [round(score, 9) for _, score, _ in single]
+
+def test_mapped_index_scores_like_in_memory(tmp_path):
+    pages = random_pages(4)
+    index, passages = InvertedIndex().build(pages), PassageStore(max_tokens=20).build(pages)
+    write_snapshot(str(tmp_path / 'pages.idx'), index, passages, ['store', 1, len(pages)])
+    mapped, _ = open_snapshot(str(tmp_path / 'pages.idx'), ['store', 1, len(pages)], max_tokens=20)
+    queries = random_queries(4)
+    from_mapped, _ = ScoreMatrix(mapped).search_many(queries, limit=None)
+    from_memory, _ = ScoreMatrix(index).search_many(queries, limit=None)
+    assert [ranked(hits) for hits in from_mapped] == [ranked(hits) for hits in from_memory]
+
+def test_enhancer_batch_matches_single_calls():
+    e = LLMContextEnhancer()
+    for url, page in random_pages(5, n=15).items():
+        e.update_page(url, page)
+    queries = random_queries(5, n=20)
+    def ranked_hits(hits):
+        return [dict(hit, relevance_score=round(hit['relevance_score'], 9))
+                for hit in sorted(hits, key=lambda hit: (-round(hit['relevance_score'], 9), hit['url']))]
+    for batch, query in zip(e.search_many(queries, limit=None), queries):
+        assert ranked_hits(batch) == ranked_hits(e.search_content(query))
+    for batch, query in zip(e.search_passages_many(queries, k=50), queries):
+        assert ({(p, round(s, 9)) for p, s in batch} ==
+                {(p, round(s, 9)) for p, s in e.search_passages(query, k=50)})
+
+def test_score_matrix_is_rebuilt_after_update():
+    e = LLMContextEnhancer()
+    e.update_page('https://a/one', {'title': 'One', 'content': 'sidebar', 'headings': [], 'paragraphs': []})
+    assert [hit['url'] for hit in e.search_many(['navbar'])[0]] == []
+    e.update_page('https://a/two', {'title': 'Two', 'content': 'navbar', 'headings': [], 'paragraphs': []})
+    assert [hit['url'] for hit in e.search_many(['navbar'])[0]] == ['https://a/two']
@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+from dedup import (Deduplicator, MinHasher, NearDuplicateIndex, Resolution, hamming_distance,
+                   page_fingerprint, simhash)
+from passages import pack_texts
+
+BODY = ("Docusaurus generates the sidebar from the docs folder. Each category has an index page "
+        "and items are sorted by their sidebar position. ") * 6
+
+def page(content, **extra):
+    return dict(extra, content=content)
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b)
+
+def test_minhash_estimates_jaccard():
+    hasher = MinHasher(num_perm=256)
+    other = BODY.replace('index page', 'landing page').replace('position', 'weight')
+    estimate = float((hasher.signature(BODY) == hasher.signature(other)).mean())
+    assert estimate == pytest.approx(jaccard(hasher.shingles(BODY), hasher.shingles(other)), abs=0.1)
+
+def test_minhash_error_is_small_across_many_pairs():
+    # Correlated permutations keep the mean error near zero but blow up its spread
+    rng = np.random.default_rng(0)
+    hasher = MinHasher(num_perm=128)
+    errors = []
+    for _ in range(30):
+        words = [f"w{i}" for i in rng.integers(0, 2000, 300)]
+        edited = list(words)
+        for position in rng.integers(0, 300, rng.integers(5, 80)):
+            edited[position] = f"x{position}"
+        a, b = ' '.join(words), ' '.join(edited)
+        estimate = float((hasher.signature(a) == hasher.signature(b)).mean())
+        errors.append(estimate - jaccard(hasher.shingles(a), hasher.shingles(b)))
+    assert abs(np.mean(errors)) < 0.03 and np.std(errors) < 0.07
+
+def test_signatures_are_stable_and_round_trip():
+    first, second = MinHasher(), MinHasher()
+    assert np.array_equal(first.signature(BODY), second.signature(BODY))
+    assert np.array_equal(first.decode(page_fingerprint(BODY)), first.signature(BODY))
+
+def test_index_finds_near_duplicates_only():
+    index = NearDuplicateIndex(threshold=0.8)
+    hasher = index.hasher
+    index.add('v1', hasher.signature(BODY))
+    index.add('blog', hasher.signature("Release notes for the blog plugin and feed options. " * 6))
+    matches = index.query(hasher.signature(BODY + " Edited."))
+    assert [key for key, _ in matches] == ['v1']
+    index.remove('v1')
+    assert index.query(hasher.signature(BODY)) == [] and len(index) == 1
+
+def test_bands_must_divide_permutations():
+    with pytest.raises(ValueError):
+        NearDuplicateIndex(bands=7)
+
+def test_deduplicator_folds_versions_into_first_seen():
+    dedup = Deduplicator()
+    assert dedup.resolve('https://d.io/docs/sidebar', page(BODY)) == Resolution('https://d.io/docs/sidebar', None)
+    assert dedup.resolve('https://d.io/docs/1.0/sidebar', page(BODY)) == Resolution(
+        'https://d.io/docs/sidebar', 'https://d.io/docs/1.0/sidebar')
+    assert dedup.aliases_for('https://d.io/docs/sidebar') == ['https://d.io/docs/1.0/sidebar']
+
+def test_same_host_canonical_link_wins():
+    dedup = Deduplicator()
+    resolution = dedup.resolve('https://d.io/docs/sidebar?tab=1',
+                               page(BODY, canonical='https://d.io/docs/sidebar/'))
+    assert resolution == Resolution('https://d.io/docs/sidebar', None)
+    assert dedup.aliases_for('https://d.io/docs/sidebar') == ['https://d.io/docs/sidebar?tab=1']
+    # A foreign canonical is ignored
+    assert dedup.resolve('https://d.io/other', page("Unrelated text about search. " * 5,
+                                                    canonical='https://evil.example/x')).canonical == 'https://d.io/other'
+
+def test_fingerprints_of_older_hashers_are_recomputed():
+    dedup = Deduplicator()
+    legacy = page_fingerprint(BODY)[len('mh2:'):]
+    assert dedup.index.hasher.decode(legacy) is None
+    assert np.array_equal(dedup.signature(page(BODY, fingerprint=legacy)), dedup.index.hasher.signature(BODY))
+
+def test_build_restores_aliases_and_fingerprints():
+    stored = [('https://d.io/a', page(BODY, fingerprint=page_fingerprint(BODY), aliases=['https://d.io/a2']))]
+    dedup = Deduplicator().build(stored)
+    assert dedup.aliases_for('https://d.io/a') == ['https://d.io/a2']
+    assert dedup.resolve('https://d.io/a3', page(BODY)).canonical == 'https://d.io/a'
+    dedup.remove('https://d.io/a')
+    assert dedup.aliases_for('https://d.io/a') == []
+
+def test_simhash_separates_near_and_far_texts():
+    near = BODY.replace('index page', 'overview page')
+    far = "Translations live in the i18n folder, one directory per locale. " * 6
+    assert hamming_distance(simhash(BODY), simhash(near)) <= 6
+    assert hamming_distance(simhash(BODY), simhash(far)) > 6
+
+def test_packing_drops_repeats_contained_and_near_identical_texts():
+    texts = [BODY, BODY.upper(), BODY[:200], BODY.replace('index page', 'overview page'),
+             "Translations live in the i18n folder."]
+    packed, used = pack_texts(texts, token_budget=10_000)
+    assert packed == [BODY, "Translations live in the i18n folder."]
+    assert used > 0
@@ -0,0 +1,133 @@
+import os
+
+import pytest
+
+from content_store import open_store
+from docs_source import (SourceIngester, blog_route, doc_route, load_site_config, page_url,
+                         parse_front_matter, parse_js_literal)
+
+SETTINGS = {'url': 'https://example.com', 'base_url': '/', 'trailing_slash': None,
+            'docs_route': 'docs', 'blog_route': 'blog'}
+
+@pytest.mark.parametrize('rel_path, front_matter, expected', [
+    ('intro.md', {}, ('intro', '/docs/intro')),
+    ('01-guides/02-sidebar.md', {}, ('guides/sidebar', '/docs/guides/sidebar')),
+    ('guides/index.md', {}, ('guides/index', '/docs/guides')),
+    ('guides/guides.mdx', {}, ('guides/guides', '/docs/guides')),
+    ('guides/sidebar.md', {'id': 'nav'}, ('guides/nav', '/docs/guides/nav')),
+    ('guides/sidebar.md', {'slug': 'menu'}, ('guides/sidebar', '/docs/guides/menu')),
+    ('guides/sidebar.md', {'slug': '/menu'}, ('guides/sidebar', '/docs/menu')),
+])
+def test_doc_route(rel_path, front_matter, expected):
+    assert doc_route(SETTINGS, rel_path, front_matter) == expected
+
+def test_doc_route_at_site_root():
+    assert doc_route(dict(SETTINGS, docs_route='/'), 'intro.md', {}) == ('intro', '/intro')
+
+@pytest.mark.parametrize('rel_path, front_matter, expected', [
+    ('2021-08-01-mdx-blog-post.mdx', {}, ('2021-08-01', '/blog/2021/08/01/mdx-blog-post')),
+    ('2021-08-26-welcome/index.md', {}, ('2021-08-26', '/blog/2021/08/26/welcome')),
+    ('2019-05-28-first.md', {'slug': 'hello'}, ('2019-05-28', '/blog/hello')),
+    ('notes.md', {'date': '2020-01-02T10:00:00'}, ('2020-01-02', '/blog/notes')),
+    ('news/launch/index.md', {}, (None, '/blog/news/launch')),
+])
+def test_blog_route(rel_path, front_matter, expected):
+    assert blog_route(SETTINGS, rel_path, front_matter) == expected
+
+def test_page_url_applies_base_url_trailing_slash_and_quoting():
+    settings = dict(SETTINGS, base_url='/site/', trailing_slash=True)
+    assert page_url(settings, '/docs/café') == 'https://example.com/site/docs/caf%C3%A9/'
+    assert page_url(SETTINGS, '/') == 'https://example.com/'
+
+def test_parse_front_matter():
+    front_matter, body = parse_front_matter(
+        "---\ntitle: 'Sidebar: the basics'\nsidebar_position: 2\ndraft: false\n"
+        "tags: [docs, 'ui']\nauthors:\n  - name: x\n---\n# Body\n")
+    assert front_matter == {'title': 'Sidebar: the basics', 'sidebar_position': 2, 'draft': False,
+                            'tags': ['docs', 'ui'], 'authors': ''}
+    assert body == '# Body\n'
+    assert parse_front_matter('# No front matter') == ({}, '# No front matter')
+
+def test_parse_js_literal_keeps_literals_and_drops_expressions():
+    source = """
+    // @ts-check
+    const config = {
+      title: 'My Site',   /* inline comment */
+      url: process.env.URL || "https://example.com",
+      trailingSlash: false,
+      presets: [['classic', {docs: {routeBasePath: '/', sidebarPath: require.resolve('./sidebars.js')}}]],
+      plugins: [function plugin() { return {name: 'x'}; }],
+      count: 3, ratio: 1.5, nothing: null,
+      headTags() { return []; },
+      escaped: 'it\\'s',
+    };
+    module.exports = config;
+    """
+    config = parse_js_literal(source)
+    assert config['title'] == 'My Site'
+    assert config['url'] is None
+    assert config['trailingSlash'] is False
+    assert config['presets'] == [['classic', {'docs': {'routeBasePath': '/', 'sidebarPath': None}}]]
+    assert config['plugins'] == [None]
+    assert (config['count'], config['ratio'], config['nothing']) == (3, 1.5, None)
+    assert 'headTags' not in config
+    assert config['escaped'] == "it's"
+
+def test_load_site_config(tmp_path):
+    (tmp_path / 'docusaurus.config.js').write_text("""
+    module.exports = {
+      title: 'Docs',
+      url: process.env.CI ? 'http://localhost:3000' : 'https://docs.example.com',
+      baseUrl: '/base/',
+      presets: [['classic', {
+        docs: {routeBasePath: 'guide', sidebarPath: require.resolve('./sidebars.js')},
+        blog: false,
+      }]],
+    };
+    """)
+    (tmp_path / 'sidebars.js').write_text("""
+    module.exports = {
+      main: ['intro', {type: 'category', label: 'Basics', items: ['basics/setup']},
+             {type: 'autogenerated', dirName: 'extras'}],
+    };
+    """)
+    settings = load_site_config(str(tmp_path))
+    assert settings['url'] == 'https://docs.example.com'
+    assert (settings['base_url'], settings['docs_route']) == ('/base/', 'guide')
+    assert settings['blog_path'] is None
+    assert settings['sidebars']['docs']['basics/setup'] == {'sidebar': 'main', 'categories': ['Basics'],
+                                                           'position': 1}
+    assert settings['sidebars']['autogenerated'] == [{'dir': 'extras', 'sidebar': 'main', 'categories': []}]
+    assert page_url(settings, doc_route(settings, 'basics/setup.md', {})[1]) == \
+        'https://docs.example.com/base/guide/basics/setup'
+
+class IndexRecorder:
+    def __init__(self):
+        self.indexed = []
+
+    def index_page(self, url, page):
+        self.indexed.append(url)
+
+    def remove_page(self, url):
+        self.indexed.append(('removed', url))
+
+def test_touched_but_identical_file_is_not_reindexed(tmp_path):
+    (tmp_path / 'docusaurus.config.js').write_text(
+        "module.exports = {\n  title: 'Docs',\n  url: 'https://docs.example.com',\n  baseUrl: '/',\n};\n")
+    (tmp_path / 'docs').mkdir()
+    intro = tmp_path / 'docs' / 'intro.md'
+    intro.write_text('# Intro\n\nWelcome to the docs.\n')
+    store = open_store(str(tmp_path / 'pages.db'))
+    recorder = IndexRecorder()
+    ingester = SourceIngester(store, recorder, str(tmp_path), parse_workers=1)
+    ingester.run()
+    assert ingester.changed_urls == ['https://docs.example.com/docs/intro'] == recorder.indexed
+
+    recorder.indexed.clear()
+    stat = intro.stat()
+    os.utime(intro, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert ingester.run()['unchanged'] == 1
+    assert ingester.changed_urls == [] and recorder.indexed == []
+    # The new mtime was recorded: the next run skips the file on its stat alone
+    assert store.get('https://docs.example.com/docs/intro')['source']['mtime_ns'] == intro.stat().st_mtime_ns
+    store.close()
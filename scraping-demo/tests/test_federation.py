@@ -0,0 +1,99 @@
+import json
+import threading
+import time
+
+import pytest
+
+from content_store import open_store
+from federation import ShardRouter, SiteShard, load_sites
+
+def page(title, content):
+    return {'title': title, 'content': content, 'headings': [], 'paragraphs': [content]}
+
+def make_shard(tmp_path, name, pages):
+    store = open_store(str(tmp_path / f'{name}.db'))
+    for url, content in pages.items():
+        store.put(url, content)
+    store.close()
+    return SiteShard(name, f'https://{name}.example.com', str(tmp_path / f'{name}.db'))
+
+class SlowShard:
+    """Stands in for a SiteShard whose searches block until released"""
+    def __init__(self, name):
+        self.name = name
+        self.deadline = None
+        self.release = threading.Event()
+
+    def load(self):
+        return self
+
+    def search(self, query, k=10):
+        self.release.wait(5)
+        return [{'url': f'https://{self.name}/', 'title': self.name, 'relevance_score': 1.0,
+                 'content_snippet': query}], 1.0
+
+def test_merges_shards_by_normalized_score(tmp_path):
+    docs = make_shard(tmp_path, 'docs', {'https://docs/sidebar': page('Sidebar', 'The sidebar lists docs.')})
+    blog = make_shard(tmp_path, 'blog', {'https://blog/post': page('Release', 'The sidebar got faster.'),
+                                         'https://blog/other': page('Other', 'Unrelated news.')})
+    with ShardRouter([docs, blog], deadline=5) as router:
+        hits, statuses = router.search('sidebar', k=5)
+    assert {hit['site'] for hit in hits} == {'docs', 'blog'}
+    assert all(0 < hit['normalized_score'] <= 1 for hit in hits)
+    assert [hit['normalized_score'] for hit in hits] == sorted((hit['normalized_score'] for hit in hits),
+                                                              reverse=True)
+    assert {name: status['status'] for name, status in statuses.items()} == {'docs': 'ok', 'blog': 'ok'}
+
+def test_concurrent_searches_queue_instead_of_skipping():
+    shard = SlowShard('slow')
+    with ShardRouter([shard], deadline=5, workers_per_shard=1, queue_per_shard=2) as router:
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(router.search('q'))) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        shard.release.set()
+        for thread in threads:
+            thread.join()
+    assert [statuses['slow']['status'] for _, statuses in results] == ['ok'] * 3
+
+def test_full_queue_skips_shard_and_says_so():
+    shard = SlowShard('slow')
+    with ShardRouter([shard], deadline=5, workers_per_shard=1, queue_per_shard=0) as router:
+        first = threading.Thread(target=router.search, args=('q',))
+        first.start()
+        time.sleep(0.1)
+        prompt, status = router.enhance_prompt('q')
+        hits, statuses = router.search('q')
+        shard.release.set()
+        first.join()
+    assert hits == [] and statuses['slow'] == {'status': 'busy', 'ms': 0.0, 'skipped': True}
+    assert 'skipped: slow (busy)' in status
+
+def test_deadline_skips_slow_shard():
+    shard = SlowShard('slow')
+    with ShardRouter([shard], deadline=0.05) as router:
+        hits, statuses = router.search('q')
+        shard.release.set()
+    assert hits == [] and statuses['slow']['status'] == 'timeout' and statuses['slow']['skipped']
+
+def test_load_sites_resolves_paths_from_config_dir(tmp_path):
+    (tmp_path / 'sites.json').write_text(json.dumps({
+        'deadline': 1, 'queue_per_shard': 3,
+        'sites': [{'name': 'docs', 'base_url': 'https://docs', 'content_file': 'docs.db',
+                   'source_root': 'site', 'build_dir': 'site/build'}]}))
+    (shard,), options = load_sites(str(tmp_path / 'sites.json'))
+    assert shard.content_file == str(tmp_path / 'docs.db')
+    assert shard.source_root == str(tmp_path / 'site')
+    assert shard.build_dir == str(tmp_path / 'site' / 'build')
+    assert options == {'deadline': 1, 'queue_per_shard': 3}
+
+def test_reindex_swaps_and_closes_old_enhancer(tmp_path):
+    shard = make_shard(tmp_path, 'docs', {'https://docs/sidebar': page('Sidebar', 'The sidebar lists docs.')})
+    old = shard.enhancer
+    closed = []
+    old.close = lambda: closed.append(True)
+    shard.reindex()
+    assert shard.enhancer is not old and closed == [True]
+    results, _ = shard.search('sidebar')
+    assert [result['url'] for result in results] == ['https://docs/sidebar']
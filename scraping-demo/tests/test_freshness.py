@@ -0,0 +1,91 @@
+import threading
+import time
+
+import pytest
+
+from freshness import FreshnessPolicy
+
+class Site:
+    """Fetch function whose calls block until `release` is set"""
+    def __init__(self, cached=()):
+        self.cached = set(cached)
+        self.calls = []
+        self.release = threading.Event()
+        self.release.set()
+        self.lock = threading.Lock()
+
+    def revalidate(self, url):
+        with self.lock:
+            self.calls.append(url)
+        self.release.wait(5)
+        self.cached.add(url)
+        return True
+
+@pytest.fixture
+def site():
+    return Site()
+
+def policy(site, **kwargs):
+    return FreshnessPolicy(site.revalidate, site.cached.__contains__, **kwargs)
+
+def test_concurrent_fetches_share_one_flight(site):
+    site.release.clear()
+    freshness = policy(site, workers=4)
+    futures = [freshness.fetch('https://a/page') for _ in range(5)]
+    assert all(future is futures[0] for future in futures)
+    site.release.set()
+    freshness.wait_idle(5)
+    assert site.calls == ['https://a/page']
+    # Once finished, a new fetch starts a new flight
+    freshness.fetch('https://a/page').result(5)
+    assert site.calls == ['https://a/page'] * 2
+    freshness.close()
+
+def test_check_outcomes(site):
+    site.cached.update({'https://a/fresh', 'https://a/stale'})
+    freshness = policy(site, ttl=60)
+    freshness.fetch('https://a/fresh').result(5)
+    outcomes = freshness.check(['https://a/fresh', 'https://a/stale', 'https://a/missing'], deadline=5)
+    assert outcomes == {'https://a/fresh': 'fresh', 'https://a/stale': 'stale',
+                        'https://a/missing': 'fetched'}
+    freshness.wait_idle(5)
+    assert sorted(site.calls) == ['https://a/fresh', 'https://a/missing', 'https://a/stale']
+    freshness.close()
+
+def test_without_deadline_missing_pages_are_deferred(site):
+    freshness = policy(site)
+    assert freshness.check(['https://a/missing']) == {'https://a/missing': 'deferred'}
+    freshness.wait_idle(5)
+    assert 'https://a/missing' in site.cached   # fetched in the background
+    freshness.close()
+
+def test_caller_never_waits_past_the_deadline(site):
+    site.release.clear()
+    freshness = policy(site)
+    start = time.perf_counter()
+    assert freshness.check(['https://a/slow'], deadline=0.05) == {'https://a/slow': 'deferred'}
+    assert time.perf_counter() - start < 1
+    # The overrunning fetch finishes in the background
+    site.release.set()
+    freshness.wait_idle(5)
+    assert 'https://a/slow' in site.cached
+    freshness.close()
+
+def test_slow_history_defers_without_waiting(site):
+    freshness = policy(site)
+    freshness.fetch_seconds = 10.0   # expected fetch time does not fit the deadline
+    assert freshness.check(['https://a/missing'], deadline=0.5) == {'https://a/missing': 'deferred'}
+    freshness.close()
+
+def test_failed_fetch_is_deferred_and_not_retried_before_ttl():
+    calls = []
+    def failing(url):
+        calls.append(url)
+        raise ConnectionError('offline')
+    freshness = FreshnessPolicy(failing, lambda url: url == 'https://a/stale', ttl=60)
+    assert freshness.check(['https://a/missing'], deadline=5) == {'https://a/missing': 'deferred'}
+    freshness.fetch('https://a/stale').exception(5)
+    freshness.wait_idle(5)
+    assert freshness.check(['https://a/stale']) == {'https://a/stale': 'fresh'}
+    assert calls == ['https://a/missing', 'https://a/stale']
+    freshness.close()
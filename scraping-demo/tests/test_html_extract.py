@@ -0,0 +1,43 @@
+import pytest
+
+from html_extract import extract_page, extract_stream, extract_with_soup
+
+PAGE = """<html><head>
+<title>Sidebar Guide</title>
+<script>var t = 1;</script>
+<meta name="description" content="How the sidebar works">
+<link rel="Canonical" href="https://example.com/docs/sidebar">
+<style>p { color: red; }</style>
+</head><body>
+<nav><a href="/docs/intro">Intro</a></nav>
+<main>
+<h1>Sidebar</h1>
+<script>window.tracking = "not content";</script>
+<p>The sidebar is generated from <a href="/docs/config">config</a>.</p>
+<template><h2>Template heading</h2><p>template paragraph</p><a href="/hidden">x</a></template>
+<aside>Related pages</aside>
+<h2>Autogenerated</h2>
+<p>Items can be autogenerated.</p>
+<footer>Footer text</footer>
+</main>
+</body></html>"""
+
+def test_lxml_extracts_visible_fields():
+    page = extract_page(PAGE)
+    assert page['title'] == 'Sidebar Guide'
+    assert page['headings'] == [{'level': 'h1', 'text': 'Sidebar'}, {'level': 'h2', 'text': 'Autogenerated'}]
+    assert page['paragraphs'] == ['The sidebar is generated from config.', 'Items can be autogenerated.']
+    assert page['metadata'] == {'description': 'How the sidebar works'}
+    assert page['canonical'] == 'https://example.com/docs/sidebar'
+    assert page['links'] == ['/docs/intro', '/docs/config']
+    for hidden in ('tracking', 'template paragraph', 'Related pages', 'Footer text'):
+        assert hidden not in page['content']
+
+@pytest.mark.parametrize('html', [PAGE, '<html><body><p>No main here</p></body></html>'])
+def test_soup_fallback_matches_lxml(html):
+    assert extract_with_soup(html) == extract_page(html)
+
+def test_stream_matches_single_string():
+    data = PAGE.encode('utf-8')
+    chunks = [data[i:i + 37] for i in range(0, len(data), 37)]
+    assert extract_stream(chunks) == extract_page(PAGE)
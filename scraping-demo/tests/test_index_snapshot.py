@@ -0,0 +1,72 @@
+import pytest
+
+from index_snapshot import MappedIndex, open_snapshot, write_snapshot
+from passages import PassageStore
+from search_index import InvertedIndex
+
+PAGES = {
+    f"https://docs.example.com/{topic}": {
+        'title': topic.title(),
+        'content': f"# {topic.title()}\n\nThe {topic} is configured in docusaurus.config.js.\n\n"
+                   f"## Options\n\nEvery {topic} option has a default. Straße café {topic}.",
+        'headings': [{'level': 'h1', 'text': topic.title()}, {'level': 'h2', 'text': 'Options'}],
+    }
+    for topic in ('sidebar', 'navbar', 'footer', 'blog', 'search', 'versioning')
+}
+QUERIES = ['sidebar', 'options default', 'configured docusaurus', 'café', 'missing term']
+
+def ranked(results):
+    # Equal scores may come back in either order: the snapshot numbers docs by URL
+    return sorted(results, key=lambda hit: (-round(hit[1], 9), str(hit[0])))
+
+def build():
+    return InvertedIndex().build(PAGES), PassageStore(max_tokens=20).build(PAGES)
+
+def snapshot(path, key=('store', 1, 6)):
+    index, passages = build()
+    write_snapshot(path, index, passages, list(key))
+    return index, passages, open_snapshot(path, list(key), max_tokens=20)
+
+# Different key lengths shift the header size, which the section layout depends on
+@pytest.mark.parametrize('name', ['s', 'snapshot-' + 'x' * 37, 'y' * 120])
+def test_mapped_index_answers_like_the_built_one(tmp_path, name):
+    index, passages, (mapped, mapped_passages) = snapshot(str(tmp_path / 'c.idx'), (name, 7, 6))
+    assert isinstance(mapped, MappedIndex)
+    for query in QUERIES:
+        assert ranked(mapped.search(query)) == ranked(index.search(query))
+        assert ranked(mapped_passages.search(query)) == ranked(passages.search(query))
+    assert mapped.score_bound('sidebar options') == index.score_bound('sidebar options')
+
+@pytest.mark.parametrize('name', ['s', 'z' * 61])
+def test_thaw_restores_an_updatable_index(tmp_path, name):
+    index, passages, (mapped, mapped_passages) = snapshot(str(tmp_path / 'c.idx'), (name, 1, 6))
+    thawed = mapped.thaw()
+    assert thawed.postings == index.postings
+    assert thawed.doc_positions == index.doc_positions
+    assert thawed.doc_lengths == index.doc_lengths
+    thawed.add_page('https://docs.example.com/i18n', {'title': 'Translations', 'content': 'Translate it.'})
+    assert thawed.search('translate')[0][0] == 'https://docs.example.com/i18n'
+    assert mapped_passages.thaw().passages == passages.passages
+
+def test_sections_stay_in_place_for_every_header_length(tmp_path):
+    index, passages = build()
+    path = str(tmp_path / 'c.idx')
+    for padding in range(80):
+        key = ['p' * padding, 10 ** (padding % 12), 6]
+        write_snapshot(path, index, passages, key)
+        mapped, _ = open_snapshot(path, key, max_tokens=20)
+        assert mapped.thaw().doc_positions == index.doc_positions, padding
+
+def test_stale_or_missing_snapshot_is_ignored(tmp_path):
+    path = str(tmp_path / 'c.idx')
+    snapshot(path)
+    assert open_snapshot(path, ['store', 2, 6], max_tokens=20) is None
+    assert open_snapshot(path, ['store', 1, 6], max_tokens=50) is None
+    assert open_snapshot(str(tmp_path / 'missing.idx'), ['store', 1, 6]) is None
+
+def test_mapped_structures_are_read_only(tmp_path):
+    _, _, (mapped, mapped_passages) = snapshot(str(tmp_path / 'c.idx'))
+    with pytest.raises(TypeError):
+        mapped.add_page('u', {'title': 't', 'content': 'c'})
+    with pytest.raises(TypeError):
+        mapped_passages.remove_page('https://docs.example.com/sidebar')
@@ -0,0 +1,95 @@
+import gzip
+import hashlib
+import threading
+import types
+
+import pytest
+
+from content_store import JsonContentStore
+from ingest_pipeline import IngestPipeline, html_route, iter_directory, iter_warc, parse_document
+from simple_scraper import SimpleDocsScraper
+
+def html(title, body):
+    return (f"<html><head><title>{title}</title></head>"
+            f"<body><main><h1>{title}</h1><p>{body}</p></main></body></html>")
+
+def test_content_hash_matches_the_scraper():
+    body = html('Café', 'Le café est prêt.').encode('utf-8')
+    response = types.SimpleNamespace(content=body, headers={})
+    scraped = SimpleDocsScraper('https://example.com')._extract_validators(response)
+    parsed = parse_document('https://example.com/cafe', body)
+    assert parsed['validators']['content_hash'] == scraped['content_hash']
+    assert parsed['title'] == 'Café'
+
+def test_body_is_decoded_with_the_declared_charset():
+    body = html('Café', 'Prêt').encode('latin-1')
+    page = parse_document('u', body, {'content-type': 'text/html; charset=iso-8859-1'})
+    assert page['title'] == 'Café'
+    assert page['validators']['content_hash'] == hashlib.sha256(body).hexdigest()
+
+def test_html_route():
+    assert html_route('/site', '/site/docs/intro/index.html') == 'docs/intro'
+    assert html_route('/site', '/site/index.html') == ''
+    assert html_route('/site', '/site/blog/post.html') == 'blog/post'
+
+def test_iter_directory_yields_raw_bytes(tmp_path):
+    (tmp_path / 'docs').mkdir()
+    (tmp_path / 'docs' / 'index.html').write_bytes(html('Docs', 'x').encode())
+    (tmp_path / 'notes.txt').write_text('skip me')
+    documents = list(iter_directory(str(tmp_path), 'https://example.com/'))
+    assert documents == [('https://example.com/docs', html('Docs', 'x').encode(), {})]
+
+def warc_record(uri, http_headers, body):
+    payload = ("HTTP/1.1 200 OK\r\n" + "".join(f"{k}: {v}\r\n" for k, v in http_headers.items())
+               + "\r\n").encode('latin-1') + body
+    return (f"WARC/1.0\r\nWARC-Type: response\r\nWARC-Target-URI: {uri}\r\n"
+            f"Content-Length: {len(payload)}\r\n\r\n").encode('latin-1') + payload + b"\r\n\r\n"
+
+def test_iter_warc_decodes_transfer_and_content_encoding(tmp_path):
+    body = html('Sidebar', 'Generated.').encode()
+    compressed = gzip.compress(body)
+    chunked = f"{len(compressed):x}\r\n".encode() + compressed + b"\r\n0\r\n\r\n"
+    path = tmp_path / 'crawl.warc.gz'
+    path.write_bytes(gzip.compress(
+        warc_record('https://example.com/plain', {'Content-Type': 'text/html'}, body) +
+        warc_record('https://example.com/packed', {'Content-Type': 'text/html', 'Content-Encoding': 'gzip',
+                                                   'Transfer-Encoding': 'chunked'}, chunked) +
+        warc_record('https://example.com/logo', {'Content-Type': 'image/png'}, b'\x89PNG')))
+    records = list(iter_warc(str(path)))
+    assert [(url, data) for url, data, _ in records] == [
+        ('https://example.com/plain', body), ('https://example.com/packed', body)]
+
+def test_pipeline_ingests_and_folds_near_duplicates(tmp_path):
+    text = 'Docusaurus builds the sidebar from the docs folder and sorts items by position. ' * 5
+    documents = [('https://example.com/a', html('A', text).encode(), {}),
+                 ('https://example.com/a?ref=nav', html('A', text).encode(), {}),
+                 ('https://example.com/b', html('B', 'Something else entirely about blog posts.').encode(), {})]
+    store = JsonContentStore(str(tmp_path / 'content.json'))
+    stats = IngestPipeline(store, parse_workers=1, batch_size=2).ingest_documents(documents)
+    assert stats['parsed'] == 3 and stats['duplicates'] == 1
+    assert sorted(url for url, _ in store.items()) == ['https://example.com/a', 'https://example.com/b']
+    assert store.get('https://example.com/a')['aliases'] == ['https://example.com/a?ref=nav']
+
+class FailingStore(JsonContentStore):
+    def put_many(self, pages):
+        raise OSError("disk full")
+
+def test_writer_failure_stops_the_pipeline(tmp_path):
+    store = FailingStore(str(tmp_path / 'content.json'))
+    # More documents than the queues hold: a dead writer used to leave the parsers blocked
+    documents = [(f"https://example.com/{i}", html(f"Page {i}", f"body {i}").encode(), {})
+                 for i in range(200)]
+    pipeline = IngestPipeline(store, parse_workers=1, queue_size=4, batch_size=1, dedup=False)
+    outcome = {}
+
+    def run():
+        try:
+            pipeline.ingest_documents(documents)
+        except Exception as e:
+            outcome['error'] = e
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(60)
+    assert not thread.is_alive(), "pipeline deadlocked after the writer failed"
+    assert isinstance(outcome.get('error'), OSError)
@@ -0,0 +1,83 @@
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+import instrumentation
+from instrumentation import METRICS
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'   # keep-alive, so a second request reuses the connection
+
+    def do_GET(self):
+        body = b'ok'
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd.server_address[1]
+    httpd.shutdown()
+    httpd.server_close()
+
+@pytest.fixture
+def lookups(monkeypatch):
+    calls = []
+    real = socket.getaddrinfo
+    def counting(host, *args, **kwargs):
+        calls.append(host)
+        return real(host, *args, **kwargs)
+    monkeypatch.setattr(socket, 'getaddrinfo', counting)
+    return calls
+
+def histogram(name):
+    return next(h for h in METRICS.snapshot()['histograms'] if h['name'] == name)
+
+def test_resolves_each_new_connection_once(server, lookups):
+    METRICS.reset()
+    session = requests.Session()
+    session.mount('http://', instrumentation.TimedHTTPAdapter())
+    for _ in range(2):
+        assert session.get(f'http://localhost:{server}/').text == 'ok'   # second reuses the connection
+    session.close()
+
+    assert lookups.count('localhost') == 1
+    assert histogram('fetch_dns_seconds')['count'] == 1
+    assert histogram('fetch_connect_seconds')['count'] == 1
+
+def test_unresolvable_host_raises_urllib3_error(lookups):
+    session = requests.Session()
+    session.mount('http://', instrumentation.TimedHTTPAdapter())
+    with pytest.raises(requests.ConnectionError):
+        session.get('http://does-not-exist.invalid/', timeout=5)
+
+def test_falls_through_to_next_address(server, monkeypatch):
+    real = socket.getaddrinfo
+    def two_addresses(host, port, *args, **kwargs):
+        good = real('127.0.0.1', port, *args, **kwargs)
+        refused = [(socket.AF_INET, socket.SOCK_STREAM, 6, '', ('127.0.0.2', port))]   # server binds .1 only
+        return refused + good if host == 'localhost' else real(host, port, *args, **kwargs)
+    monkeypatch.setattr(socket, 'getaddrinfo', two_addresses)
+    session = requests.Session()
+    session.mount('http://', instrumentation.TimedHTTPAdapter())
+    METRICS.reset()
+    assert session.get(f'http://localhost:{server}/').text == 'ok'
+    assert histogram('fetch_connect_seconds')['count'] == 1
+
+def test_concurrent_cprofile_samples_are_skipped(tmp_path):
+    profiler = instrumentation.Profiler(rate=1.0, directory=str(tmp_path))
+    with profiler.maybe_profile('outer') as outer:
+        with profiler.maybe_profile('inner') as inner:
+            pass
+    assert outer and inner is None
+    assert [path.name.startswith('outer') for path in tmp_path.iterdir()] == [True]
@@ -0,0 +1,139 @@
+import asyncio
+import sys
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from llm_backend import LLMClient, OpenAIBackend, ResponseCache, StubBackend, TransientLLMError
+
+class CountingBackend(StubBackend):
+    """Stub that records the most calls it ever had running at once"""
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.running = 0
+        self.peak = 0
+        self.loops = set()
+
+    async def complete(self, prompt, **params):
+        self.loops.add(asyncio.get_running_loop())
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            return await super().complete(prompt, **params)
+        finally:
+            self.running -= 1
+
+def test_identical_prompts_in_flight_share_one_call():
+    backend = CountingBackend(latency=0.05)
+    client = LLMClient(backend)
+    answers = asyncio.run(client.complete_many(['same'] * 5 + ['other']))
+    assert answers[0] == answers[4] != answers[5]
+    assert backend.calls == 2
+    assert client.stats['coalesced'] == 4
+
+def test_cancelled_leader_does_not_cancel_coalesced_waiters():
+    backend = CountingBackend(latency=0.05)
+    client = LLMClient(backend)
+
+    async def scenario():
+        leader = asyncio.ensure_future(client.complete('same'))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(client.complete('same'))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await waiter, leader.cancelled()
+
+    answer, leader_cancelled = asyncio.run(scenario())
+    assert leader_cancelled and answer
+    assert backend.calls == 1
+
+def test_transient_failures_are_retried():
+    backend = StubBackend(latency=0)
+    failures = iter([TransientLLMError('busy'), TransientLLMError('busy')])
+    complete = backend.complete
+
+    async def flaky(prompt, **params):
+        error = next(failures, None)
+        if error:
+            raise error
+        return await complete(prompt, **params)
+
+    backend.complete = flaky
+    client = LLMClient(backend, base_delay=0.001, max_delay=0.002)
+    assert asyncio.run(client.complete('q')) == backend.responder('q')
+    assert client.stats['retries'] == 2
+
+def test_gives_up_after_max_retries():
+    client = LLMClient(StubBackend(latency=0, failure_rate=1.0), max_retries=2, base_delay=0.001)
+    with pytest.raises(TransientLLMError):
+        asyncio.run(client.complete('q'))
+    assert client.stats['backend_calls'] == 3
+
+def test_blocking_calls_from_many_threads_share_one_loop():
+    backend = CountingBackend(latency=0.02)
+    client = LLMClient(backend, max_concurrency=3)
+    prompts = [f"q{i % 10}" for i in range(40)]
+    try:
+        with ThreadPoolExecutor(8) as pool:
+            answers = list(pool.map(client.complete_sync, prompts))
+    finally:
+        client.close()
+    assert answers == [backend.responder(prompt) for prompt in prompts]
+    assert len(backend.loops) == 1
+    assert backend.peak <= 3
+
+def test_blocking_call_inside_event_loop_is_refused():
+    client = LLMClient(StubBackend(latency=0))
+
+    async def misuse():
+        client.complete_sync('q')
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(misuse())
+
+def test_response_cache_persists_answers(tmp_path):
+    path = str(tmp_path / 'responses.db')
+    backend = StubBackend(latency=0)
+    first = LLMClient(backend, cache=ResponseCache(path))
+    asyncio.run(first.complete('q', temperature=0))
+    second = LLMClient(backend, cache=ResponseCache(path))
+    assert asyncio.run(second.complete('q', temperature=0)) == backend.responder('q')
+    assert second.stats['cache_hits'] == 1 and backend.calls == 1
+
+@pytest.fixture
+def fake_openai(monkeypatch):
+    """Minimal stand-in for the openai package that records client lifecycles"""
+    created = []
+
+    class AsyncOpenAI:
+        def __init__(self, api_key=None):
+            self.closed = False
+            self.chat = types.SimpleNamespace(completions=types.SimpleNamespace(create=self.create))
+            created.append(self)
+
+        async def create(self, **request):
+            message = types.SimpleNamespace(content=f"answer: {request['messages'][0]['content']}")
+            return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+        async def close(self):
+            self.closed = True
+
+    monkeypatch.setitem(sys.modules, 'openai', types.SimpleNamespace(AsyncOpenAI=AsyncOpenAI))
+    return created
+
+def test_blocking_calls_reuse_one_openai_client(fake_openai):
+    client = LLMClient(OpenAIBackend(api_key='test'))
+    assert client.complete_sync('a') == 'answer: a'
+    assert client.complete_sync('b') == 'answer: b'
+    assert len(fake_openai) == 1
+    client.close()
+    assert fake_openai[0].closed
+
+def test_client_of_a_finished_loop_is_closed(fake_openai):
+    backend = OpenAIBackend(api_key='test')
+    asyncio.run(backend.complete('a'))
+    asyncio.run(backend.complete('b'))
+    assert len(fake_openai) == 2
+    assert fake_openai[0].closed and not fake_openai[1].closed
+    assert len(backend._clients) == 1
@@ -0,0 +1,90 @@
+from llm_enhancer import LLMContextEnhancer
+
+def page(title, content):
+    return {'title': title, 'content': content, 'headings': [], 'paragraphs': [content]}
+
+def enhancer(pages):
+    e = LLMContextEnhancer()
+    for url, content in pages.items():
+        e.update_page(url, content)
+    return e
+
+def test_repeated_question_is_served_from_cache():
+    e = enhancer({'https://a/sidebar': page('Sidebar', 'The sidebar lists docs.')})
+    e.enhance_prompt('How does the sidebar work?')
+    prompt, status = e.enhance_prompt('how does the SIDEBAR work')
+    assert status == 'Found 1 relevant sections'
+    assert 'USER QUESTION: how does the SIDEBAR work' in prompt
+    assert e.cache_stats()['hits'] == 1
+
+def test_update_invalidates_cached_prompt():
+    e = enhancer({'https://a/sidebar': page('Sidebar', 'The sidebar lists docs.')})
+    e.enhance_prompt('sidebar')
+    e.update_page('https://a/sidebar', page('Sidebar', 'The sidebar is autogenerated.'))
+    prompt, _ = e.enhance_prompt('sidebar')
+    assert 'autogenerated' in prompt
+
+def test_update_during_build_is_not_cached_as_current():
+    e = enhancer({'https://a/sidebar': page('Sidebar', 'The sidebar lists docs.')})
+    build = e._build_context
+
+    def racing_build(question, max_items):
+        context = build(question, max_items)
+        # A refresh lands after retrieval but before the cache is filled
+        e.update_page('https://a/sidebar', page('Sidebar', 'The sidebar is autogenerated.'))
+        return context
+
+    e._build_context = racing_build
+    e.enhance_prompt('sidebar')
+    e._build_context = build
+    prompt, _ = e.enhance_prompt('sidebar')
+    assert 'autogenerated' in prompt
+
+def test_enhance_many_matches_enhance_prompt():
+    pages = {'https://a/sidebar': page('Sidebar', 'The sidebar lists docs.'),
+             'https://a/blog': page('Blog', 'Blog posts are dated.')}
+    questions = ['sidebar', 'blog posts', 'Sidebar?']
+    batch = enhancer(pages).enhance_many(questions)
+    single = enhancer(pages)
+    assert batch == [single.enhance_prompt(q) for q in questions]
+
+def test_reloading_closes_the_previous_store(tmp_path):
+    (tmp_path / 'pages.json').write_text(
+        '{"https://a/sidebar": {"title": "Sidebar", "content": "The sidebar lists docs.", "headings": []}}')
+    e = LLMContextEnhancer(str(tmp_path / 'pages.db'))
+    first = e.content_db.store
+    closed = []
+    first.close = lambda: closed.append(first)
+    e.load_scraped_content(str(tmp_path / 'pages.db'))
+    assert closed == [first] and e.content_db.store is not first
+    assert e.search_content('sidebar')[0]['url'] == 'https://a/sidebar'
+    e.close()
+
+def test_enhance_many_update_during_build_is_not_cached_as_current():
+    e = enhancer({'https://a/sidebar': page('Sidebar', 'The sidebar lists docs.')})
+    build = e._build_contexts
+
+    def racing_build(questions, max_items):
+        contexts = build(questions, max_items)
+        e.update_page('https://a/sidebar', page('Sidebar', 'The sidebar is autogenerated.'))
+        return contexts
+
+    e._build_contexts = racing_build
+    e.enhance_many(['sidebar'])
+    e._build_contexts = build
+    (prompt, _), = e.enhance_many(['sidebar'])
+    assert 'autogenerated' in prompt
+
+def test_mapped_snapshot_is_rewritten_when_only_the_store_moved(tmp_path):
+    from index_snapshot import MappedIndex, open_snapshot, store_key
+    (tmp_path / 'pages.json').write_text(
+        '{"https://a/sidebar": {"title": "Sidebar", "content": "The sidebar lists docs.", "headings": []}}')
+    path = str(tmp_path / 'pages.db')
+    LLMContextEnhancer(path, index_snapshot=path + '.idx').close()   # writes the snapshot
+    e = LLMContextEnhancer(path, index_snapshot=path + '.idx')
+    assert isinstance(e.index, MappedIndex)
+    store = e.content_db.store
+    store.put('https://a/sidebar', dict(store.get('https://a/sidebar'), source={'mtime_ns': 1}))
+    e.save_index_snapshot()
+    assert open_snapshot(path + '.idx', store_key(store)) is not None
+    e.close()
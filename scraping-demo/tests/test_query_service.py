@@ -0,0 +1,129 @@
+import asyncio
+import json
+
+import pytest
+
+import query_service
+from query_service import QueryService
+
+PAGES = {
+    'https://docs.example.com/sidebar': {'title': 'Sidebar', 'content': 'The sidebar lists every doc.',
+                                         'headings': []},
+    'https://docs.example.com/blog': {'title': 'Blog', 'content': 'Blog posts are dated.', 'headings': []},
+}
+
+@pytest.fixture
+def content_file(tmp_path):
+    path = tmp_path / 'content.db'
+    (tmp_path / 'content.json').write_text(json.dumps(PAGES), encoding='utf-8')
+    return str(path)   # SQLite store, seeded from content.json on first open
+
+async def request(service, raw):
+    reader, writer = await asyncio.open_connection(service.host, service.port)
+    writer.write(raw)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b'\r\n\r\n')
+    status = int(head.split(b' ')[1])
+    return status, json.loads(body) if body else None
+
+def post(path, payload, extra=b''):
+    body = json.dumps(payload).encode()
+    return (f"POST {path} HTTP/1.1\r\nHost: x\r\nContent-Length: {len(body)}\r\n"
+            f"Connection: close\r\n\r\n").encode() + body + extra
+
+def serve(content_file, test, **kwargs):
+    async def main():
+        service = QueryService(content_file, port=0, **kwargs)
+        server = await service.start()
+        service.port = server.sockets[0].getsockname()[1]
+        try:
+            return await test(service)
+        finally:
+            server.close()
+            await server.wait_closed()
+    return asyncio.run(main())
+
+def test_search_and_enhance(content_file):
+    async def test(service):
+        status, search = await request(service, b"GET /search?q=sidebar HTTP/1.1\r\nConnection: close\r\n\r\n")
+        assert status == 200 and search['results'][0]['url'] == 'https://docs.example.com/sidebar'
+        status, enhanced = await request(service, post('/enhance', {'q': 'blog posts'}))
+        assert status == 200 and 'Blog posts are dated.' in enhanced['prompt']
+    serve(content_file, test)
+
+def test_oversized_body_gets_413_and_connection_closes(content_file, monkeypatch):
+    monkeypatch.setattr(query_service, 'MAX_BODY_BYTES', 64)
+
+    async def test(service):
+        # A second request smuggled into the tail of the body must never be parsed
+        smuggled = b"POST /reload HTTP/1.1\r\nContent-Length: 0\r\n\r\n"
+        status, payload = await request(service, post('/search', {'q': 'x' * 100}, smuggled))
+        assert status == 413 and 'body over 64 bytes' in payload['error']
+        assert service.requests_served == 0
+    serve(content_file, test)
+
+def test_reload_refuses_other_files(content_file, tmp_path):
+    other = tmp_path / 'other.json'
+    other.write_text('{}', encoding='utf-8')
+
+    async def test(service):
+        status, _ = await request(service, post('/reload', {'file': str(other)}))
+        assert status == 403
+        status, reloaded = await request(service, post('/reload', {}))
+        assert status == 200 and reloaded['pages'] == 2
+    serve(content_file, test)
+
+def test_reload_closes_old_store_after_last_request(content_file):
+    async def test(service):
+        old = service.enhancer
+        closed = []
+        old.close = lambda: closed.append(old)
+        status, _ = await request(service, post('/reload', {}))
+        assert status == 200 and closed == [old]
+        assert service.enhancer is not old and not service.in_use
+    serve(content_file, test)
+
+def test_reload_of_another_file_uses_its_own_snapshot(content_file, tmp_path):
+    other = tmp_path / 'other.json'
+    other.write_text(json.dumps({'https://docs.example.com/i18n': {
+        'title': 'Translations', 'content': 'Translate the site.', 'headings': []}}), encoding='utf-8')
+
+    async def test(service):
+        await service.reload(str(other))
+        assert service.index_snapshot == str(other) + '.idx'
+        assert service.enhancer.search_content('translate')[0]['url'] == 'https://docs.example.com/i18n'
+    serve(content_file, test, index_snapshot=content_file + '.idx')
+    assert (tmp_path / 'other.json.idx').exists()
+
+def test_debug_profile_is_loopback_only(content_file):
+    async def test(service):
+        status, config = await request(service, post('/debug/profile', {'rate': 0}))
+        assert status == 200 and config['rate'] == 0
+        # The same request from a remote peer
+        status, _ = await service._dispatch('POST', '/debug/profile', {'rate': 1}, local=False)
+        assert status == 403 and query_service.PROFILER.rate == 0
+        service.remote_debug = True
+        status, _ = await service._dispatch('GET', '/debug/profile', {}, local=False)
+        assert status == 200
+    serve(content_file, test)
+
+def test_non_object_bodies_and_non_string_queries_get_400(content_file):
+    async def test(service):
+        for payload in ([['q', 'sidebar']], 'sidebar', 42, None):
+            status, body = await request(service, post('/search', payload))
+            assert status == 400 and body['error'] == 'body must be a JSON object'
+        status, _ = await request(service, post('/search', {'q': ['sidebar']}))
+        assert status == 400
+        status, _ = await request(service, post('/enhance', {'q': 'sidebar', 'max_items': [1]}))
+        assert status == 400
+        # A bad body on a kept-alive connection does not end it
+        bad = b"POST /search HTTP/1.1\r\nContent-Length: 2\r\n\r\n[]"
+        good = b"GET /search?q=sidebar HTTP/1.1\r\nConnection: close\r\n\r\n"
+        reader, writer = await asyncio.open_connection(service.host, service.port)
+        writer.write(bad + good)
+        response = await reader.read()
+        writer.close()
+        assert response.startswith(b'HTTP/1.1 400') and b'HTTP/1.1 200' in response
+    serve(content_file, test)
@@ -0,0 +1,23 @@
+import asyncio
+import time
+
+from runtime_demo import RuntimeScrapingLLM
+
+def test_freshness_check_overlaps_retrieval_and_llm(tmp_path):
+    runtime = RuntimeScrapingLLM('https://docs.example.com', str(tmp_path / 'pages.db'))
+    runtime.enhancer.update_page('https://docs.example.com/sidebar', {
+        'title': 'Sidebar', 'content': 'The sidebar lists docs.', 'headings': [], 'paragraphs': []})
+
+    def slow_check(*args):
+        time.sleep(0.3)
+        return {}
+    runtime.check_freshness = slow_check
+
+    async def collect():
+        return [event async for event in runtime.answer_stream('sidebar', check_fresh_content=True)]
+    events = asyncio.run(collect())
+    timings = events[-1]['timings']
+    assert timings['time_to_first_token'] < 250
+    assert timings['freshness_check'] >= 300
+    assert [e['stage'] for e in events if e['type'] == 'timing'][-1] == 'freshness_check'
+    runtime.enhancer.close()
@@ -0,0 +1,77 @@
+from search_index import InvertedIndex, tokenize
+
+def page(title, content='', headings=()):
+    return {'title': title, 'content': content, 'headings': [{'level': 'h2', 'text': h} for h in headings]}
+
+def build(pages):
+    return InvertedIndex().build(pages)
+
+def test_tokenize_drops_stopwords_and_folds_plurals():
+    assert tokenize("How do I create the Documents?") == ['create', 'document']
+    assert tokenize("class glass") == ['class', 'glass']
+
+def test_tokenize_keeps_non_ascii_words_whole():
+    assert tokenize("Café Straße naïve") == ['café', 'straße', 'naïve']
+
+def test_non_ascii_terms_are_searchable():
+    index = build({'u1': page('Configuración', 'La configuración del café'), 'u2': page('Other', 'nothing here')})
+    assert [url for url, _, _ in index.search('café')] == ['u1']
+
+def test_title_match_outranks_body_match():
+    index = build({
+        'body': page('Guide', 'the sidebar can be configured'),
+        'title': page('Sidebar', 'a page about navigation'),
+        'none': page('Blog', 'unrelated text'),
+    })
+    results = index.search('sidebar')
+    assert [url for url, _, _ in results] == ['title', 'body']
+    assert results[0][2] == (['sidebar'], [], [])
+    assert results[1][2] == ([], [], ['sidebar'])
+
+def test_rare_term_weighs_more_than_common_term():
+    pages = {f'p{i}': page('Page', 'deploy deploy') for i in range(5)}
+    pages['rare'] = page('Page', 'versioning deploy')
+    pages['common'] = page('Page', 'deploy deploy deploy')
+    results = build(pages).search('versioning deploy')
+    assert results[0][0] == 'rare'
+
+def test_limit_and_empty_queries():
+    index = build({f'p{i}': page('Plugin', 'plugin') for i in range(4)})
+    assert len(index.search('plugin', limit=2)) == 2
+    assert index.search('the of and') == []
+    assert InvertedIndex().search('plugin') == []
+
+def test_incremental_updates_match_a_full_build():
+    pages = {'a': page('Alpha', 'install plugin'), 'b': page('Beta', 'plugin config'), 'c': page('Gamma', 'config')}
+    index = build({'a': pages['a'], 'b': page('Old', 'stale words')})
+    index.add_page('b', pages['b'])
+    index.add_page('c', pages['c'])
+    index.add_page('x', page('Temp', 'plugin'))
+    index.remove_page('x')
+    index.remove_page('missing')   # no-op
+    expected = build(pages)
+    for query in ('plugin', 'config', 'install plugin', 'stale'):
+        assert index.search(query) == expected.search(query)
+    assert index.total_lengths == expected.total_lengths
+
+def test_score_bound_caps_scores():
+    index = build({'a': page('Plugin config', 'plugin config plugin'), 'b': page('Other', 'config')})
+    bound = index.score_bound('plugin config')
+    assert all(0 < score < bound for _, score, _ in index.search('plugin config'))
+
+def test_matching_headings():
+    index = build({'a': page('T', 'x', headings=['Install the Plugin', 'Configure'])})
+    assert index.matching_headings('a', ['plugin']) == ['Install the Plugin']
+
+def test_best_window_covers_the_most_distinct_terms():
+    content = 'plugin ' + 'filler ' * 20 + 'sidebar plugin config ' + 'filler ' * 20 + 'plugin'
+    index = build({'a': page('T', content)})
+    start, end = index.best_window('a', ['plugin', 'sidebar', 'config'], 30)
+    assert content[start:end] == 'sidebar plugin config'
+
+def test_best_window_prefers_more_hits_then_earliest():
+    content = 'plugin x plugin ' + 'filler ' * 10 + 'plugin'
+    index = build({'a': page('T', content)})
+    assert index.best_window('a', ['plugin'], 20) == (0, len('plugin x plugin'))
+    assert index.best_window('a', ['missing'], 20) is None
+    assert index.best_window('unknown', ['plugin'], 20) is None
@@ -0,0 +1,83 @@
+import gzip
+import io
+from datetime import datetime, timezone
+
+from simple_scraper import SimpleDocsScraper, parse_lastmod
+
+BASE = 'https://docs.example.com'
+
+def urlset(*entries):
+    body = ''.join(
+        f"<url><loc>{loc}</loc>{f'<lastmod>{lastmod}</lastmod>' if lastmod else ''}"
+        f"<image:image><image:loc>{loc}/cover.png</image:loc></image:image></url>"
+        for loc, lastmod in entries)
+    return ('<?xml version="1.0" encoding="UTF-8"?>'
+            '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9" '
+            'xmlns:image="http://www.google.com/schemas/sitemap-image/1.1">'
+            f"{body}</urlset>").encode()
+
+def sitemap_index(*entries):
+    body = ''.join(f"<sitemap><loc>{loc}</loc><lastmod>{lastmod}</lastmod></sitemap>"
+                   for loc, lastmod in entries)
+    return ('<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+            f"{body}</sitemapindex>").encode()
+
+class FakeResponse:
+    def __init__(self, body):
+        self.raw = io.BytesIO(body)
+
+    def raise_for_status(self):
+        pass
+
+class FakeSession:
+    def __init__(self, bodies):
+        self.bodies = bodies
+        self.requested = []
+
+    def get(self, url, **kwargs):
+        self.requested.append(url)
+        return FakeResponse(self.bodies[url])
+
+def scraper(bodies):
+    s = SimpleDocsScraper(BASE, requests_per_second=1000, burst=1000)
+    s.session = FakeSession(bodies)
+    return s
+
+def test_image_locations_do_not_replace_page_locations():
+    s = scraper({f"{BASE}/sitemap.xml": urlset((f"{BASE}/docs/intro", '2024-05-01'), (f"{BASE}/blog", None))})
+    assert list(s.iter_sitemap()) == [
+        (f"{BASE}/docs/intro", datetime(2024, 5, 1, tzinfo=timezone.utc)), (f"{BASE}/blog", None)]
+
+def test_gzip_is_detected_by_magic_bytes_not_extension():
+    plain = urlset((f"{BASE}/docs/a", None))
+    s = scraper({
+        f"{BASE}/sitemap.xml": sitemap_index((f"{BASE}/gz.xml.gz", '2024-01-02'),
+                                             (f"{BASE}/decoded.xml.gz", '2024-01-02'),
+                                             (f"{BASE}/packed.xml", '2024-01-02')),
+        f"{BASE}/gz.xml.gz": gzip.compress(urlset((f"{BASE}/docs/b", None))),
+        # Served with Content-Encoding: gzip, so the HTTP layer already decompressed it
+        f"{BASE}/decoded.xml.gz": plain,
+        f"{BASE}/packed.xml": gzip.compress(urlset((f"{BASE}/docs/c", None))),
+    })
+    assert sorted(url for url, _ in s.iter_sitemap()) == [f"{BASE}/docs/a", f"{BASE}/docs/b", f"{BASE}/docs/c"]
+
+def test_unchanged_child_sitemaps_are_not_fetched():
+    since = datetime(2024, 3, 1, tzinfo=timezone.utc)
+    s = scraper({
+        f"{BASE}/sitemap.xml": sitemap_index((f"{BASE}/old.xml", '2024-01-01'), (f"{BASE}/new.xml", '2024-04-01')),
+        f"{BASE}/new.xml": urlset((f"{BASE}/docs/new", '2024-04-01')),
+    })
+    assert [url for url, _ in s.iter_sitemap(since=since)] == [f"{BASE}/docs/new"]
+    assert f"{BASE}/old.xml" not in s.session.requested
+
+def test_discover_changed_orders_newest_first():
+    s = scraper({f"{BASE}/sitemap.xml": urlset(
+        (f"{BASE}/a", '2024-01-01'), (f"{BASE}/b", '2024-06-01'), (f"{BASE}/c", None), (f"{BASE}/d", '2024-02-01'))})
+    known = {f"{BASE}/d": datetime(2024, 2, 1, tzinfo=timezone.utc)}
+    queue = s.discover_changed(known)
+    assert [url for _, url, _ in sorted(queue)] == [f"{BASE}/b", f"{BASE}/a", f"{BASE}/c"]
+
+def test_parse_lastmod():
+    assert parse_lastmod('2024-05-01T10:00:00Z') == datetime(2024, 5, 1, 10, tzinfo=timezone.utc)
+    assert parse_lastmod('not a date') is None
+    assert parse_lastmod(None) is None
@@ -0,0 +1,54 @@
+import random
+
+from term_watch import Match, TermWatcher, iter_page_paragraphs, load_terms
+
+def brute_force(terms, text, case_sensitive=False):
+    fold = (lambda s: s) if case_sensitive else str.lower
+    haystack = fold(text)
+    return sorted((end, term) for term in dict.fromkeys(terms) for start in range(len(text))
+                  if haystack.startswith(fold(term), start) for end in [start + len(term)])
+
+def test_reports_overlapping_and_nested_terms():
+    watcher = TermWatcher(['he', 'she', 'his', 'hers'])
+    assert list(watcher.iter_matches('ushers')) == [
+        Match('she', 1, 4), Match('he', 2, 4), Match('hers', 2, 6)]
+
+def test_matches_brute_force_on_random_text():
+    rng = random.Random(7)
+    alphabet = 'abc'
+    terms = list({''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 4))) for _ in range(25)})
+    watcher = TermWatcher(terms)
+    for _ in range(200):
+        text = ''.join(rng.choice(alphabet + 'AB ') for _ in range(rng.randint(0, 30)))
+        found = sorted((match.end, match.term) for match in watcher.iter_matches(text))
+        assert found == brute_force(terms, text)
+
+def test_case_folding_keeps_offsets():
+    watcher = TermWatcher(['froquetism'])
+    text = 'İstanbul FROQUETISM'
+    (match,) = watcher.iter_matches(text)
+    assert text[match.start:match.end] == 'FROQUETISM'
+    assert not TermWatcher(['froquetism'], case_sensitive=True).contains_any(text)
+
+def test_whole_words():
+    watcher = TermWatcher(['api'], whole_words=True)
+    assert watcher.find_terms('the api docs') == ['api']
+    assert watcher.find_terms('rapid apis my_api') == []
+
+def test_scan_paragraphs_numbers_per_url():
+    watcher = TermWatcher(['sidebar', 'navbar'])
+    paragraphs = [('u1', 'intro'), ('u1', 'the sidebar and navbar'), ('u2', 'navbar only')]
+    assert list(watcher.scan_paragraphs(paragraphs)) == [
+        ('u1', 1, 'the sidebar and navbar', ['sidebar', 'navbar']), ('u2', 0, 'navbar only', ['navbar'])]
+    assert watcher.report(paragraphs) == {'sidebar': [('u1', 1)], 'navbar': [('u1', 1), ('u2', 0)]}
+
+def test_no_terms_matches_nothing():
+    watcher = TermWatcher(['', ''])
+    assert len(watcher) == 0 and not watcher.contains_any('anything')
+
+def test_load_terms_and_page_paragraphs(tmp_path):
+    path = tmp_path / 'terms.txt'
+    path.write_text('# deprecated\nfroquetism\n\n  legacyApi  \n', encoding='utf-8')
+    assert load_terms(str(path)) == ['froquetism', 'legacyApi']
+    pages = [('u', {'content': 'one\n\n  two  \n'})]
+    assert list(iter_page_paragraphs(pages)) == [('u', 'one'), ('u', 'two')]
@@ -0,0 +1,115 @@
+import json
+
+import numpy as np
+import pytest
+
+import vector_index
+from llm_enhancer import LLMContextEnhancer
+from vector_index import HashedNgramEmbedder, VectorIndex
+
+PAGES = {
+    f"https://docs.example.com/{topic}": {
+        'title': topic.title(),
+        'content': f"# {topic.title()}\n\nThe {topic} can be configured with {topic}_options. " * 3,
+        'headings': [{'level': 'h1', 'text': topic.title()}],
+    }
+    for topic in ('sidebar', 'navbar', 'footer', 'blog', 'search', 'versioning', 'i18n', 'plugins')
+}
+
+def vectors(n, dim=16, seed=0):
+    data = np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+    return data / np.linalg.norm(data, axis=1, keepdims=True)
+
+def test_embedding_is_normalized_and_stable():
+    embedder = HashedNgramEmbedder(dim=64)
+    first = embedder.embed(['sidebar_position'])
+    assert np.allclose(np.linalg.norm(first, axis=1), 1.0)
+    assert np.array_equal(first, HashedNgramEmbedder(dim=64).embed(['sidebar_position']))
+
+def test_exact_search_returns_nearest_first():
+    index = VectorIndex(16)
+    data = vectors(20)
+    index.add([f"v{i}" for i in range(20)], data)
+    hits = index.search(data[3], k=3)[0]
+    assert hits[0][0] == 'v3' and hits[0][1] == pytest.approx(1.0)
+    index.remove(['v3'])
+    assert 'v3' not in [item_id for item_id, _ in index.search(data[3], k=3)[0]]
+
+def test_save_load_round_trip_is_memory_mapped(tmp_path):
+    index = VectorIndex(16)
+    data = vectors(50)
+    index.add([f"v{i}" for i in range(50)], data)
+    index.train_ivf(5)
+    path = str(tmp_path / 'vectors')
+    index.save(path, key=['corpus', 1])
+
+    loaded = VectorIndex.load(path, key=['corpus', 1])
+    assert isinstance(loaded.vectors, np.memmap)
+    assert loaded.ids == index.ids
+    for query in data[:5]:
+        assert loaded.search(query, k=5, n_probe=2) == index.search(query, k=5, n_probe=2)
+    assert VectorIndex.load(path, key=['corpus', 2]) is None
+
+def test_load_rejects_vectors_that_do_not_match_metadata(tmp_path):
+    index = VectorIndex(16)
+    index.add(['a', 'b'], vectors(2))
+    path = str(tmp_path / 'vectors')
+    index.save(path)
+    np.save(f"{path}.npy", vectors(3))
+    with pytest.raises(ValueError):
+        VectorIndex.load(path)
+
+def write_store(tmp_path):
+    path = tmp_path / 'content.json'
+    path.write_text(json.dumps(PAGES), encoding='utf-8')
+    return str(path)
+
+def test_enhancer_maps_saved_vectors_next_to_snapshot(tmp_path, monkeypatch):
+    content = write_store(tmp_path)
+    snapshot = str(tmp_path / 'content.idx')
+    first = LLMContextEnhancer(content, index_snapshot=snapshot)
+    first.enable_semantic_search(ivf_lists=3, n_probe=2)
+    expected = first.search_passages('sidebar options', mode='semantic')
+
+    def no_rebuild(self, *args, **kwargs):
+        raise AssertionError("vectors were re-embedded instead of loaded")
+    monkeypatch.setattr(vector_index.SemanticRetriever, 'build', no_rebuild)
+    second = LLMContextEnhancer(content, index_snapshot=snapshot)
+    second.enable_semantic_search(ivf_lists=3, n_probe=2)
+    assert isinstance(second.semantic.index.vectors, np.memmap)
+    assert second.search_passages('sidebar options', mode='semantic') == expected
+
+def test_changed_ivf_setting_rebuilds_vectors(tmp_path):
+    content = write_store(tmp_path)
+    snapshot = str(tmp_path / 'content.idx')
+    LLMContextEnhancer(content, index_snapshot=snapshot).enable_semantic_search()
+    enhancer = LLMContextEnhancer(content, index_snapshot=snapshot)
+    enhancer.enable_semantic_search(ivf_lists=3)
+    assert enhancer.semantic.index.centroids is not None
+    assert not isinstance(enhancer.semantic.index.vectors, np.memmap)
+
+def test_reload_keeps_semantic_settings(tmp_path):
+    content = write_store(tmp_path)
+    enhancer = LLMContextEnhancer(content)
+    enhancer.enable_semantic_search(ivf_lists=3, n_probe=2, hybrid_alpha=0.7)
+    enhancer.load_scraped_content(content)
+    assert enhancer.semantic.ivf_lists == 3
+    assert enhancer.semantic.n_probe == 2
+    assert enhancer.semantic.index.centroids is not None
+    assert enhancer.hybrid_alpha == 0.7
+
+def test_updates_after_mapping_are_saved_with_the_snapshot(tmp_path):
+    content = write_store(tmp_path)
+    snapshot = str(tmp_path / 'content.idx')
+    LLMContextEnhancer(content, index_snapshot=snapshot).enable_semantic_search()
+    enhancer = LLMContextEnhancer(content, index_snapshot=snapshot)
+    enhancer.enable_semantic_search()
+    url = 'https://docs.example.com/admonitions'
+    enhancer.update_page(url, {'title': 'Admonitions', 'content': 'Admonitions highlight notes and tips.',
+                               'headings': []})
+    enhancer.save_index_snapshot()
+
+    reloaded = LLMContextEnhancer(content, index_snapshot=snapshot)
+    reloaded.enable_semantic_search()
+    assert isinstance(reloaded.semantic.index.vectors, np.memmap)
+    assert reloaded.search_passages('admonitions notes', mode='semantic')[0][0].url == url
@@ -0,0 +1,279 @@
+"""
+Local Vector Index for Semantic Retrieval
+Purpose: Find passages by meaning-ish similarity with no model download and no network
+"""
+
+import json
+import math
+import os
+import zlib
+
+import numpy as np
+
+from search_index import TOKEN_RE
+
+class HashedNgramEmbedder:
+    """Offline embedding: hashed word and character n-grams, L2-normalized
+
+    Character n-grams let "sidebar" and "sidebar_position" share most of their
+    features, which plain keyword matching misses. crc32 keeps the hashing
+    stable across processes, so saved vectors stay valid.
+    """
+    def __init__(self, dim=512, char_ngrams=(3, 4), word_weight=2.0):
+        self.dim = dim
+        self.char_ngrams = char_ngrams
+        self.word_weight = word_weight
+
+    def features(self, text):
+        for word in TOKEN_RE.findall(text.lower()):
+            yield word, self.word_weight
+            padded = f"<{word}>"
+            for n in self.char_ngrams:
+                for i in range(len(padded) - n + 1):
+                    yield padded[i:i + n], 1.0
+            # Also embed the parts of snake_case identifiers as words
+            if '_' in word:
+                for part in word.split('_'):
+                    if part:
+                        yield part, self.word_weight
+
+    def embed(self, texts):
+        """Embed a batch of texts into an (n, dim) float32 matrix"""
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            counts = {}
+            for feature, weight in self.features(text):
+                h = zlib.crc32(feature.encode('utf-8'))
+                # The top hash bit picks the sign so collisions cancel out on average
+                key = (h % self.dim, 1.0 if h & 0x80000000 else -1.0)
+                counts[key] = counts.get(key, 0.0) + weight
+            for (column, sign), count in counts.items():
+                matrix[row, column] += sign * (1.0 + math.log(count))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+class VectorIndex:
+    """Dense cosine-similarity index with optional IVF partitioning
+
+    Vectors live in one (n, dim) float32 matrix so a batch of queries is scored
+    with a single matrix multiply. Removed rows are masked and dropped on the
+    next compact().
+    """
+    def __init__(self, dim):
+        self.dim = dim
+        self.ids = []
+        self.row_of = {}
+        self.vectors = np.zeros((0, dim), dtype=np.float32)
+        self.alive = np.zeros(0, dtype=bool)
+        self.centroids = None     # (n_lists, dim) when IVF is trained
+        self.assignments = None   # list id per row
+
+    def __len__(self):
+        return len(self.row_of)
+
+    def add(self, ids, vectors):
+        """Append vectors; re-adding an id replaces its old vector"""
+        self.remove(ids)
+        start = len(self.ids)
+        self.vectors = np.vstack([self.vectors, np.asarray(vectors, dtype=np.float32)])
+        self.alive = np.concatenate([self.alive, np.ones(len(ids), dtype=bool)])
+        for offset, item_id in enumerate(ids):
+            self.ids.append(item_id)
+            self.row_of[item_id] = start + offset
+        if self.centroids is not None:
+            new_lists = np.argmax(self.vectors[start:] @ self.centroids.T, axis=1)
+            self.assignments = np.concatenate([self.assignments, new_lists])
+
+    def remove(self, ids):
+        for item_id in ids:
+            row = self.row_of.pop(item_id, None)
+            if row is not None:
+                self.alive[row] = False
+        if len(self.ids) > 1024 and len(self.row_of) < len(self.ids) // 2:
+            self.compact()
+
+    def compact(self):
+        """Drop removed rows"""
+        keep = np.flatnonzero(self.alive)
+        self.vectors = np.ascontiguousarray(self.vectors[keep])
+        self.ids = [self.ids[row] for row in keep]
+        self.row_of = {item_id: row for row, item_id in enumerate(self.ids)}
+        self.alive = np.ones(len(self.ids), dtype=bool)
+        if self.assignments is not None:
+            self.assignments = self.assignments[keep]
+
+    def train_ivf(self, n_lists=None, iterations=10, seed=0):
+        """Partition vectors into n_lists clusters (spherical k-means)
+
+        Queries then only score the rows in their `n_probe` nearest clusters.
+        Defaults to ~sqrt(n) lists, the usual IVF rule of thumb.
+        """
+        rows = np.flatnonzero(self.alive)
+        n_lists = n_lists or max(1, int(math.sqrt(len(rows))))
+        n_lists = min(n_lists, len(rows))
+        if n_lists == 0:
+            return
+        rng = np.random.default_rng(seed)
+        data = self.vectors[rows]
+        centroids = data[rng.choice(len(rows), n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            labels = np.argmax(data @ centroids.T, axis=1)
+            for k in range(n_lists):
+                members = data[labels == k]
+                if len(members):
+                    centroid = members.sum(axis=0)
+                    norm = np.linalg.norm(centroid)
+                    centroids[k] = centroid / norm if norm else centroid
+        self.centroids = centroids
+        self.assignments = np.argmax(self.vectors @ centroids.T, axis=1)
+
+    def search(self, query_vectors, k=10, n_probe=None):
+        """Top-k (id, score) lists for each row of query_vectors, best first"""
+        queries = np.atleast_2d(np.asarray(query_vectors, dtype=np.float32))
+        if not len(self.row_of):
+            return [[] for _ in queries]
+        if self.centroids is not None and n_probe:
+            return [self._search_ivf(query, k, n_probe) for query in queries]
+
+        scores = queries @ self.vectors.T
+        scores[:, ~self.alive] = -np.inf
+        return [self._top_k(np.arange(len(self.ids)), row, k) for row in scores]
+
+    def _search_ivf(self, query, k, n_probe):
+        n_probe = min(n_probe, len(self.centroids))
+        lists = np.argpartition(-(self.centroids @ query), n_probe - 1)[:n_probe]
+        candidates = np.flatnonzero(np.isin(self.assignments, lists) & self.alive)
+        return self._top_k(candidates, self.vectors[candidates] @ query, k)
+
+    def _top_k(self, rows, scores, k):
+        valid = np.isfinite(scores)
+        rows, scores = rows[valid], scores[valid]
+        if len(scores) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            rows, scores = rows[top], scores[top]
+        order = np.argsort(-scores, kind='stable')
+        return [(self.ids[rows[i]], float(scores[i])) for i in order]
+
+    def save(self, path, key=None):
+        """Write `<path>.npy` (raw vectors) and `<path>.json` (ids, IVF state, `key`)
+
+        Each file is replaced atomically, so a process that has the old vectors
+        mapped keeps reading them; the JSON goes last and load() checks the
+        row count against it.
+        """
+        self.compact()
+        arrays = {'.npy': self.vectors}
+        meta = {'dim': self.dim, 'ids': self.ids, 'key': key}
+        if self.centroids is not None:
+            arrays['.centroids.npy'] = self.centroids
+            meta['assignments'] = self.assignments.tolist()
+        for suffix, data in arrays.items():
+            with open(f"{path}{suffix}.tmp", 'wb') as f:
+                np.save(f, data)
+            os.replace(f"{path}{suffix}.tmp", f"{path}{suffix}")
+        with open(f"{path}.json.tmp", 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(f"{path}.json.tmp", f"{path}.json")
+
+    @classmethod
+    def load(cls, path, mmap=True, key=None):
+        """Load a saved index; with mmap the vector file is paged in on demand
+
+        With `key`, returns None unless the index was saved with that key.
+        """
+        with open(f"{path}.json", 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if key is not None and meta.get('key') != key:
+            return None
+        index = cls(meta['dim'])
+        index.vectors = np.load(f"{path}.npy", mmap_mode='r' if mmap else None)
+        if index.vectors.shape != (len(meta['ids']), meta['dim']):
+            raise ValueError(f"{path}.npy does not match {path}.json")
+        index.ids = meta['ids']
+        index.row_of = {item_id: row for row, item_id in enumerate(index.ids)}
+        index.alive = np.ones(len(index.ids), dtype=bool)
+        if 'assignments' in meta:
+            index.centroids = np.load(f"{path}.centroids.npy")
+            index.assignments = np.asarray(meta['assignments'], dtype=np.int64)
+        return index
+
+class SemanticRetriever:
+    """Embedding retriever over a PassageStore, kept in sync page by page"""
+    def __init__(self, passages, text_of, embedder=None, n_probe=None):
+        self.passages = passages
+        self.text_of = text_of
+        self.embedder = embedder or HashedNgramEmbedder()
+        self.n_probe = n_probe
+        self.ivf_lists = None
+        self.index = VectorIndex(self.embedder.dim)
+
+    def build(self, batch_size=512, ivf_lists=None):
+        self.ivf_lists = ivf_lists
+        passage_ids = list(self.passages.passages)
+        for i in range(0, len(passage_ids), batch_size):
+            batch = passage_ids[i:i + batch_size]
+            texts = [self._embed_text(self.passages.passages[pid]) for pid in batch]
+            self.index.add(batch, self.embedder.embed(texts))
+        if ivf_lists:
+            self.index.train_ivf(ivf_lists)
+        return self
+
+    def save(self, path, corpus_key):
+        """Save the vectors for the passages of corpus `corpus_key` (e.g. a store_key)"""
+        self.index.save(path, self._key(corpus_key, self.ivf_lists))
+
+    def load(self, path, corpus_key, ivf_lists=None):
+        """Map vectors saved for the same corpus, embedder and IVF setting; False if there are none"""
+        try:
+            index = VectorIndex.load(path, key=self._key(corpus_key, ivf_lists))
+        except (OSError, ValueError, KeyError):
+            return False
+        if index is None:
+            return False
+        self.index, self.ivf_lists = index, ivf_lists
+        return True
+
+    def _key(self, corpus_key, ivf_lists):
+        # Normalized through JSON so it compares equal to the copy read back from disk
+        signature = [corpus_key, type(self.embedder).__name__, vars(self.embedder), ivf_lists]
+        return json.loads(json.dumps(signature, default=repr))
+
+    def add_page(self, url):
+        passage_ids = self.passages.by_url.get(url, [])
+        if passage_ids:
+            texts = [self._embed_text(self.passages.passages[pid]) for pid in passage_ids]
+            self.index.add(passage_ids, self.embedder.embed(texts))
+
+    def remove_ids(self, passage_ids):
+        self.index.remove(passage_ids)
+
+    def search(self, query, k=10):
+        """Return [(passage, cosine score)]"""
+        return self.search_many([query], k)[0]
+
+    def search_many(self, queries, k=10):
+        """Score a batch of queries with one matrix multiply"""
+        results = self.index.search(self.embedder.embed(queries), k, self.n_probe)
+        return [[(self.passages.passages[pid], score) for pid, score in hits
+                 if pid in self.passages.passages] for hits in results]
+
+    def _embed_text(self, passage):
+        return f"{passage.heading}\n{self.text_of(passage)}"
+
+def fuse_scores(keyword_results, semantic_results, alpha=0.5):
+    """Hybrid ranking: alpha * semantic + (1 - alpha) * keyword, each max-normalized
+
+    Both inputs are [(passage, score)]; passages found by only one side get 0
+    from the other.
+    """
+    fused = {}
+    for results, weight in ((keyword_results, 1 - alpha), (semantic_results, alpha)):
+        top = max((score for _, score in results), default=0)
+        if top <= 0:
+            continue
+        for passage, score in results:
+            key = (passage.url, passage.start)
+            previous = fused.get(key, (passage, 0.0))[1]
+            fused[key] = (passage, previous + weight * max(score, 0) / top)
+    return sorted(fused.values(), key=lambda item: item[1], reverse=True)
@@ -1,27 +1,41 @@
 import requests
-from bs4 import BeautifulSoup
 import json
 
+from html_extract import extract_page
+from term_watch import TermWatcher
+
 def scrape_page(url):
     """Extract title and content from a webpage"""
     response = requests.get(url)
-    soup = BeautifulSoup(response.text, 'html.parser')
-    
-    title = soup.find('title').text.strip()
-    main = soup.find('main') or soup.find('article')
-    content = main.get_text().strip() if main else "No content"
+    page = extract_page(response.text)
     
-    return {'title': title, 'content': content}
+    return {'title': page['title'], 'content': page['content']}
 
 def search_content(data, query):
     """Find pages matching query keywords"""
     results = []
+    watcher = TermWatcher(query.split())   # all query words in one pass per page
     for url, page in data.items():
-        if any(word.lower() in page['content'].lower() for word in query.split()):
+        if watcher.contains_any(page['content']):
             results.append({'url': url, 'title': page['title'], 
                           'snippet': page['content'][:150] + "..."})
     return results
 
+def semantic_search(data, query, top_k=2):
+    """Rank pages by embedding similarity, so near-miss wording still matches"""
+    from vector_index import HashedNgramEmbedder, VectorIndex
+    embedder = HashedNgramEmbedder()
+    index = VectorIndex(embedder.dim)
+    urls = list(data)
+    index.add(urls, embedder.embed([f"{data[u]['title']}\n{data[u]['content']}" for u in urls]))
+    
+    results = []
+    for url, score in index.search(embedder.embed([query]), top_k)[0]:
+        page = data[url]
+        results.append({'url': url, 'title': page['title'], 'score': score,
+                        'snippet': page['content'][:150] + "..."})
+    return results
+
 def enhance_prompt(query, scraped_data):
     """Add scraped content to user query for LLM"""
     matches = search_content(scraped_data, query)
@@ -1,36 +1,50 @@
-import requests
-from bs4 import BeautifulSoup
-import openai
 import os
 
+from passages import pack_texts
+from llm_backend import get_default_client
+from term_watch import TermWatcher
+
+# Watch terms are compiled once; add product names or deprecated APIs here
+WATCH_TERMS = ['froquetism']
+WATCHER = TermWatcher(WATCH_TERMS)
+
 def scrape_paragraphs(url):
     """Extract paragraph text from a webpage"""
+    # Fetching and HTML parsing are imported here: scanning text needs neither
+    import requests
+    from html_extract import extract_page
     response = requests.get(url)
-    soup = BeautifulSoup(response.text, 'html.parser')
-    
-    paragraphs = []
-    for p in soup.find_all('p'):
-        text = p.get_text().strip()
-        if text:
-            paragraphs.append(text)
-    
-    return paragraphs
+    return extract_page(response.text)['paragraphs']
+
+def iter_paragraphs(urls):
+    """Stream (url, paragraph) pairs page by page instead of collecting them all"""
+    for url in urls:
+        print(f"   - {url}")
+        for paragraph in scrape_paragraphs(url):
+            yield url, paragraph
 
-def find_froquetism_text(paragraphs):
-    """Find paragraphs containing 'froquetism'"""
-    froquetism_text = []
-    for p in paragraphs:
-        if 'froquetism' in p.lower():
-            froquetism_text.append(p)
-    return froquetism_text
+def find_froquetism_text(paragraphs, watcher=WATCHER):
+    """Find paragraphs mentioning any watch term (one automaton pass per paragraph)"""
+    return [p for p in paragraphs if watcher.contains_any(p)]
 
-def ask_openai_about_froquetism(text_list, source_urls):
+def find_watch_terms(url_paragraphs, watcher=WATCHER):
+    """Scan a (url, paragraph) stream; return matching paragraphs and {term: [(url, index)]} hits"""
+    matching = []
+    hits = {}
+    for url, index, text, terms in watcher.scan_paragraphs(url_paragraphs):
+        matching.append(text)
+        for term in terms:
+            hits.setdefault(term, []).append((url, index))
+    return matching, hits
+
+def ask_openai_about_froquetism(text_list, source_urls, token_budget=1500):
     """Send froquetism text to OpenAI for summary"""
     if not text_list:
         return "No froquetism text found."
     
-    # Combine all froquetism text
-    combined_text = " ".join(text_list)
+    # Combine unique froquetism paragraphs until the token budget is spent
+    packed_text, _ = pack_texts(text_list, token_budget)
+    combined_text = " ".join(packed_text)
     
     # Combine URLs for prompt
     urls_text = ", ".join(source_urls)
@@ -38,37 +52,24 @@ def ask_openai_about_froquetism(text_list, source_urls):
     # Create prompt with source URLs
     prompt = f'Create a 1-sentence summary of what a "froquetism" is based on the following text from {urls_text}: \n\n{combined_text}'
     
-    # Call OpenAI
-    client = openai.OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-    response = client.chat.completions.create(
-        model="gpt-3.5-turbo",
-        messages=[{"role": "user", "content": prompt}],
-        max_tokens=100
-    )
-    
-    return response.choices[0].message.content
+    # Call OpenAI through the shared client (pooled, retried, cached)
+    client = get_default_client(model="gpt-3.5-turbo", max_tokens=100, cache_path='llm_responses.db')
+    return client.complete_sync(prompt)
 
 def main():
     """Demo: Find froquetism text and get OpenAI summary"""
     print("=== Froquetism Finder Demo ===")
     
-    # Step 1: Scrape paragraphs
+    # Steps 1 + 2: Scrape paragraphs and scan them for watch terms as they stream in
     print("1. Scraping paragraphs...")
     base_url = "https://four27-my-docs-site.onrender.com"
     urls = [f"{base_url}/intro", f"{base_url}/tutorial-basics/create-a-document"]
     
-    all_paragraphs = []
-    for url in urls:
-        print(f"   - {url}")
-        paragraphs = scrape_paragraphs(url)
-        all_paragraphs.extend(paragraphs)
-    
-    print(f"   Found {len(all_paragraphs)} total paragraphs")
-    
-    # Step 2: Find froquetism text
-    print("2. Searching for 'froquetism'...")
-    froquetism_text = find_froquetism_text(all_paragraphs)
+    print(f"2. Searching for {', '.join(WATCH_TERMS)}...")
+    froquetism_text, hits = find_watch_terms(iter_paragraphs(urls))
     print(f"   Found {len(froquetism_text)} paragraphs with 'froquetism'")
+    for term, locations in hits.items():
+        print(f"   {term}: " + ", ".join(f"{url} #{index}" for url, index in locations))
     
     if froquetism_text:
         print("   Froquetism text found:")